@@ -1,16 +1,30 @@
 import logging
-from typing import Dict, List, TypedDict, Annotated
-from dataclasses import dataclass
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Set, Tuple, TypedDict, Annotated
+import hashlib
 import json
+import types
 import requests
-from bs4 import BeautifulSoup
+from requests.adapters import HTTPAdapter
+try:
+    from selectolax.lexbor import LexborHTMLParser
+except ImportError:  # selectolax 為選用依賴，未安裝時使用 BeautifulSoup
+    LexborHTMLParser = None
+try:
+    import orjson
+except ImportError:  # orjson 為選用依賴，未安裝時使用標準庫 json
+    orjson = None
 from urllib.parse import urlparse, urljoin
 import re
+from functools import lru_cache
+import multiprocessing
+import threading
+import time
+from concurrent.futures import (
+    Future, ProcessPoolExecutor, ThreadPoolExecutor, TimeoutError as FuturesTimeoutError, wait as wait_futures
+)
+from concurrent.futures.process import BrokenProcessPool
 
-# LangGraph imports
-from langgraph.graph import StateGraph
-from langchain_core.messages import HumanMessage, SystemMessage
-from langchain_openai import ChatOpenAI
+# LangGraph / LangChain / bs4 匯入耗時較長，延遲到實際使用時才載入
 
 from config import settings
 from config.agents_config import (
@@ -19,6 +33,7 @@ from config.agents_config import (
     SOCIAL_WRITER_PROMPT,
     WEB_SCRAPER_PROMPT,
 )
+from utils.cache import PromptCache, SemanticLLMCache
 
 logging.basicConfig(level=logging.INFO)
 
@@ -37,9 +52,8 @@ class WorkflowState(TypedDict):
     error_messages: List[str]
 
 
-@dataclass
-class WebsiteStructure:
-    """網站結構分析結果"""
+class WebsiteStructure(NamedTuple):
+    """網站結構分析結果（不可變、無 __dict__ 的輕量結構）"""
     url: str
     title: str
     main_content_selectors: List[str]
@@ -50,8 +64,11 @@ class WebsiteStructure:
     suggested_approach: str
 
 
+@lru_cache(maxsize=1)
 def get_llm():
-    """獲取配置好的 LLM"""
+    """獲取配置好的 LLM（整個行程共用同一個客戶端與連線池）"""
+    from langchain_openai import ChatOpenAI
+    
     return ChatOpenAI(
         model=settings.OPENAI_MODEL_NAME,
         api_key=settings.OPENAI_API_KEY,
@@ -62,55 +79,252 @@ def get_llm():
     )
 
 
-def analyze_website_structure(url: str) -> WebsiteStructure:
+_PROMPT_CACHE = PromptCache(settings.LLM_CACHE_DIR)
+_SEMANTIC_CACHE = SemanticLLMCache()
+
+
+def cached_invoke(llm, messages: List, namespace: str, semantic_key: str) -> str:
     """
-    分析網站HTML結構，為爬蟲代碼生成提供信息
+    呼叫 LLM，先查精確比對的磁碟快取，再查語意快取，都未命中才實際呼叫
+
+    Args:
+        llm: LangChain 聊天模型
+        messages (List): 要送出的訊息
+        namespace (str): 快取命名空間（節點名稱），避免不同節點的回應互相命中
+        semantic_key (str): 決定回應內容的輸入文字（不含固定的提示詞模板）
+
+    Returns:
+        str: LLM 回應內容
     """
-    try:
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
-        }
-        response = requests.get(url, headers=headers, timeout=10)
+    prompt_key = PromptCache.make_key(llm.model_name, messages)
+    cached = _PROMPT_CACHE.get(prompt_key)
+    if cached is not None:
+        logging.info(f"提示詞快取命中 ({namespace})")
+        return cached
+    
+    cached = _SEMANTIC_CACHE.lookup(namespace, semantic_key)
+    if cached is not None:
+        return cached
+    
+    content = llm.invoke(messages).content
+    _PROMPT_CACHE.set(prompt_key, content)
+    _SEMANTIC_CACHE.store(namespace, semantic_key, content)
+    return content
+
+
+def _create_session() -> requests.Session:
+    """建立共用的 HTTP Session，跨請求重用 TCP/TLS 連線"""
+    session = requests.Session()
+    session.headers.update({
+        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
+    })
+    adapter = HTTPAdapter(pool_connections=20, pool_maxsize=20)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+_SESSION = _create_session()
+
+
+# 結構分析最多讀取的網頁大小
+_MAX_PAGE_BYTES = 2_000_000
+_HTML_CONTENT_TYPES = ('text/html', 'application/xhtml+xml')
+
+
+def _fetch_page(url: str) -> bytes:
+    """
+    下載網頁原始內容，非HTML或過大的回應只讀取標頭即放棄
+
+    Raises:
+        ValueError: 回應不是HTML或超過大小上限
+    """
+    with _SESSION.get(url, timeout=10, stream=True) as response:
         response.raise_for_status()
-        
-        soup = BeautifulSoup(response.content, 'html.parser')
+        content_type = response.headers.get('Content-Type', '')
+        if content_type and not any(html_type in content_type for html_type in _HTML_CONTENT_TYPES):
+            raise ValueError(f"Skipped non-HTML content: {content_type}")
+        content_length = response.headers.get('Content-Length', '')
+        if content_length.isdigit() and int(content_length) > _MAX_PAGE_BYTES:
+            raise ValueError(f"Skipped oversized page: {content_length} bytes")
+        return response.raw.read(_MAX_PAGE_BYTES, decode_content=True)
+
+
+def _fallback_structure(url: str, error: Exception) -> WebsiteStructure:
+    """分析失敗時使用的預設結構"""
+    return WebsiteStructure(
+        url=url,
+        title="Analysis failed",
+        main_content_selectors=[],
+        text_selectors=['p', 'h1', 'h2', 'h3'],  # 預設選擇器
+        image_selectors=['img'],
+        link_selectors=['a'],
+        meta_info={'error': str(error)},
+        suggested_approach="general-scraping"
+    )
+
+
+class _LexborPage:
+    """以 selectolax (lexbor) 解析的頁面，選擇器比對在 C 層完成"""
+
+    def __init__(self, content: bytes):
+        self._tree = LexborHTMLParser(content)
+        title = self._tree.css_first('title')
+        self.title = title.text().strip() if title else None
+        html = self._tree.css_first('html')
+        self.lang = html.attributes.get('lang') if html else None
+
+    def matches(self, selector: str) -> bool:
+        return self._tree.css_matches(selector)
+
+
+# BeautifulSoup 後備解析時只建立結構分析會探測到的元素
+_STRAINED_TAGS = frozenset(['title', 'main', 'article', 'p', 'h1', 'h2', 'h3', 'img', 'figure', 'a', 'meta', 'script'])
+_STRAINED_CLASSES = frozenset([
+    'content', 'main-content', 'post', 'entry', 'text', 'description', 'summary', 'image', 'photo', 'link', 'more-link'
+])
+_HTML_LANG_RE = re.compile(rb'<html\b[^>]*?\blang\s*=\s*["\']?([^"\'\s>]+)', re.IGNORECASE)
+
+
+@lru_cache(maxsize=1)
+def _analysis_strainer():
+    """建立略過結構分析無關子樹的 SoupStrainer，避免建立完整的 DOM"""
+    from bs4 import SoupStrainer
+
+    class _AnalysisStrainer(SoupStrainer):
+
+        def allow_tag_creation(self, nsprefix, name, attrs) -> bool:
+            if name in _STRAINED_TAGS:
+                return True
+            if not attrs:
+                return False
+            if 'itemscope' in attrs or 'vocab' in attrs or attrs.get('id') == 'content':
+                return True
+            classes = attrs.get('class') or ''
+            if isinstance(classes, str):
+                classes = classes.split()
+            return not _STRAINED_CLASSES.isdisjoint(classes)
+
+    return _AnalysisStrainer()
+
+
+# 結構分析探測的選擇器，定義一次供每個URL重複使用
+_MAIN_CONTENT_SELECTORS = ('main', 'article', '.content', '.main-content', '#content', '.post', '.entry')
+_TEXT_SELECTORS = ('p', 'h1', 'h2', 'h3', '.text', '.description', '.summary')
+_IMAGE_SELECTORS = ('img', '.image', '.photo', 'figure img')
+_LINK_SELECTORS = ('a[href]', '.link', '.more-link')
+
+# 結構分析中無法以單一標籤/class/id 表示的選擇器，於走訪時直接判斷
+_JSON_LD_SELECTOR = 'script[type="application/ld+json"]'
+_META_DESCRIPTION_SELECTOR = 'meta[name="description"]'
+_STRUCTURED_DATA_SELECTOR = '[itemscope], [vocab]'
+_INDEXED_COMPOUND_SELECTORS = frozenset([
+    'a[href]', 'figure img', _JSON_LD_SELECTOR, _META_DESCRIPTION_SELECTOR, _STRUCTURED_DATA_SELECTOR
+])
+_SIMPLE_SELECTOR_RE = re.compile(r'^[.#]?[\w-]+$')
+
+
+@lru_cache(maxsize=128)
+def _compile_selector(selector: str) -> "soupsieve.SoupSieve":
+    """編譯 CSS 選擇器並快取，重複使用時不必重新解析"""
+    import soupsieve
+    return soupsieve.compile(selector)
+
+
+class _SoupPage:
+    """selectolax 不可用時以 BeautifulSoup (lxml) 解析的頁面"""
+
+    def __init__(self, content: bytes):
+        from bs4 import BeautifulSoup
+        self._soup = BeautifulSoup(content, 'lxml', parse_only=_analysis_strainer())
+        title = self._soup.find('title')
+        self.title = title.get_text().strip() if title else None
+        # <html> 不在過濾範圍內（保留它等於保留整份文件），直接從原始內容讀取 lang
+        lang = _HTML_LANG_RE.search(content)
+        self.lang = lang.group(1).decode('ascii', 'ignore') if lang else None
+        self._matched = set()
+        self._index_elements()
+
+    def _index_elements(self) -> None:
+        """走訪一次所有元素，記錄出現過的標籤、class、id 與複合選擇器"""
+        matched = self._matched
+        for element in self._soup.find_all(True):
+            name = element.name
+            attrs = element.attrs
+            matched.add(name)
+            for class_name in attrs.get('class') or ():
+                matched.add('.' + class_name)
+            if attrs.get('id'):
+                matched.add('#' + attrs['id'])
+            if 'itemscope' in attrs or 'vocab' in attrs:
+                matched.add(_STRUCTURED_DATA_SELECTOR)
+            if name == 'a' and 'href' in attrs:
+                matched.add('a[href]')
+            elif name == 'img' and element.find_parent('figure') is not None:
+                matched.add('figure img')
+            elif name == 'script' and attrs.get('type') == 'application/ld+json':
+                matched.add(_JSON_LD_SELECTOR)
+            elif name == 'meta' and attrs.get('name') == 'description':
+                matched.add(_META_DESCRIPTION_SELECTOR)
+
+    def matches(self, selector: str) -> bool:
+        if selector in self._matched:
+            return True
+        if selector in _INDEXED_COMPOUND_SELECTORS or _SIMPLE_SELECTOR_RE.match(selector):
+            return False
+        # 未建立索引的選擇器才交給 CSS 選擇器引擎
+        return _compile_selector(selector).select_one(self._soup) is not None
+
+
+def _parse_page(content: bytes):
+    """優先使用 selectolax 解析HTML，未安裝時退回 BeautifulSoup"""
+    if LexborHTMLParser is not None:
+        return _LexborPage(content)
+    return _SoupPage(content)
+
+
+def analyze_website_structure_from_html(url: str, content: bytes) -> WebsiteStructure:
+    """
+    根據已下載的HTML內容分析網站結構（僅解析，不發送請求）
+    """
+    try:
+        page = _parse_page(content)
         
         # 分析網站結構
-        title = soup.find('title')
-        title_text = title.get_text().strip() if title else "No title found"
+        title_text = page.title if page.title is not None else "No title found"
         
         # 尋找主要內容選擇器
         main_content_selectors = []
-        for selector in ['main', 'article', '.content', '.main-content', '#content', '.post', '.entry']:
-            if soup.select(selector):
+        for selector in _MAIN_CONTENT_SELECTORS:
+            if page.matches(selector):
                 main_content_selectors.append(selector)
         
         # 尋找文本選擇器
         text_selectors = []
-        for selector in ['p', 'h1', 'h2', 'h3', '.text', '.description', '.summary']:
-            if soup.select(selector):
+        for selector in _TEXT_SELECTORS:
+            if page.matches(selector):
                 text_selectors.append(selector)
         
         # 尋找圖片選擇器
         image_selectors = []
-        for selector in ['img', '.image', '.photo', 'figure img']:
-            if soup.select(selector):
+        for selector in _IMAGE_SELECTORS:
+            if page.matches(selector):
                 image_selectors.append(selector)
         
         # 尋找鏈接選擇器
         link_selectors = []
-        for selector in ['a[href]', '.link', '.more-link']:
-            if soup.select(selector):
+        for selector in _LINK_SELECTORS:
+            if page.matches(selector):
                 link_selectors.append(selector)
         
         # Meta 信息
         meta_info = {
             'domain': urlparse(url).netloc,
-            'has_json_ld': bool(soup.find_all('script', type='application/ld+json')),
-            'has_meta_description': bool(soup.find('meta', {'name': 'description'})),
-            'page_lang': soup.find('html', {'lang': True}),
-            'total_elements': len(soup.find_all()),
-            'has_structured_data': bool(soup.select('[itemscope], [vocab]'))
+            'has_json_ld': page.matches(_JSON_LD_SELECTOR),
+            'has_meta_description': page.matches(_META_DESCRIPTION_SELECTOR),
+            'page_lang': page.lang,
+            'approx_bytes': len(content),
+            'has_structured_data': page.matches(_STRUCTURED_DATA_SELECTOR)
         }
         
         # 建議的爬蟲方法
@@ -136,16 +350,20 @@ def analyze_website_structure(url: str) -> WebsiteStructure:
         
     except Exception as e:
         logging.error(f"Error analyzing website structure for {url}: {e}")
-        return WebsiteStructure(
-            url=url,
-            title="Analysis failed",
-            main_content_selectors=[],
-            text_selectors=['p', 'h1', 'h2', 'h3'],  # 預設選擇器
-            image_selectors=['img'],
-            link_selectors=['a'],
-            meta_info={'error': str(e)},
-            suggested_approach="general-scraping"
-        )
+        return _fallback_structure(url, e)
+
+
+def analyze_website_structure(url: str) -> WebsiteStructure:
+    """
+    分析網站HTML結構，為爬蟲代碼生成提供信息
+    """
+    try:
+        content = _fetch_page(url)
+    except Exception as e:
+        logging.error(f"Error analyzing website structure for {url}: {e}")
+        return _fallback_structure(url, e)
+    
+    return analyze_website_structure_from_html(url, content)
 
 
 # 工作流程節點函數
@@ -156,10 +374,19 @@ def analyze_urls_node(state: WorkflowState) -> WorkflowState:
     if state.get('progress_callback'):
         state['progress_callback']("🔍 正在分析趨勢網站結構...")
     
+    urls = state['trend_urls'][:3]  # 限制處理前3個URL
     website_analyses = []
-    for url in state['trend_urls'][:3]:  # 限制處理前3個URL
+    if not urls:
+        state['website_analyses'] = website_analyses
+        return state
+    
+    # 各URL的請求互不相依，並行下載以縮短等待時間
+    with ThreadPoolExecutor(max_workers=len(urls)) as executor:
+        futures = [executor.submit(analyze_website_structure, url) for url in urls]
+    
+    for url, future in zip(urls, futures):
         try:
-            analysis = analyze_website_structure(url)
+            analysis = future.result()
             website_analyses.append({
                 'url': url,
                 'structure': analysis,
@@ -179,6 +406,138 @@ def analyze_urls_node(state: WorkflowState) -> WorkflowState:
     return state
 
 
+def _format_analysis(structure: WebsiteStructure) -> str:
+    """將網站結構整理成提供給 Code Agent 的分析文字"""
+    return f"""
+URL: {structure.url}
+標題: {structure.title}
+建議方法: {structure.suggested_approach}
+主要內容選擇器: {structure.main_content_selectors}
+文本選擇器: {structure.text_selectors}
+圖片選擇器: {structure.image_selectors}
+Meta信息: {structure.meta_info}
+        """
+
+
+def _extract_python_code(response: str) -> str:
+    """從回應中提取 ```python 區塊內的程式碼，沒有區塊時原樣返回"""
+    if "```python" in response:
+        code_start = response.find("```python") + 9
+        code_end = response.find("```", code_start)
+        if code_end != -1:
+            return response[code_start:code_end].strip()
+    return response
+
+
+def _generate_scraping_code(llm, code_agent_prompt: str, website_analysis: Dict) -> Dict:
+    """
+    為單一網站分析結果生成爬蟲程式碼
+
+    Args:
+        llm: LangChain 聊天模型
+        code_agent_prompt (str): Code Agent 的系統提示詞模板
+        website_analysis (Dict): analyze_urls_node 產生的分析結果
+
+    Returns:
+        Dict: 包含 url、code、generation_success 的結果
+    """
+    from langchain_core.messages import HumanMessage, SystemMessage
+    
+    if not website_analysis['analysis_success']:
+        return {
+            'url': website_analysis['url'],
+            'code': None,
+            'generation_success': False,
+            'error': website_analysis.get('error', 'Unknown error')
+        }
+
+    try:
+        structure = website_analysis['structure']
+        analysis_text = _format_analysis(structure)
+
+        messages = [
+            SystemMessage(content=code_agent_prompt.format(analysis=analysis_text)),
+            HumanMessage(content=f"為 {structure.url} 生成爬蟲程式碼")
+        ]
+
+        generated_code = _extract_python_code(cached_invoke(llm, messages, "generate_code", analysis_text))
+
+        logging.info(f"✅ 成功生成爬蟲程式碼: {structure.url}")
+        return {
+            'url': structure.url,
+            'code': generated_code,
+            'generation_success': True,
+            'structure_info': analysis_text
+        }
+
+    except Exception as e:
+        logging.error(f"❌ 程式碼生成失敗: {website_analysis['url']} - {e}")
+        return {
+            'url': website_analysis['url'],
+            'code': None,
+            'generation_success': False,
+            'error': str(e)
+        }
+
+
+# 可分析網站數量在此範圍內時，以單一提示詞一次生成所有爬蟲
+_BATCH_CODEGEN_MIN_SITES = 2
+_BATCH_CODEGEN_MAX_SITES = 3
+_WEBSITE_MARKER_RE = re.compile(r'^#{3}\s*WEBSITE\s+(\d+)\s*#{3}\s*$', re.MULTILINE)
+
+
+def _generate_scraping_codes_batched(llm, code_agent_prompt: str,
+                                     structures: List[WebsiteStructure]) -> Optional[Dict[str, Dict]]:
+    """
+    以單一 LLM 呼叫為多個網站生成爬蟲程式碼，共用系統提示詞並只付出一次往返延遲
+
+    Args:
+        llm: LangChain 聊天模型
+        code_agent_prompt (str): Code Agent 的系統提示詞模板
+        structures (List[WebsiteStructure]): 分析成功的網站結構
+
+    Returns:
+        Optional[Dict[str, Dict]]: 以 URL 為鍵的生成結果；回應無法解析時返回 None
+    """
+    from langchain_core.messages import HumanMessage, SystemMessage
+    
+    analysis_texts = [_format_analysis(structure) for structure in structures]
+    combined_analysis = "\n".join(
+        f"### WEBSITE {index} ###{analysis_text}" for index, analysis_text in enumerate(analysis_texts, 1)
+    )
+    messages = [
+        SystemMessage(content=code_agent_prompt.format(analysis=combined_analysis)),
+        HumanMessage(content=(
+            f"請依序為以上 {len(structures)} 個網站各生成一份爬蟲程式碼。"
+            "每份程式碼前先輸出獨立一行的 `### WEBSITE k ###`（k 與分析結果的編號相同），"
+            "接著輸出一個 ```python 程式碼區塊。"
+        ))
+    ]
+
+    try:
+        response = cached_invoke(llm, messages, "generate_code_batch", combined_analysis)
+    except Exception as e:
+        logging.error(f"❌ 批次程式碼生成失敗，改為逐一生成 - {e}")
+        return None
+
+    parts = _WEBSITE_MARKER_RE.split(response)
+    codes = {int(number): body for number, body in zip(parts[1::2], parts[2::2])}
+    if sorted(codes) != list(range(1, len(structures) + 1)) or any("```python" not in body for body in codes.values()):
+        logging.info("批次程式碼生成的回應格式不符，改為逐一生成")
+        return None
+
+    results = {}
+    for index, (structure, analysis_text) in enumerate(zip(structures, analysis_texts), 1):
+        results[structure.url] = {
+            'url': structure.url,
+            'code': _extract_python_code(codes[index]),
+            'generation_success': True,
+            'structure_info': analysis_text
+        }
+        logging.info(f"✅ 成功生成爬蟲程式碼: {structure.url}")
+    return results
+
+
 def generate_scraping_code_node(state: WorkflowState) -> WorkflowState:
     """節點2: Code Agent 生成爬蟲程式碼"""
     logging.info("🤖 Code Agent 生成爬蟲程式碼...")
@@ -197,71 +556,198 @@ def generate_scraping_code_node(state: WorkflowState) -> WorkflowState:
 3. 提取網站的主要內容、標題、文本、圖片URL等
 4. 返回結構化的JSON格式數據
 5. 使用requests和BeautifulSoup庫
+6. 執行環境已提供共用的 `session`（requests.Session），請優先用它發送請求以重用連線
 
 網站結構分析結果：
 {analysis}
 
 請生成針對此網站的爬蟲程式碼，程式碼應該包含一個main函數，接受url參數並返回爬取結果。"""
 
-    for website_analysis in state['website_analyses']:
-        if not website_analysis['analysis_success']:
-            scraping_codes.append({
-                'url': website_analysis['url'],
-                'code': None,
-                'generation_success': False,
-                'error': website_analysis.get('error', 'Unknown error')
-            })
-            continue
-            
-        try:
-            structure = website_analysis['structure']
-            analysis_text = f"""
-URL: {structure.url}
-標題: {structure.title}
-建議方法: {structure.suggested_approach}
-主要內容選擇器: {structure.main_content_selectors}
-文本選擇器: {structure.text_selectors}
-圖片選擇器: {structure.image_selectors}
-Meta信息: {structure.meta_info}
-            """
-            
-            messages = [
-                SystemMessage(content=code_agent_prompt.format(analysis=analysis_text)),
-                HumanMessage(content=f"為 {structure.url} 生成爬蟲程式碼")
-            ]
-            
-            response = llm.invoke(messages)
-            generated_code = response.content
-            
-            # 從回應中提取程式碼
-            if "```python" in generated_code:
-                code_start = generated_code.find("```python") + 9
-                code_end = generated_code.find("```", code_start)
-                if code_end != -1:
-                    generated_code = generated_code[code_start:code_end].strip()
-            
-            scraping_codes.append({
-                'url': structure.url,
-                'code': generated_code,
-                'generation_success': True,
-                'structure_info': analysis_text
-            })
-            
-            logging.info(f"✅ 成功生成爬蟲程式碼: {structure.url}")
-            
-        except Exception as e:
-            scraping_codes.append({
-                'url': website_analysis['url'],
-                'code': None,
-                'generation_success': False,
-                'error': str(e)
-            })
-            logging.error(f"❌ 程式碼生成失敗: {website_analysis['url']} - {e}")
+    website_analyses = state['website_analyses']
+    structures = [analysis['structure'] for analysis in website_analyses if analysis['analysis_success']]
+    batched = None
+    if _BATCH_CODEGEN_MIN_SITES <= len(structures) <= _BATCH_CODEGEN_MAX_SITES:
+        batched = _generate_scraping_codes_batched(llm, code_agent_prompt, structures)
+
+    if batched is not None:
+        scraping_codes = [
+            batched[analysis['structure'].url] if analysis['analysis_success']
+            else _generate_scraping_code(llm, code_agent_prompt, analysis)
+            for analysis in website_analyses
+        ]
+    elif website_analyses:
+        # 各URL的 LLM 呼叫互不相依，並行送出讓總耗時接近最慢的一次呼叫
+        with ThreadPoolExecutor(max_workers=len(website_analyses)) as executor:
+            scraping_codes = list(executor.map(
+                lambda analysis: _generate_scraping_code(llm, code_agent_prompt, analysis),
+                website_analyses
+            ))
     
     state['scraping_codes'] = scraping_codes
     return state
 
 
+@lru_cache(maxsize=1)
+def _base_exec_globals() -> Dict:
+    """生成程式碼執行環境的原型，只在 worker 行程第一次執行時建立，每次執行時複製一份"""
+    from bs4 import BeautifulSoup
+    return {
+        'requests': requests,
+        'BeautifulSoup': BeautifulSoup,
+        'json': json,
+        'urlparse': urlparse,
+        'urljoin': urljoin,
+        're': re,
+        'session': _SESSION
+    }
+
+# 以原始碼雜湊為鍵的已編譯程式碼，重跑相同程式碼時略過解析與編譯
+_CODE_CACHE: Dict[str, types.CodeType] = {}
+
+
+def _compile_generated_code(code: str) -> types.CodeType:
+    """
+    編譯生成的爬蟲程式碼，相同原始碼只編譯一次
+
+    Args:
+        code (str): Python 原始碼
+
+    Returns:
+        types.CodeType: 可交給 exec 的程式碼物件
+    """
+    key = hashlib.blake2b(code.encode('utf-8')).hexdigest()
+    compiled = _CODE_CACHE.get(key)
+    if compiled is None:
+        compiled = _CODE_CACHE.setdefault(key, compile(code, f'<generated:{key[:8]}>', 'exec'))
+    return compiled
+
+
+def _run_generated(code: str, url: str) -> Dict:
+    """
+    在 worker 行程中執行生成的爬蟲程式碼（須為模組層級函數才能被 pickle）
+
+    Args:
+        code (str): 生成的 Python 原始碼，需定義 main(url)
+        url (str): 要爬取的URL
+
+    Returns:
+        Dict: 包含 data、execution_success（失敗時另有 error）的可序列化結果
+    """
+    try:
+        # 準備執行環境
+        exec_globals = _base_exec_globals().copy()
+        
+        # 執行程式碼
+        exec(_compile_generated_code(code), exec_globals)
+        
+        # 調用main函數（假設生成的程式碼包含main函數）
+        if 'main' not in exec_globals:
+            return {'data': None, 'execution_success': False, 'error': 'No main function found in generated code'}
+        result = exec_globals['main'](url)
+        # 結果要跨行程傳回，先轉為純 JSON 結構（BeautifulSoup 物件等會轉成字串）
+        return {'data': json.loads(json.dumps(result, ensure_ascii=False, default=str)), 'execution_success': True}
+    
+    except Exception as e:
+        return {'data': None, 'execution_success': False, 'error': str(e)}
+
+
+# 生成程式碼在獨立行程中執行，單一爬蟲卡住或崩潰不會拖垮整個工作流程
+_SCRAPER_WORKERS = 3
+_SCRAPER_TIMEOUT_SECONDS = 30
+_SCRAPER_POOL: Optional["_ScraperPool"] = None
+_SCRAPER_POOL_LOCK = threading.Lock()
+
+
+class _ScraperPool:
+    """常駐的爬蟲 worker 行程池，記錄尚未完成的工作，停用時才能等其他工作流程的爬蟲結束"""
+
+    def __init__(self):
+        # 呼叫端（Streamlit、LangGraph）本身是多執行緒，使用 spawn 避免 fork 時複製到被鎖住的狀態
+        self.executor = ProcessPoolExecutor(
+            max_workers=_SCRAPER_WORKERS, mp_context=multiprocessing.get_context('spawn')
+        )
+        self._pending: Set[Future] = set()
+        self._lock = threading.Lock()
+
+    def submit(self, code: str, url: str) -> Future:
+        future = self.executor.submit(_run_generated, code, url)
+        with self._lock:
+            self._pending.add(future)
+        future.add_done_callback(self._discard)
+        return future
+
+    def _discard(self, future: Future) -> None:
+        with self._lock:
+            self._pending.discard(future)
+
+    def in_flight(self) -> Set[Future]:
+        """尚未完成的工作"""
+        with self._lock:
+            return set(self._pending)
+
+    def terminate(self) -> None:
+        """立即結束所有 worker 行程（包含卡住的）"""
+        # ProcessPoolExecutor 沒有公開的終止方法，卡住的 worker 只能直接結束
+        for process in list((self.executor._processes or {}).values()):
+            process.terminate()
+        self.executor.shutdown(wait=False)
+
+
+def _get_scraper_pool() -> _ScraperPool:
+    """取得常駐的爬蟲 worker 行程池，避免每次執行都重新啟動行程"""
+    global _SCRAPER_POOL
+    with _SCRAPER_POOL_LOCK:
+        if _SCRAPER_POOL is None:
+            _SCRAPER_POOL = _ScraperPool()
+        return _SCRAPER_POOL
+
+
+def _retire_scraper_pool(pool: _ScraperPool, hung: Iterable[Future] = ()) -> None:
+    """
+    停用逾時或損壞的行程池，之後的工作改用新的行程池
+
+    行程池由所有工作流程共用：只在它仍是目前的行程池時才換掉（其他工作流程可能已換過），
+    並在背景等其他工作流程在此行程池上的爬蟲完成（最多一個爬蟲逾時的時間）後，才終止所有 worker。
+
+    Args:
+        pool (_ScraperPool): 本次執行使用的行程池
+        hung (Iterable[Future]): 本次執行中逾時的工作，不需等待
+    """
+    global _SCRAPER_POOL
+    with _SCRAPER_POOL_LOCK:
+        if _SCRAPER_POOL is pool:
+            _SCRAPER_POOL = None
+    hung = set(hung)
+
+    def drain_and_terminate():
+        deadline = time.monotonic() + _SCRAPER_TIMEOUT_SECONDS
+        while True:
+            others = pool.in_flight() - hung
+            remaining = deadline - time.monotonic()
+            if not others or remaining <= 0:
+                break
+            wait_futures(others, timeout=remaining)
+        pool.terminate()
+
+    threading.Thread(target=drain_and_terminate, name="scraper-pool-retire", daemon=True).start()
+
+
+def _submit_scraper(code: str, url: str) -> Tuple[_ScraperPool, Future]:
+    """
+    送出爬蟲工作；行程池剛被其他工作流程停用（已關閉或損壞）時，換到新的行程池重試一次
+
+    Returns:
+        Tuple[_ScraperPool, Future]: 實際使用的行程池與工作
+    """
+    pool = _get_scraper_pool()
+    try:
+        return pool, pool.submit(code, url)
+    except (BrokenProcessPool, RuntimeError):
+        _retire_scraper_pool(pool)
+        pool = _get_scraper_pool()
+        return pool, pool.submit(code, url)
+
+
 def execute_scraping_code_node(state: WorkflowState) -> WorkflowState:
     """節點3: Code Executor Proxy 執行爬蟲程式碼"""
     logging.info("⚙️ 執行爬蟲程式碼...")
@@ -269,64 +755,106 @@ def execute_scraping_code_node(state: WorkflowState) -> WorkflowState:
     if state.get('progress_callback'):
         state['progress_callback']("⚙️ Code Executor 正在執行爬蟲程式碼...")
     
-    scraped_data = []
-    
-    for code_info in state['scraping_codes']:
+    scraping_codes = state['scraping_codes']
+    scraped_data = [None] * len(scraping_codes)
+    futures = {}
+    for index, code_info in enumerate(scraping_codes):
         if not code_info['generation_success'] or not code_info['code']:
-            scraped_data.append({
+            scraped_data[index] = {
                 'url': code_info['url'],
                 'data': None,
                 'execution_success': False,
                 'error': code_info.get('error', 'No code to execute')
-            })
+            }
             continue
-        
         try:
-            # 準備執行環境
-            exec_globals = {
-                'requests': requests,
-                'BeautifulSoup': BeautifulSoup,
-                'json': json,
-                'urlparse': urlparse,
-                'urljoin': urljoin,
-                're': re
-            }
-            
-            # 執行程式碼
-            exec(code_info['code'], exec_globals)
-            
-            # 調用main函數（假設生成的程式碼包含main函數）
-            if 'main' in exec_globals:
-                result = exec_globals['main'](code_info['url'])
-                scraped_data.append({
-                    'url': code_info['url'],
-                    'data': result,
-                    'execution_success': True
-                })
-                logging.info(f"✅ 成功執行爬蟲: {code_info['url']}")
-            else:
-                scraped_data.append({
-                    'url': code_info['url'],
-                    'data': None,
-                    'execution_success': False,
-                    'error': 'No main function found in generated code'
-                })
-                
-        except Exception as e:
-            scraped_data.append({
-                'url': code_info['url'],
+            futures[index] = _submit_scraper(code_info['code'], code_info['url'])
+        except (BrokenProcessPool, RuntimeError) as e:
+            scraped_data[index] = {'url': code_info['url'], 'data': None, 'execution_success': False, 'error': str(e)}
+    
+    # 所有爬蟲同時開始執行，共用同一個截止時間
+    deadline = time.monotonic() + _SCRAPER_TIMEOUT_SECONDS
+    # 需要停用的行程池 -> 本次在其中逾時的工作
+    pools_to_retire: Dict[_ScraperPool, Set[Future]] = {}
+    for index, (pool, future) in futures.items():
+        url = scraping_codes[index]['url']
+        try:
+            outcome = future.result(timeout=max(0.0, deadline - time.monotonic()))
+        except FuturesTimeoutError:
+            pools_to_retire.setdefault(pool, set()).add(future)
+            outcome = {
                 'data': None,
                 'execution_success': False,
-                'error': str(e)
-            })
-            logging.error(f"❌ 爬蟲執行失敗: {code_info['url']} - {e}")
+                'error': f'Scraper timed out after {_SCRAPER_TIMEOUT_SECONDS} seconds'
+            }
+        except Exception as e:
+            # worker 行程異常結束（例如記憶體不足）時行程池會損壞
+            pools_to_retire.setdefault(pool, set())
+            outcome = {'data': None, 'execution_success': False, 'error': str(e)}
+        
+        scraped_data[index] = {'url': url, **outcome}
+        if outcome['execution_success']:
+            logging.info(f"✅ 成功執行爬蟲: {url}")
+        else:
+            logging.error(f"❌ 爬蟲執行失敗: {url} - {outcome['error']}")
+    
+    for pool, hung in pools_to_retire.items():
+        _retire_scraper_pool(pool, hung)
     
     state['scraped_data'] = scraped_data
     return state
 
 
+# 每個爬蟲結果字串欄位放進摘要提示詞的最大長度
+_MAX_SCRAPED_FIELD_CHARS = 4096
+
+
+def _compact_json(value) -> str:
+    """以不含縮排與多餘空白的格式序列化，優先使用 orjson"""
+    if orjson is not None:
+        return orjson.dumps(value, default=str, option=orjson.OPT_NON_STR_KEYS).decode('utf-8')
+    return json.dumps(value, ensure_ascii=False, separators=(',', ':'), default=str)
+
+
+def _trim_scraped_value(value):
+    """遞迴截斷過長的字串欄位，避免單一網站的內容撐大提示詞"""
+    if isinstance(value, str):
+        return value[:_MAX_SCRAPED_FIELD_CHARS] + '…' if len(value) > _MAX_SCRAPED_FIELD_CHARS else value
+    if isinstance(value, dict):
+        return {key: _trim_scraped_value(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_trim_scraped_value(item) for item in value]
+    return value
+
+
+def _serialize_scraped_data(successful_data: List[Dict]) -> str:
+    """
+    將成功的爬蟲結果截斷、去重後序列化為精簡的 JSON
+
+    Args:
+        successful_data (List[Dict]): 包含 url 與 content 的爬蟲結果
+
+    Returns:
+        str: JSON 陣列字串，重複的 URL 或內容完全相同的結果只保留第一筆
+    """
+    seen_urls = set()
+    seen_payloads = set()
+    entries = []
+    for item in successful_data:
+        payload = _compact_json(_trim_scraped_value(item['content']))
+        digest = hashlib.blake2b(payload.encode('utf-8'), digest_size=16).digest()
+        if item['url'] in seen_urls or digest in seen_payloads:
+            continue
+        seen_urls.add(item['url'])
+        seen_payloads.add(digest)
+        entries.append(f'{{"url":{_compact_json(item["url"])},"content":{payload}}}')
+    return '[' + ','.join(entries) + ']'
+
+
 def summary_agent_node(state: WorkflowState) -> WorkflowState:
     """節點4: Summary Agent 整合爬蟲結果"""
+    from langchain_core.messages import HumanMessage, SystemMessage
+    
     logging.info("📋 Summary Agent 整合爬蟲結果...")
     
     if state.get('progress_callback'):
@@ -345,12 +873,15 @@ def summary_agent_node(state: WorkflowState) -> WorkflowState:
     
     if not successful_data:
         state['summary'] = f"關於主題 '{state['topic']}' 的爬蟲過程中沒有獲得有效數據，請檢查網站可訪問性或調整爬蟲策略。"
+        if state.get('progress_callback'):
+            state['progress_callback']("🎬📱 Script Writer 與 Social Media Writer 正在並行創作內容...")
         return state
     
+    scraped_json = _serialize_scraped_data(successful_data)
     summary_prompt = f"""你是一個專業的內容分析專家。請根據以下爬蟲獲取的數據，為主題 "{state['topic']}" 生成一個全面的摘要報告。
 
 爬蟲數據：
-{json.dumps(successful_data, ensure_ascii=False, indent=2)}
+{scraped_json}
 
 請提供：
 1. 主題的核心要點和關鍵信息
@@ -372,23 +903,25 @@ def summary_agent_node(state: WorkflowState) -> WorkflowState:
             HumanMessage(content=f"請為主題 '{state['topic']}' 生成摘要報告")
         ]
         
-        response = llm.invoke(messages)
-        state['summary'] = response.content
+        state['summary'] = cached_invoke(llm, messages, "summarize", f"{state['topic']}\n{scraped_json}")
         logging.info("✅ 成功生成摘要報告")
         
     except Exception as e:
         state['summary'] = f"摘要生成過程中出現錯誤：{str(e)}"
         logging.error(f"❌ 摘要生成失敗: {e}")
     
+    # 接下來的兩個寫作節點在 LangGraph 的執行緒中並行執行，進度訊息在此先行送出
+    if state.get('progress_callback'):
+        state['progress_callback']("🎬📱 Script Writer 與 Social Media Writer 正在並行創作內容...")
+    
     return state
 
 
-def script_writer_node(state: WorkflowState) -> WorkflowState:
-    """節點5: Script Writer 創作影片腳本"""
-    logging.info("🎬 Script Writer 創作影片腳本...")
+def script_writer_node(state: WorkflowState) -> Dict[str, str]:
+    """節點5: Script Writer 創作影片腳本（與節點6並行，只返回自己負責的欄位）"""
+    from langchain_core.messages import HumanMessage, SystemMessage
     
-    if state.get('progress_callback'):
-        state['progress_callback']("🎬 Script Writer 正在創作影片腳本...")
+    logging.info("🎬 Script Writer 創作影片腳本...")
     
     llm = get_llm()
     
@@ -413,30 +946,27 @@ def script_writer_node(state: WorkflowState) -> WorkflowState:
             HumanMessage(content=f"請為主題 '{state['topic']}' 創作60秒影片腳本")
         ]
         
-        response = llm.invoke(messages)
-        state['video_script'] = response.content
+        video_script = cached_invoke(
+            llm, messages, "write_script", f"{state['topic']}\n{state['summary']}"
+        )
         logging.info("✅ 成功創作影片腳本")
         
     except Exception as e:
-        state['video_script'] = f"影片腳本創作過程中出現錯誤：{str(e)}"
+        video_script = f"影片腳本創作過程中出現錯誤：{str(e)}"
         logging.error(f"❌ 影片腳本創作失敗: {e}")
     
-    return state
+    return {'video_script': video_script}
 
 
-def social_media_writer_node(state: WorkflowState) -> WorkflowState:
-    """節點6: Social Media Writer 創作社群媒體內容"""
-    logging.info("📱 Social Media Writer 創作社群媒體內容...")
+def social_media_writer_node(state: WorkflowState) -> Dict[str, str]:
+    """節點6: Social Media Writer 創作社群媒體內容（與節點5並行，只返回自己負責的欄位）"""
+    from langchain_core.messages import HumanMessage, SystemMessage
     
-    if state.get('progress_callback'):
-        state['progress_callback']("📱 Social Media Writer 正在創作社群媒體內容...")
+    logging.info("📱 Social Media Writer 創作社群媒體內容...")
     
     llm = get_llm()
     
-    social_prompt = f"""你是一個專業的社群媒體內容創作者。請根據影片腳本和摘要內容，為主題 "{state['topic']}" 創作社群媒體貼文。
-
-影片腳本：
-{state['video_script']}
+    social_prompt = f"""你是一個專業的社群媒體內容創作者。請根據摘要內容，為主題 "{state['topic']}" 創作社群媒體貼文。
 
 摘要內容：
 {state['summary']}
@@ -460,7 +990,7 @@ def social_media_writer_node(state: WorkflowState) -> WorkflowState:
    - 商業價值導向
    - 專業標籤
 
-每個平台的內容要符合其特色和用戶習慣。
+每個平台的內容要符合其特色和用戶習慣，並與同主題的60秒影片相互呼應。
 """
     
     try:
@@ -469,19 +999,26 @@ def social_media_writer_node(state: WorkflowState) -> WorkflowState:
             HumanMessage(content=f"請為主題 '{state['topic']}' 創作多平台社群媒體內容")
         ]
         
-        response = llm.invoke(messages)
-        state['social_media'] = response.content
+        social_media = cached_invoke(
+            llm, messages, "write_social", f"{state['topic']}\n{state['summary']}"
+        )
         logging.info("✅ 成功創作社群媒體內容")
         
     except Exception as e:
-        state['social_media'] = f"社群媒體內容創作過程中出現錯誤：{str(e)}"
+        social_media = f"社群媒體內容創作過程中出現錯誤：{str(e)}"
         logging.error(f"❌ 社群媒體內容創作失敗: {e}")
     
-    return state
+    return {'social_media': social_media}
+
+
+def _route_start(state: WorkflowState) -> str:
+    """沒有趨勢URL時略過分析、生成與執行爬蟲三個節點，直接進入摘要"""
+    return "analyze_urls" if state['trend_urls'] else "summarize"
 
 
 def create_langgraph_workflow():
     """創建 LangGraph 工作流程"""
+    from langgraph.graph import END, StateGraph
     
     # 創建狀態圖
     workflow = StateGraph(WorkflowState)
@@ -495,17 +1032,58 @@ def create_langgraph_workflow():
     workflow.add_node("write_social", social_media_writer_node)
     
     # 設定流程邊
-    workflow.set_entry_point("analyze_urls")
+    workflow.set_conditional_entry_point(_route_start, ["analyze_urls", "summarize"])
     workflow.add_edge("analyze_urls", "generate_code")
     workflow.add_edge("generate_code", "execute_code")
     workflow.add_edge("execute_code", "summarize")
+    # 腳本與社群內容都只依賴摘要，從 summarize 分支後並行執行
     workflow.add_edge("summarize", "write_script")
-    workflow.add_edge("write_script", "write_social")
-    workflow.set_finish_point("write_social")
+    workflow.add_edge("summarize", "write_social")
+    workflow.add_edge("write_script", END)
+    workflow.add_edge("write_social", END)
     
     return workflow.compile()
 
 
+def _initial_state(topic: str, trend_urls: List[str], progress_callback) -> WorkflowState:
+    """建立工作流程的初始狀態"""
+    return WorkflowState(
+        topic=topic,
+        trend_urls=trend_urls,
+        website_analyses=[],
+        scraping_codes=[],
+        scraped_data=[],
+        summary="",
+        video_script="",
+        social_media="",
+        progress_callback=progress_callback,
+        error_messages=[]
+    )
+
+
+def _workflow_result(final_state: Dict) -> Dict:
+    """將最終狀態整理成返回給呼叫端的結果"""
+    return {
+        "video_script": final_state.get('video_script', '影片腳本生成失敗'),
+        "social_media": final_state.get('social_media', '社群媒體內容生成失敗'),
+        "summary": final_state.get('summary', ''),
+        "scraped_data_count": len([d for d in final_state.get('scraped_data', []) if d.get('execution_success')]),
+        "processed_urls": [analysis['url'] for analysis in final_state.get('website_analyses', [])]
+    }
+
+
+def _failed_result(error: Exception) -> Dict:
+    """工作流程執行失敗時返回的結果"""
+    logging.error(f"❌ LangGraph 工作流程執行失敗: {error}")
+    return {
+        "video_script": f"工作流程執行失敗：{str(error)}",
+        "social_media": f"工作流程執行失敗：{str(error)}",
+        "summary": "",
+        "scraped_data_count": 0,
+        "processed_urls": []
+    }
+
+
 def run_langgraph_workflow(topic: str, trend_urls: List[str], progress_callback=None) -> Dict[str, str]:
     """
     使用 LangGraph 執行完整的工作流程
@@ -522,47 +1100,67 @@ def run_langgraph_workflow(topic: str, trend_urls: List[str], progress_callback=
         # 創建工作流程
         workflow = create_langgraph_workflow()
         
-        # 初始化狀態
-        initial_state = WorkflowState(
-            topic=topic,
-            trend_urls=trend_urls,
-            website_analyses=[],
-            scraping_codes=[],
-            scraped_data=[],
-            summary="",
-            video_script="",
-            social_media="",
-            progress_callback=progress_callback,
-            error_messages=[]
-        )
-        
         if progress_callback:
             progress_callback("🚀 啟動 LangGraph 工作流程...")
         
         # 執行工作流程
-        final_state = workflow.invoke(initial_state)
+        final_state = workflow.invoke(_initial_state(topic, trend_urls, progress_callback))
         
         if progress_callback:
             progress_callback("✅ LangGraph 工作流程執行完成！")
         
-        # 返回結果
-        return {
-            "video_script": final_state.get('video_script', '影片腳本生成失敗'),
-            "social_media": final_state.get('social_media', '社群媒體內容生成失敗'),
-            "summary": final_state.get('summary', ''),
-            "scraped_data_count": len([d for d in final_state.get('scraped_data', []) if d.get('execution_success')]),
-            "processed_urls": [analysis['url'] for analysis in final_state.get('website_analyses', [])]
-        }
+        return _workflow_result(final_state)
         
     except Exception as e:
-        logging.error(f"❌ LangGraph 工作流程執行失敗: {e}")
-        return {
-            "video_script": f"工作流程執行失敗：{str(e)}",
-            "social_media": f"工作流程執行失敗：{str(e)}",
-            "summary": "",
-            "scraped_data_count": 0,
-            "processed_urls": []
-        }
+        return _failed_result(e)
+
+
+# 串流時轉送 LLM 片段的節點，以及片段所屬的結果欄位
+_STREAMED_NODES = {"summarize": "summary", "write_script": "video_script", "write_social": "social_media"}
+
+
+def stream_langgraph_workflow(topic: str, trend_urls: List[str], progress_callback=None) -> Iterator[Dict]:
+    """
+    執行 LangGraph 工作流程，並在摘要與寫作節點生成內容時逐段產生事件，讓呼叫端不必等整個流程結束才顯示內容
+    
+    事件在呼叫端的執行緒中產生（並行的寫作節點由 LangGraph 轉送），可以直接更新 Streamlit 元素。
+    快取命中的回應不會分段，只會出現在最後的結果中。
+    
+    Args:
+        topic (str): 主題
+        trend_urls (List[str]): 趨勢URL列表
+        progress_callback (callable): 進度回調函數
+    
+    Yields:
+        Dict: {'stage': 'summary'、'video_script' 或 'social_media', 'delta': 新生成的文字}；
+            最後一個事件為 {'stage': 'result', 'result': 與 run_langgraph_workflow 相同的字典}
+    """
+    try:
+        workflow = create_langgraph_workflow()
+        final_state = _initial_state(topic, trend_urls, progress_callback)
+        
+        if progress_callback:
+            progress_callback("🚀 啟動 LangGraph 工作流程...")
+        
+        # messages 模式轉送節點內 LLM 的串流片段，values 模式提供每一步之後的完整狀態
+        for mode, payload in workflow.stream(final_state, stream_mode=["messages", "values"]):
+            if mode == "values":
+                final_state = payload
+                continue
+            chunk, metadata = payload
+            stage = _STREAMED_NODES.get(metadata.get("langgraph_node"))
+            if stage and isinstance(chunk.content, str) and chunk.content:
+                yield {'stage': stage, 'delta': chunk.content}
+        
+        if progress_callback:
+            progress_callback("✅ LangGraph 工作流程執行完成！")
+        
+        result = _workflow_result(final_state)
+        
+    except Exception as e:
+        result = _failed_result(e)
+    
+    yield {'stage': 'result', 'result': result}
 
 
 if __name__ == '__main__':
@@ -1,8 +1,11 @@
+import asyncio
+import importlib
+import json
 import logging
-from typing import Dict, List
-
-import autogen
-from autogen import Agent, AssistantAgent, UserProxyAgent, GroupChat, GroupChatManager
+import re
+import threading
+from functools import lru_cache, partial
+from typing import TYPE_CHECKING, Callable, Dict, List, NamedTuple, Optional, Tuple
 
 from config import settings
 from config.agents_config import (
@@ -43,20 +46,71 @@ COORDINATOR_PROMPT = """
 
 如果發現任何問題，請明確指出需要改進的地方，並要求相關 Agent 修正。
 """
-from tools.web_search import WebSearch
-from tools.web_scraper_tools import fetch_webpage, execute_python_code, validate_scraped_data, generate_scraping_template
+from utils.cache import AutoGenResponseCache, PromptCache
+
+if TYPE_CHECKING:
+    from autogen import AssistantAgent, UserProxyAgent
+    from tools.web_search import WebSearch
+
+# autogen 匯入約需 1.5 秒，與工具模組一起延遲到第一次執行工作流程或呼叫工具時才載入
+_LAZY_IMPORTS = {
+    "AssistantAgent": "autogen",
+    "UserProxyAgent": "autogen",
+    "WebSearch": "tools.web_search",
+    "fetch_webpage": "tools.web_scraper_tools",
+    "execute_python_code": "tools.web_scraper_tools",
+    "validate_scraped_data": "tools.web_scraper_tools",
+    "generate_scraping_template": "tools.web_scraper_tools",
+}
+
+
+def _load_lazy_imports() -> None:
+    """將 _LAZY_IMPORTS 中尚未載入的名稱放入模組命名空間（已存在的名稱，例如測試替換的物件，保持不變）"""
+    namespace = globals()
+    for name, module_name in _LAZY_IMPORTS.items():
+        if name not in namespace:
+            namespace[name] = getattr(importlib.import_module(module_name), name)
+
+
+def __getattr__(name: str):
+    if name in _LAZY_IMPORTS:
+        _load_lazy_imports()
+        return globals()[name]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 
 logging.basicConfig(level=logging.INFO)
 
 
+@lru_cache(maxsize=4)
+def _get_web_search(api_key: str) -> "WebSearch":
+    """
+    取得共用的 WebSearch，跨工作流程重用同一個 Tavily 客戶端
+
+    以金鑰為快取鍵：側邊欄更新 Tavily 金鑰後會建立新的實例。
+
+    Args:
+        api_key (str): 目前設定的 Tavily API 金鑰
+
+    Returns:
+        WebSearch: 網路搜尋工具
+    """
+    _load_lazy_imports()
+    return WebSearch()
+
+
+@lru_cache(maxsize=1)
 def get_llm_config() -> Dict:
     """
     Constructs the language model configuration for AutoGen agents.
 
+    The settings do not change within a process, so the configuration is built once and the
+    same dictionary is shared by every agent; copy it before changing any value.
+
     Returns:
         Dict: A dictionary containing the LLM configuration.
     """
-    return {
+    llm_config = {
         "model": settings.OPENAI_MODEL_NAME,
         "api_key": settings.OPENAI_API_KEY,
         "base_url": settings.OPENAI_API_BASE,
@@ -64,38 +118,449 @@ def get_llm_config() -> Dict:
                 "chat_template_kwargs": {"enable_thinking": False},
                 },
     }
+    if settings.LLM_TEMPERATURE is not None:
+        llm_config["temperature"] = settings.LLM_TEMPERATURE
+    return llm_config
+
+
+# AutoGen 回應的磁碟快取（temperature 為 0 或設定 LLM_CACHE_SEED 時才會使用），與 LangGraph 流程共用同一個資料夾
+_RESPONSE_STORE = PromptCache(settings.LLM_CACHE_DIR)
+
+
+# 各階段雙人對話的最大往返次數，即該階段 Agent 最多回覆（呼叫 LLM）的次數
+# 研究：一次搜尋工具呼叫 + 整理結果；爬蟲：最多兩次獲取網頁 + 整理結果；其餘 Agent 只回覆一次
+_RESEARCH_MAX_TURNS = 2
+_SCRAPE_MAX_TURNS = 3
+_SINGLE_REPLY_TURNS = 1
+
+
+# 無法提取內容時返回的預設文字
+_FALLBACK_CONTENT = "內容生成過程中出現問題，請重新嘗試。"
+
+
+# 出現任一標記即結束對話
+_TERMINATION_MARKERS = ("===FINAL_OUTPUT_END===", "WORKFLOW_COMPLETE", "FINAL_CONTENT")
+
+
+def _is_termination_msg(message: Dict) -> bool:
+    """
+    訊息內容包含任一結束標記時返回 True
+    """
+    content = message.get("content")
+    if not content or not isinstance(content, str):
+        return False
+    return any(marker in content for marker in _TERMINATION_MARKERS)
+
+
+# 會呼叫工具的階段 Agent：回覆純文字（非工具呼叫）即代表該階段已產出結果
+_TOOL_PHASE_AGENTS = ("Trend_Researcher", "Web_Scraper")
+
+
+def _phase_complete_check(agent_names: Tuple[str, ...]) -> Callable[[Dict], bool]:
+    """
+    建立 user_proxy 的結束判斷：收到結束標記，或 agent_names 中的 Agent 回覆純文字時結束對話
+
+    AutoGen 以此判斷 user_proxy 收到的訊息，訊息的 name 為發送該訊息的 Agent。
+    """
+    names = frozenset(agent_names)
+    return lambda message: _is_termination_msg(message) or (
+        message.get("name") in names
+        and not message.get("tool_calls")
+        and not message.get("function_call")
+    )
+
+
+# 最終輸出的標記：（影片腳本開始, 結束, 社群內容開始, 結束），依序為目前格式與舊格式
+_OUTPUT_MARKERS = (
+    ("@@VIDEO_SCRIPT@@", "@@VIDEO_SCRIPT_END@@", "@@SOCIAL_MEDIA@@", "@@SOCIAL_MEDIA_END@@"),
+    ("---VIDEO_SCRIPT_START---", "---VIDEO_SCRIPT_END---", "---SOCIAL_MEDIA_START---", "---SOCIAL_MEDIA_END---"),
+)
+_SCRIPT_KEYWORDS = ("腳本", "script", "影片", "video", "旁白", "開場")
+_SOCIAL_KEYWORDS = ("社群", "social", "instagram", "facebook", "twitter", "linkedin", "貼文")
+
+# 關鍵字合併成單一不分大小寫的正則，一次掃描訊息即可判斷，不必為每個關鍵字重新轉小寫
+_SCRIPT_KEYWORDS_RE = re.compile("|".join(map(re.escape, _SCRIPT_KEYWORDS)), re.IGNORECASE)
+_SOCIAL_KEYWORDS_RE = re.compile("|".join(map(re.escape, _SOCIAL_KEYWORDS)), re.IGNORECASE)
+
+
+def _between(content: str, start_marker: str, end_marker: str, position: int = 0):
+    """
+    以 str.find 取出兩個標記之間的文字，只複製一次子字串（不建立 split 產生的串列）
+
+    Args:
+        content (str): 訊息內容
+        start_marker (str): 開始標記
+        end_marker (str): 結束標記
+        position (int): 開始搜尋的位置
+
+    Returns:
+        tuple: （標記之間的文字, 結束標記之後的位置）；找不到完整標記時為 (None, -1)
+    """
+    start = content.find(start_marker, position)
+    if start < 0:
+        return None, -1
+    start += len(start_marker)
+    end = content.find(end_marker, start)
+    if end < 0:
+        return None, -1
+    return content[start:end], end + len(end_marker)
+
+
+def _parse_final_output(content: str) -> Optional[Dict[str, str]]:
+    """
+    從單一訊息中解析標記包住的影片腳本與社群內容
+
+    Args:
+        content (str): 訊息內容
+
+    Returns:
+        Optional[Dict[str, str]]: 包含 video_script 與 social_media；找不到完整標記時返回 None
+    """
+    for script_start, script_end, social_start, social_end in _OUTPUT_MARKERS:
+        video_script, end = _between(content, script_start, script_end)
+        if video_script is None:
+            continue
+        social_media, _ = _between(content, social_start, social_end, end)
+        if social_media is not None:
+            return {"video_script": video_script.strip(), "social_media": social_media.strip()}
+    return None
+
+
+def _extract_content_from_messages(messages: List[Dict]) -> Dict[str, str]:
+    """從消息歷史中智能提取內容"""
+    video_script = None
+    social_media = None
+    
+    # 從最新消息開始檢查，找到完整標記就直接返回
+    for msg in reversed(messages):
+        content = msg.get("content") or ""
+        sender = msg.get("name", "")
+        
+        extracted_content = _parse_final_output(content)
+        if extracted_content:
+            return extracted_content
+        
+        # 智能識別內容類型
+        if sender == "Script_Writer" and len(content) > 100:
+            if not video_script and _SCRIPT_KEYWORDS_RE.search(content):
+                video_script = content
+                
+        elif sender == "Social_Media_Writer" and len(content) > 50:
+            if not social_media and _SOCIAL_KEYWORDS_RE.search(content):
+                social_media = content
+    
+    return {
+        "video_script": video_script or "無法提取影片腳本內容",
+        "social_media": social_media or "無法提取社群媒體內容"
+    }
+
+
+# 搜尋結果中每筆 content 提供給 LLM 的最大字元數
+_MAX_RESULT_CONTENT_CHARS = 1000
+
+
+def _serialize_search_results(results: List[Dict]) -> str:
+    """
+    將搜尋結果序列化為精簡 JSON，並截斷過長的 content，減少研究員的輸入 token
+
+    Args:
+        results (List[Dict]): WebSearch.search 的結果
+
+    Returns:
+        str: 不含多餘空白、保留中文原字元的 JSON 字串
+    """
+    trimmed = [
+        {
+            key: value[:_MAX_RESULT_CONTENT_CHARS] if key == "content" and isinstance(value, str) else value
+            for key, value in result.items()
+        }
+        for result in results or ()
+    ]
+    return json.dumps(trimmed, ensure_ascii=False, separators=(",", ":"), default=str)
+
+
+async def _run_blocking(func, *args, **kwargs):
+    """在預設執行緒池中執行阻塞函數，讓事件迴圈可以同時處理其他工作流程"""
+    return await asyncio.get_running_loop().run_in_executor(None, partial(func, *args, **kwargs))
+
+
+async def _fetch_one(semaphore: asyncio.Semaphore, url: str) -> str:
+    """在信號量限制下，於執行緒池中獲取單一網頁"""
+    _load_lazy_imports()
+    async with semaphore:
+        return await _run_blocking(fetch_webpage, url)
+
+
+async def a_fetch_webpage_batch(urls: List[str], max_concurrency: int = 5) -> List[str]:
+    """
+    並行獲取多個網頁，同時進行的請求數不超過 max_concurrency
+
+    Args:
+        urls (List[str]): 目標網頁 URL 列表
+        max_concurrency (int): 最大並行請求數
+
+    Returns:
+        List[str]: 與 urls 順序相同的 HTML 內容（失敗時為 fetch_webpage 的錯誤訊息）
+    """
+    semaphore = asyncio.Semaphore(max_concurrency)
+    return await asyncio.gather(*(_fetch_one(semaphore, url) for url in urls))
+
+
+# 各 Agent 送出回覆時的即時進度訊息
+_AGENT_PROGRESS_MESSAGES = {
+    "Trend_Researcher": "📚 Trend_Researcher 已整理研究結果",
+    "Web_Scraper": "🕷️ Web_Scraper 已完成網頁分析",
+    "Script_Writer": "🎬 Script_Writer 已完成影片腳本",
+    "Social_Media_Writer": "📱 Social_Media_Writer 已完成社群文案",
+    "Workflow_Coordinator": "✅ Workflow_Coordinator 已完成品質檢查",
+}
+_PROGRESS_HOOK = "process_message_before_send"
+
+
+def _make_progress_hook(progress_callback: Callable[[str], None]):
+    """
+    建立在 Agent 送出回覆當下回報進度的 AutoGen hook
+
+    Args:
+        progress_callback (Callable[[str], None]): 進度回報函數
+
+    Returns:
+        callable: 可註冊為 process_message_before_send 的 hook，原樣返回訊息
+    """
+    def hook(sender, message, recipient, silent):
+        # 工具呼叫由各工具自行回報進度，這裡只回報文字回覆
+        is_tool_call = isinstance(message, dict) and (message.get("tool_calls") or message.get("function_call"))
+        if not is_tool_call and sender.name in _AGENT_PROGRESS_MESSAGES:
+            progress_callback(_AGENT_PROGRESS_MESSAGES[sender.name])
+        return message
+
+    return hook
+
+
+class _PooledAgents(NamedTuple):
+    """與主題無關、可跨工作流程重用的 Agent"""
+    script_writer: "AssistantAgent"
+    social_writer: "AssistantAgent"
+    web_scraper: "AssistantAgent"
+    coordinator: "AssistantAgent"
+
+
+class _AgentPool:
+    """
+    重用與主題無關的 Agent，省去每次工作流程建立 Agent（含 LLM client）的成本
+
+    每組 Agent 同時只借給一個工作流程；依 llm_config 分組，設定不同的 Agent 不會互相混用。
+    """
+
+    def __init__(self):
+        self._idle: Dict[str, List[_PooledAgents]] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(llm_config: Dict) -> str:
+        return json.dumps(llm_config, sort_keys=True, default=str)
+
+    def acquire(self, llm_config: Dict) -> _PooledAgents:
+        """取出一組閒置的 Agent，沒有時建立新的一組"""
+        with self._lock:
+            idle = self._idle.get(self._key(llm_config))
+            if idle:
+                return idle.pop()
+
+        _load_lazy_imports()
+        return _PooledAgents(
+            script_writer=AssistantAgent(
+                name="Script_Writer",
+                system_message=SCRIPT_WRITER_PROMPT,
+                llm_config=llm_config,
+            ),
+            social_writer=AssistantAgent(
+                name="Social_Media_Writer",
+                system_message=SOCIAL_WRITER_PROMPT,
+                llm_config=llm_config,
+            ),
+            web_scraper=AssistantAgent(
+                name="Web_Scraper",
+                system_message=WEB_SCRAPER_PROMPT,
+                llm_config=llm_config,
+            ),
+            coordinator=AssistantAgent(
+                name="Workflow_Coordinator",
+                system_message=COORDINATOR_PROMPT,
+                llm_config=llm_config,
+            ),
+        )
+
+    def release(self, llm_config: Dict, agents: _PooledAgents) -> None:
+        """重置 Agent 的對話狀態並移除本次註冊的進度 hook 後放回池中"""
+        for agent in agents:
+            agent.reset()
+            agent.hook_lists[_PROGRESS_HOOK].clear()
+        with self._lock:
+            self._idle.setdefault(self._key(llm_config), []).append(agents)
+
+    def clear(self) -> None:
+        """丟棄所有閒置的 Agent"""
+        with self._lock:
+            self._idle.clear()
+
+
+_AGENT_POOL = _AgentPool()
+
+
+def _run_sync(coroutine):
+    """在同步程式碼中執行協程並返回結果"""
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coroutine)
+
+    # 呼叫端已有執行中的事件迴圈時，改在獨立執行緒的新迴圈中執行
+    result = {}
+
+    def runner():
+        try:
+            result["value"] = asyncio.run(coroutine)
+        except BaseException as e:
+            result["error"] = e
+
+    thread = threading.Thread(target=runner, name="autogen-workflow")
+    thread.start()
+    thread.join()
+    if "error" in result:
+        raise result["error"]
+    return result["value"]
 
 
 def run_workflow(topic: str, progress_callback=None, selected_topic_data: dict = None) -> Dict[str, str]:
     """
+    Synchronous entry point for :func:`a_run_workflow`.
+
+    Args:
+        topic (str): The topic to research and write about.
+        progress_callback (callable, optional): Function to call with progress updates.
+        selected_topic_data (dict, optional): Complete topic data including news URLs from trends.
+
+    Returns:
+        Dict[str, str]: A dictionary containing the generated 'video_script' and 'social_media' content.
+    """
+    return _run_sync(a_run_workflow(topic, progress_callback, selected_topic_data))
+
+
+def run_workflow_parallel(topic: str, k: int = 2, progress_callback=None,
+                          selected_topic_data: dict = None) -> Dict[str, str]:
+    """
+    Synchronous entry point for :func:`a_run_workflow_parallel`.
+
+    Args:
+        topic (str): The topic to research and write about.
+        k (int): Number of independent workflow instances to run.
+        progress_callback (callable, optional): Function to call with progress updates.
+        selected_topic_data (dict, optional): Complete topic data including news URLs from trends.
+
+    Returns:
+        Dict[str, str]: The content of the first instance that finished successfully.
+    """
+    return _run_sync(a_run_workflow_parallel(topic, k, progress_callback, selected_topic_data))
+
+
+async def a_run_workflow_parallel(topic: str, k: int = 2, progress_callback=None,
+                                  selected_topic_data: dict = None) -> Dict[str, str]:
+    """
+    Runs k independent workflow instances concurrently and returns the first successful result.
+
+    Each instance builds its own agents and uses a different sampling seed, so a stalled or
+    poor run does not hold up the result; the remaining instances are cancelled once one succeeds.
+
+    Args:
+        topic (str): The topic to research and write about.
+        k (int): Number of independent workflow instances to run.
+        progress_callback (callable, optional): Function to call with progress updates.
+        selected_topic_data (dict, optional): Complete topic data including news URLs from trends.
+
+    Returns:
+        Dict[str, str]: The content of the first instance that finished successfully, or the
+        last finished instance's content when none succeeded.
+    """
+    def instance_callback(index: int):
+        if not progress_callback:
+            return None
+        return lambda message: progress_callback(f"[#{index + 1}] {message}")
+
+    tasks = {
+        asyncio.ensure_future(a_run_workflow(
+            topic, instance_callback(index), selected_topic_data, llm_config_overrides={"seed": index}
+        )): index
+        for index in range(k)
+    }
+    pending = set(tasks)
+    result = None
+    try:
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is not None:
+                    logging.error(f"❌ 工作流程實例 #{tasks[task] + 1} 失敗: {task.exception()}")
+                    continue
+                result = task.result()
+                if _FALLBACK_CONTENT not in result.values():
+                    logging.info(f"✅ 工作流程實例 #{tasks[task] + 1} 最先完成")
+                    if progress_callback:
+                        progress_callback(f"🏁 工作流程實例 #{tasks[task] + 1} 最先完成")
+                    return result
+    finally:
+        for task in pending:
+            task.cancel()
+
+    if result is None:
+        raise RuntimeError(f"所有 {k} 個工作流程實例都執行失敗")
+    return result
+
+
+async def a_run_workflow(topic: str, progress_callback=None, selected_topic_data: dict = None,
+                         llm_config_overrides: Optional[Dict] = None) -> Dict[str, str]:
+    """
     Orchestrates the collaboration between AI agents to generate content for a given topic.
 
+    The agents run in phases: research, then web scraping (which depends on the research), then
+    the script and social media writers concurrently (both only depend on the research and
+    scraping results), and finally the coordinator's validation.
+
     Args:
         topic (str): The topic to research and write about.
         progress_callback (callable, optional): Function to call with progress updates.
         selected_topic_data (dict, optional): Complete topic data including news URLs from trends.
+        llm_config_overrides (Dict, optional): Extra LLM settings for this run, e.g. a sampling seed.
 
     Returns:
         Dict[str, str]: A dictionary containing the generated 'video_script' and 'social_media' content.
     """
     llm_config = get_llm_config()
+    if llm_config_overrides:
+        llm_config = {**llm_config, **llm_config_overrides}
+    response_cache = AutoGenResponseCache(_RESPONSE_STORE, seed=settings.LLM_CACHE_SEED)
+    _load_lazy_imports()
     
     # 初始化進度追蹤
     if progress_callback:
         progress_callback("🚀 初始化 AI Agents...")
     
     # Initialize the web search tool
-    web_search_tool = WebSearch()
+    web_search_tool = _get_web_search(settings.TAVILY_API_KEY)
+
+    # 提取趨勢新聞 URL（每次工作流程只需一次，搜尋工具可能被呼叫多次）
+    trend_urls = [
+        news['url'] for news in (selected_topic_data or {}).get('news_items') or [] if news.get('url')
+    ]
+    if trend_urls:
+        if progress_callback:
+            progress_callback(f"🗞️ 發現 {len(trend_urls)} 個趨勢相關新聞，將在研究時爬取最新內容...")
+        logging.info(f"從趨勢數據提取到 {len(trend_urls)} 個相關新聞URL")
 
     # Define the UserProxyAgent that will execute function calls
     user_proxy = UserProxyAgent(
         name="user_proxy",
-        is_termination_msg=lambda x: (
-            x.get("content", "") and 
-            ("===FINAL_OUTPUT_END===" in x.get("content", "") or 
-             "WORKFLOW_COMPLETE" in x.get("content", "") or 
-             "FINAL_CONTENT" in x.get("content", ""))
-        ),
+        is_termination_msg=_phase_complete_check(_TOOL_PHASE_AGENTS),
         human_input_mode="NEVER",
         max_consecutive_auto_reply=20,
         code_execution_config=False,
@@ -109,44 +574,49 @@ def run_workflow(topic: str, progress_callback=None, selected_topic_data: dict =
     )
     
     # Register the search function for the researcher
-    def search_for_topic(query: str) -> str:
+    # 工具函數都是 async：阻塞的網路請求與程式執行交給執行緒池，進度回報仍在事件迴圈的執行緒上
+    async def search_for_topic(query: str) -> str:
         """Function to be called by the researcher agent to search the web."""
-        # 提取趨勢新聞 URL
-        trend_urls = []
-        if selected_topic_data and selected_topic_data.get('news_items'):
-            trend_urls = [news.get('url') for news in selected_topic_data['news_items'] if news.get('url')]
-            if progress_callback and trend_urls:
-                progress_callback(f"🗞️ 發現 {len(trend_urls)} 個趨勢相關新聞，正在爬取最新內容...")
-            logging.info(f"從趨勢數據提取到 {len(trend_urls)} 個相關新聞URL")
-        
-        results = web_search_tool.search(query, trend_urls=trend_urls)
+        results = await _run_blocking(web_search_tool.search, query, trend_urls=trend_urls)
         
         if progress_callback:
-            total_results = len(results) if results else 0
-            trend_count = sum(1 for r in results if r.get('source') == 'Trending News')
-            tavily_count = sum(1 for r in results if r.get('source') == 'Tavily')
+            # 單次走訪同時統計各來源數量
+            total_results = trend_count = tavily_count = 0
+            for r in results or ():
+                total_results += 1
+                source = r.get('source')
+                trend_count += source == 'Trending News'
+                tavily_count += source == 'Tavily'
             progress_callback(f"📚 研究完成：獲取 {total_results} 個資料來源 (最新新聞: {trend_count}, Tavily: {tavily_count})")
         
-        return str(results)
+        return _serialize_search_results(results)
 
     # 為 Web Scraper 定義工具函數
-    def fetch_webpage_content(url: str) -> str:
+    async def fetch_webpage_content(url: str) -> str:
         """由 Web Scraper Agent 調用來獲取網頁內容"""
         if progress_callback:
             progress_callback(f"🌐 正在獲取網頁: {url}")
-        return fetch_webpage(url)
+        return await _run_blocking(fetch_webpage, url)
+
+    async def fetch_webpage_batch(urls: List[str]) -> str:
+        """由 Web Scraper Agent 調用來一次並行獲取多個網頁，返回以 URL 為鍵的 JSON"""
+        if progress_callback:
+            progress_callback(f"🌐 正在並行獲取 {len(urls)} 個網頁...")
+        pages = await a_fetch_webpage_batch(urls)
+        return json.dumps(dict(zip(urls, pages)), ensure_ascii=False)
     
-    def execute_scraping_code(code: str) -> str:
+    async def execute_scraping_code(code: str) -> str:
         """由 Web Scraper Agent 調用來執行爬蟲程式碼"""
         if progress_callback:
             progress_callback("🔧 執行自定義爬蟲程式碼...")
-        result = execute_python_code(code)
+        result = await _run_blocking(execute_python_code, code)
         return str(result)
     
     user_proxy.register_function(
         function_map={
             "search_for_topic": search_for_topic,
             "fetch_webpage_content": fetch_webpage_content,
+            "fetch_webpage_batch": fetch_webpage_batch,
             "execute_scraping_code": execute_scraping_code
         }
     )
@@ -158,62 +628,117 @@ def run_workflow(topic: str, progress_callback=None, selected_topic_data: dict =
     )
 
 
-    # Define the Script Writer Agent
-    script_writer = AssistantAgent(
-        name="Script_Writer",
-        system_message=SCRIPT_WRITER_PROMPT,
-        llm_config=llm_config,
-    )
-
-    # Define the Social Media Writer Agent
-    social_writer = AssistantAgent(
-        name="Social_Media_Writer",
-        system_message=SOCIAL_WRITER_PROMPT,
-        llm_config=llm_config,
-    )
-
-    # Define the Web Scraper Agent
-    web_scraper = AssistantAgent(
-        name="Web_Scraper",
-        system_message=WEB_SCRAPER_PROMPT,
-        llm_config=llm_config,
-    )
+    # 其餘 Agent 與主題無關，從池中取用；researcher 與 user_proxy 帶有本次的主題與工具，每次重新建立
+    pooled_agents = _AGENT_POOL.acquire(llm_config)
+    script_writer, social_writer, web_scraper, coordinator = pooled_agents
     
     # Register web scraping functions for the Web Scraper Agent
+    # 工具綁定本次的進度回報，重用的 Agent 也要每次重新註冊
     web_scraper.register_function(
         function_map={
             "fetch_webpage_content": fetch_webpage_content,
+            "fetch_webpage_batch": fetch_webpage_batch,
             # "execute_scraping_code": execute_scraping_code
         }
     )
 
-    # Define the Workflow Coordinator Agent
-    coordinator = AssistantAgent(
-        name="Workflow_Coordinator",
-        system_message=COORDINATOR_PROMPT,
-        llm_config=llm_config,
-    )
-    
     if progress_callback:
+        # 每個 Agent 回覆時立即回報進度，不必等整個對話結束後再掃描訊息
+        progress_hook = _make_progress_hook(progress_callback)
+        for agent in (researcher, *pooled_agents):
+            agent.register_hook(_PROGRESS_HOOK, progress_hook)
         progress_callback("🤖 AI Agents 組建完成，開始協作...")
 
-    # Create the GroupChat and Manager
-    agents: List[Agent] = [user_proxy, researcher, web_scraper, script_writer, social_writer, coordinator]
-    groupchat = GroupChat(agents=agents, messages=[], max_round=20)
-    manager = GroupChatManager(groupchat=groupchat, llm_config=llm_config)
+    async def run_phase(agent: "AssistantAgent", message: str, max_turns: int) -> str:
+        # 每個階段只需要最後的回覆；結束後清除雙方的對話紀錄，避免工具回傳的網頁 HTML
+        # 等大型內容在整個工作流程期間一直留在記憶體中
+        chat_result = await user_proxy.a_initiate_chat(
+            agent, message=message, max_turns=max_turns, cache=response_cache
+        )
+        user_proxy.clear_history(agent)
+        agent.clear_history(user_proxy)
+        return chat_result.summary or ""
+
+    # 階段1：主題研究
+    if progress_callback:
+        progress_callback("🔍 Trend_Researcher 正在研究主題...")
 
-    # Initial message to kick off the process
-    initial_message = f"""
+    research = await run_phase(
+        researcher,
+        f"""
     主題選定："{topic}"
 
-    工作流程計劃：
-    1.  **Trend_Researcher**: 使用 `search_for_topic` 工具研究主題 '{topic}'。將發現整理成結構化 JSON 格式，包含關鍵點、統計資料和來源。
-    2.  **Web_Scraper**: 針對研究過程中發現的重要 URL，使用 `fetch_webpage_content` 獲取網頁，分析結構後用 `execute_scraping_code` 執行客製化爬蟲程式碼，提供更詳細的結構化資料。
-    3.  **Script_Writer**: 研究和爬蟲完成後，使用所有結構化資料撰寫 60 秒影片腳本。
-    4.  **Social_Media_Writer**: 根據研究、爬蟲資料和影片腳本，為 Instagram/Facebook、X/Twitter 和 LinkedIn 創作社群媒體文案。
-    5.  **Workflow_Coordinator**: 監控所有任務進度，確保品質，當所有工作完成時宣布 "WORKFLOW_COMPLETE" 並要求 user_proxy 格式化輸出。
-    5.  **user_proxy**: 當協調者確認工作完成後，必須按照以下精確格式整理最終輸出：
-        
+    請使用 `search_for_topic` 工具研究主題 '{topic}'，將發現整理成結構化 JSON 格式，包含關鍵點、統計資料和來源（含重要的 URL）。
+    """,
+        _RESEARCH_MAX_TURNS,
+    )
+
+    # 階段2：爬取研究中發現的網頁（依賴研究結果中的 URL，必須在研究之後）
+    if progress_callback:
+        progress_callback("🕷️ Web_Scraper 正在分析和爬取網頁...")
+
+    scraped_data = await run_phase(
+        web_scraper,
+        f"""
+    主題："{topic}"
+
+    以下是 Trend_Researcher 的研究結果：
+    {research}
+
+    請針對其中重要的 URL 獲取網頁並分析結構，提供更詳細的結構化資料。有多個 URL 時請用一次 `fetch_webpage_batch` 呼叫同時獲取，只有單一 URL 時才使用 `fetch_webpage_content`。
+    """,
+        _SCRAPE_MAX_TURNS,
+    )
+    shared_context = {"research": research, "scraped_data": scraped_data}
+
+    # 階段3：兩位寫手都只依賴研究與爬蟲資料，並行創作
+    if progress_callback:
+        progress_callback("🎬📱 Script_Writer 與 Social_Media_Writer 正在並行創作內容...")
+
+    async def run_writer(writer: "AssistantAgent", task: str) -> str:
+        # 單一寫手失敗時保留錯誤訊息，不影響另一位寫手
+        try:
+            return await run_phase(
+                writer,
+                f"""
+    主題："{topic}"
+
+    研究資料：
+    {shared_context['research']}
+
+    爬蟲資料：
+    {shared_context['scraped_data']}
+
+    {task}
+    """,
+                _SINGLE_REPLY_TURNS,
+            )
+        except Exception as e:
+            logging.error(f"❌ {writer.name} 創作失敗: {e}")
+            return f"{writer.name} 創作過程中出現錯誤：{str(e)}"
+
+    video_draft, social_draft = await asyncio.gather(
+        run_writer(script_writer, "請使用以上所有結構化資料撰寫 60 秒影片腳本。"),
+        run_writer(social_writer, "請根據以上資料，為 Instagram/Facebook、X/Twitter 和 LinkedIn 創作社群媒體文案。"),
+    )
+
+    # 階段4：協調者檢查品質並整理最終輸出
+    if progress_callback:
+        progress_callback("✅ Workflow_Coordinator 正在檢查所有任務...")
+
+    final_message = await run_phase(
+        coordinator,
+        f"""
+    主題："{topic}"
+
+    Script_Writer 的影片腳本：
+    {video_draft}
+
+    Social_Media_Writer 的社群媒體文案：
+    {social_draft}
+
+    請檢查以上內容，並按照以下精確格式整理最終輸出：
+
         ===FINAL_OUTPUT_START===
         @@VIDEO_SCRIPT@@
         [完整的60秒影片腳本內容]
@@ -222,138 +747,43 @@ def run_workflow(topic: str, progress_callback=None, selected_topic_data: dict =
         [完整的社群媒體文案內容]
         @@SOCIAL_MEDIA_END@@
         ===FINAL_OUTPUT_END===
-
-    請開始執行！
-    """
-    
-    if progress_callback:
-        progress_callback("🔍 Trend_Researcher 正在研究主題...")
-
-    # Start the chat
-    if progress_callback:
-        progress_callback("🔄 開始 AI Agents 協作對話...")
-    
-    user_proxy.initiate_chat(
-        manager,
-        message=initial_message,
+    """,
+        _SINGLE_REPLY_TURNS,
     )
-    
-    # 根據對話歷史更新進度
+    # 中途發生錯誤的 Agent 不放回池中，由垃圾回收處理
+    _AGENT_POOL.release(llm_config, pooled_agents)
+
     if progress_callback:
-        messages = groupchat.messages
-        for msg in messages[-10:]:  # 檢查最後10條消息
-            sender = msg.get("name", "")
-            content = msg.get("content", "")
-            
-            if sender == "Web_Scraper" and len(content) > 50:
-                progress_callback("🕷️ Web_Scraper 正在分析和爬取網頁...")
-            elif sender == "Script_Writer" and len(content) > 50:
-                progress_callback("🎬 Script_Writer 正在創作影片腳本...")
-            elif sender == "Social_Media_Writer" and len(content) > 50:
-                progress_callback("📱 Social_Media_Writer 正在撰寫社群文案...")
-            elif sender == "Workflow_Coordinator" and "WORKFLOW_COMPLETE" in content:
-                progress_callback("✅ Workflow_Coordinator 確認所有任務完成...")
-        
+        if llm_config.get("temperature") == 0 or response_cache.seed is not None:
+            progress_callback(
+                f"💾 LLM 快取：命中 {response_cache.stats['hits']} 次，未命中 {response_cache.stats['misses']} 次"
+            )
         progress_callback("📋 正在提取生成的內容...")
 
-    # Extract the final content with improved parsing logic
-    def extract_content_from_messages(messages: List[Dict]) -> Dict[str, str]:
-        """從消息歷史中智能提取內容"""
-        video_script = None
-        social_media = None
-        
-        # 檢查所有消息，尋找內容
-        for msg in reversed(messages):  # 從最新消息開始檢查
-            content = msg.get("content", "")
-            sender = msg.get("name", "")
-            
-            # 優先使用新格式
-            if "===FINAL_OUTPUT_START===" in content:
-                try:
-                    if "@@VIDEO_SCRIPT@@" in content and "@@SOCIAL_MEDIA@@" in content:
-                        video_part = content.split("@@VIDEO_SCRIPT@@")[1].split("@@VIDEO_SCRIPT_END@@")[0].strip()
-                        social_part = content.split("@@SOCIAL_MEDIA@@")[1].split("@@SOCIAL_MEDIA_END@@")[0].strip()
-                        return {"video_script": video_part, "social_media": social_part}
-                except (IndexError, AttributeError):
-                    continue
-            
-            # 嘗試舊格式
-            if "---VIDEO_SCRIPT_START---" in content:
-                try:
-                    video_part = content.split("---VIDEO_SCRIPT_START---")[1].split("---VIDEO_SCRIPT_END---")[0].strip()
-                    if len(video_part) > 50:
-                        video_script = video_part
-                except (IndexError, AttributeError):
-                    continue
-                    
-            if "---SOCIAL_MEDIA_START---" in content:
-                try:
-                    social_part = content.split("---SOCIAL_MEDIA_START---")[1].split("---SOCIAL_MEDIA_END---")[0].strip()
-                    if len(social_part) > 30:
-                        social_media = social_part
-                except (IndexError, AttributeError):
-                    continue
-            
-            # 智能識別內容類型
-            if sender == "Script_Writer" and len(content) > 100:
-                if not video_script and any(keyword in content.lower() for keyword in 
-                    ["腳本", "script", "影片", "video", "旁白", "開場"]):
-                    video_script = content
-                    
-            elif sender == "Social_Media_Writer" and len(content) > 50:
-                if not social_media and any(keyword in content.lower() for keyword in 
-                    ["社群", "social", "instagram", "facebook", "twitter", "linkedin", "貼文"]):
-                    social_media = content
-        
-        return {
-            "video_script": video_script or "無法提取影片腳本內容",
-            "social_media": social_media or "無法提取社群媒體內容"
-        }
-    
-    final_message = user_proxy.last_message()["content"]
+    messages = [
+        {"name": "Script_Writer", "content": video_draft or ""},
+        {"name": "Social_Media_Writer", "content": social_draft or ""},
+        {"name": "Workflow_Coordinator", "content": final_message},
+    ]
+
     logging.info(f"Final message received: {final_message[:200]}...")
     
-    # 嘗試多種提取方法
-    content_extracted = False
-    video_script = None
-    social_media = None
-    
-    try:
-        # 方法1: 嘗試新格式
-        if "===FINAL_OUTPUT_START===" in final_message:
-            if "@@VIDEO_SCRIPT@@" in final_message and "@@SOCIAL_MEDIA@@" in final_message:
-                video_script = final_message.split("@@VIDEO_SCRIPT@@")[1].split("@@VIDEO_SCRIPT_END@@")[0].strip()
-                social_media = final_message.split("@@SOCIAL_MEDIA@@")[1].split("@@SOCIAL_MEDIA_END@@")[0].strip()
-                content_extracted = True
-                logging.info("✅ @@格式成功提取內容")
-        
-        # 方法2: 嘗試舊格式
-        if not content_extracted and "---VIDEO_SCRIPT_START---" in final_message:
-            video_script = final_message.split("---VIDEO_SCRIPT_START---")[1].split("---VIDEO_SCRIPT_END---")[0].strip()
-            social_media = final_message.split("---SOCIAL_MEDIA_START---")[1].split("---SOCIAL_MEDIA_END---")[0].strip()
-            content_extracted = True
-            logging.info("✅ 使用舊格式成功提取內容")
-        
-        # 方法3: 從對話歷史智能提取
-        if not content_extracted:
-            logging.warning("🔍 標準格式未找到，開始智能內容提取...")
-            extracted_content = extract_content_from_messages(groupchat.messages)
-            video_script = extracted_content["video_script"]
-            social_media = extracted_content["social_media"]
-            logging.info("📋 智能提取完成")
-            
-    except Exception as e:
-        logging.error(f"❌ 內容提取過程中發生錯誤: {e}")
-        # 最後嘗試：從對話歷史提取
-        extracted_content = extract_content_from_messages(groupchat.messages)
-        video_script = extracted_content["video_script"]
-        social_media = extracted_content["social_media"]
+    extracted_content = _parse_final_output(final_message)
+    if extracted_content:
+        logging.info("✅ 成功從最終訊息提取內容")
+    else:
+        # 從對話歷史智能提取
+        logging.warning("🔍 標準格式未找到，開始智能內容提取...")
+        extracted_content = _extract_content_from_messages(messages)
+        logging.info("📋 智能提取完成")
+    video_script = extracted_content["video_script"]
+    social_media = extracted_content["social_media"]
     
     # 確保返回有效內容
     if not video_script or len(video_script.strip()) < 20:
-        video_script = "內容生成過程中出現問題，請重新嘗試。"
+        video_script = _FALLBACK_CONTENT
     if not social_media or len(social_media.strip()) < 10:
-        social_media = "內容生成過程中出現問題，請重新嘗試。"
+        social_media = _FALLBACK_CONTENT
         
     logging.info(f"📊 最終提取結果 - 影片腳本長度: {len(video_script)}, 社群內容長度: {len(social_media)}")
     
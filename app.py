@@ -1,13 +1,26 @@
 import streamlit as st
-from streamlit_extras.app_logo import add_logo
+import hashlib
+import html
+import json
 import logging
+import queue
+import statistics
+import threading
+import time
+import traceback
+from collections import deque
+from io import BytesIO
+from typing import Callable, Dict, Iterator, List, Optional, Tuple, Union
 
-# 導入兩種工作流程
-from agents.workflow import run_workflow  # 原始 AutoGen 工作流程
-from agents.langgraph_workflow import run_langgraph_workflow  # 新的 LangGraph 工作流程
+from PIL import Image
+try:
+    import orjson
+except ImportError:  # orjson 為選用依賴，未安裝時使用標準庫 json
+    orjson = None
 
 from config import settings
 from tools.content_formatter import ContentFormatter
+from tools.http_client import SESSION
 from tools.trend_fetcher import TrendFetcher
 
 # 設定日誌
@@ -21,9 +34,309 @@ st.set_page_config(
     initial_sidebar_state="expanded",
 )
 
+
+# --- Cached Resources ---
+class _CallStats:
+    """記錄快取命中/未命中次數與最近 max_samples 次呼叫的耗時，供側邊欄顯示"""
+
+    def __init__(self, max_samples: int = 100):
+        self.hits = 0
+        self.misses = 0
+        self.latencies = deque(maxlen=max_samples)
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float, hit: bool) -> None:
+        """記錄一次呼叫（同一行程的多個使用者會同時寫入）"""
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+            self.latencies.append(seconds)
+
+    @property
+    def calls(self) -> int:
+        return self.hits + self.misses
+
+    @property
+    def hit_ratio(self) -> float:
+        return self.hits / self.calls if self.calls else 0.0
+
+    @property
+    def median_latency(self) -> float:
+        with self._lock:
+            return statistics.median(self.latencies) if self.latencies else 0.0
+
+
+# 側邊欄依此順序顯示各項統計
+_STATS_LABELS = {'trends': "趨勢快取", 'LangGraph': "LangGraph 內容", 'AutoGen': "AutoGen 內容"}
+
+
+@st.cache_resource
+def _get_call_stats() -> Dict[str, _CallStats]:
+    """每個行程共用一份統計；模組層級的變數在每次重新執行時都會重建，無法累積"""
+    return {name: _CallStats() for name in _STATS_LABELS}
+
+
+@st.cache_resource
+def _get_trend_fetcher() -> TrendFetcher:
+    """每個行程只建立一次 TrendFetcher，跨重新執行與使用者共用"""
+    return TrendFetcher()
+
+
+@st.cache_resource
+def _get_content_store():
+    """生成結果的磁碟快取（第一次需要時才載入），伺服器重啟後相同主題仍可直接載入先前的內容"""
+    from utils.cache import PromptCache
+    return PromptCache(settings.CONTENT_CACHE_DIR)
+
+
+def _content_key(workflow_type: str, topic: Dict) -> str:
+    """以工作流程、主題標題與新聞 URL 計算生成結果的快取鍵"""
+    payload = json.dumps([workflow_type, topic['title'], _news_urls(topic)], ensure_ascii=False)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+@st.cache_data(ttl=15 * 60, show_spinner=False)
+def _fetch_trends_cached() -> Tuple[List[Dict], float]:
+    """
+    快取趨勢列表 15 分鐘，期間內重複點擊直接返回，不再呼叫 Google Trends
+
+    Returns:
+        Tuple[List[Dict], float]: 趨勢列表與實際獲取的時間戳，呼叫端可據此判斷是否命中快取
+    """
+    return _get_trend_fetcher().get_aggregated_trends(force_refresh=True), time.time()
+
+
+def _load_trends(force_refresh: bool = False) -> None:
+    """
+    獲取趨勢並存入 session_state
+
+    Args:
+        force_refresh (bool): 為 True 時先清除快取，強制重新呼叫 Google Trends
+    """
+    if force_refresh:
+        _fetch_trends_cached.clear()
+    with st.spinner("正在從 Google Trends 獲取最新數據..."):
+        try:
+            requested_at = time.time()
+            started = time.perf_counter()
+            st.session_state.trends, fetched_at = _fetch_trends_cached()
+            _get_call_stats()['trends'].record(time.perf_counter() - started, hit=fetched_at < requested_at)
+            st.session_state.trends_fetched_at = fetched_at
+            st.session_state.trends_by_title = {trend['title']: trend for trend in st.session_state.trends}
+            if st.session_state.trends:
+                st.success(f"成功獲取 {len(st.session_state.trends)} 條熱門趨勢！")
+            else:
+                # 不快取空結果，下次點擊時重新獲取
+                _fetch_trends_cached.clear()
+                st.error("無法獲取趨勢。請檢查您的網路連線。")
+        except Exception as e:
+            st.error(f"獲取趨勢時發生錯誤: {e}")
+
+
+@st.cache_data(ttl=24 * 60 * 60, max_entries=512, show_spinner=False)
+def _fetch_thumbnail(url: str, width: int) -> Optional[bytes]:
+    """
+    下載圖片並縮成指定寬度的 JPEG 縮圖，快取一天，重新執行時不必再下載與傳送原圖
+
+    Args:
+        url (str): 圖片 URL
+        width (int): 顯示寬度（像素）
+
+    Returns:
+        Optional[bytes]: 縮圖內容；下載或解碼失敗時返回 None
+    """
+    try:
+        response = SESSION.get(url, timeout=5)
+        response.raise_for_status()
+        with Image.open(BytesIO(response.content)) as image:
+            # 保留兩倍解析度，讓高 DPI 螢幕上的縮圖仍然清晰
+            image.thumbnail((width * 2, width * 2))
+            buffer = BytesIO()
+            image.convert('RGB').save(buffer, format='JPEG', quality=85)
+        return buffer.getvalue()
+    except Exception as e:
+        logging.warning(f"⚠️ 無法產生縮圖 {url}: {e}")
+        return None
+
+
+def _thumbnail(url: str, width: int) -> Union[bytes, str]:
+    """返回快取的縮圖，無法產生時退回原圖 URL 交給瀏覽器載入"""
+    return _fetch_thumbnail(url, width) or url
+
+
+@st.cache_data(max_entries=32, show_spinner=False)
+def _serialize_exports(export_data: Dict) -> Tuple[bytes, bytes]:
+    """
+    產生 JSON 與純文字的匯出檔內容；內容不變時重新執行直接返回快取，不必每次重新序列化
+
+    Args:
+        export_data (Dict): 要匯出的主題、工作流程與生成內容
+
+    Returns:
+        Tuple[bytes, bytes]: UTF-8 編碼的 JSON 與純文字內容
+    """
+    if orjson is not None:
+        json_data = orjson.dumps(export_data, default=str, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS)
+    else:
+        json_data = json.dumps(export_data, ensure_ascii=False, indent=2, default=str).encode('utf-8')
+    text_data = f"""主題: {export_data['topic']}
+工作流程: {export_data['workflow_type']}
+
+=== 影片腳本 ===
+{export_data['video_script']}
+
+=== 社群媒體內容 ===
+{export_data['social_media']}
+
+=== 摘要報告 ===
+{export_data.get('summary', 'N/A')}
+"""
+    return json_data, text_data.encode('utf-8')
+
+
+# ContentFormatter 的輸出只取決於 (topic, content, source)，相同輸入直接返回先前的結果
+# （包含當時的生成時間）
+_format_video_script = st.cache_data(ContentFormatter.format_video_script, max_entries=64, show_spinner=False)
+_format_social_media = st.cache_data(ContentFormatter.format_social_media, max_entries=64, show_spinner=False)
+
+# LangGraph 工作流程最多分析的新聞 URL 數
+_MAX_ANALYZED_URLS = 3
+# 選中主題預設顯示的相關新聞數
+_NEWS_PREVIEW_COUNT = 5
+
+
+def _news_urls(trend: Dict) -> List[str]:
+    """
+    取得趨勢中所有新聞的 URL；第一次計算後存在趨勢資料上，之後每次重新執行都直接重用
+
+    Args:
+        trend (Dict): 趨勢資料
+
+    Returns:
+        List[str]: 依新聞順序排列的 URL
+    """
+    urls = trend.get('_news_urls')
+    if urls is None:
+        urls = trend['_news_urls'] = [news['url'] for news in trend.get('news_items') or [] if news.get('url')]
+    return urls
+
+
+class _ThrottledProgress:
+    """
+    合併短時間內的多則進度訊息再更新畫面，每則訊息不必各自經過 WebSocket 重新繪製一次
+
+    最多每 interval 秒（或累積 max_pending 則訊息時）更新一次；結束時需呼叫 flush 送出剩餘訊息。
+    """
+
+    def __init__(self, status_text, log_container, interval: float = 0.1, max_pending: int = 20):
+        """
+        Args:
+            status_text: 顯示最新狀態的 st.empty 元素
+            log_container: 累積進度紀錄的 st.container
+            interval (float): 兩次更新畫面之間的最短秒數
+            max_pending (int): 累積到此數量時不等間隔直接更新
+        """
+        self.status_text = status_text
+        self.log_container = log_container
+        self.interval = interval
+        self.max_pending = max_pending
+        self._pending: List[str] = []
+        self._last_flush = 0.0
+
+    def __call__(self, message: str) -> None:
+        self._pending.append(message)
+        if (time.monotonic() - self._last_flush >= self.interval
+                or len(self._pending) >= self.max_pending):
+            self.flush()
+
+    def flush(self) -> None:
+        """立即顯示所有尚未顯示的訊息"""
+        self._last_flush = time.monotonic()
+        if not self._pending:
+            return
+        self.status_text.text(f"⏳ {self._pending[-1]}")
+        with self.log_container:
+            # Markdown 的硬換行，讓合併後的每則訊息各佔一行
+            st.info("  \n".join(self._pending))
+        self._pending.clear()
+
+
+def _stream_with_progress(func: Callable, progress_callback: Callable, **kwargs) -> Iterator[Dict]:
+    """
+    在背景執行緒中執行串流工作流程，事件與進度訊息經由佇列交回主執行緒
+
+    LangGraph 串流時在自己的執行緒中執行節點，這些執行緒沒有 Streamlit 的執行環境，
+    直接更新元素會被丟棄，因此只由 Streamlit 的腳本執行緒呼叫 progress_callback 與更新畫面。
+    """
+    events = queue.Queue()
+    done = object()
+
+    def runner():
+        try:
+            for event in func(progress_callback=lambda message: events.put({'stage': 'progress', 'message': message}),
+                              **kwargs):
+                events.put(event)
+        except BaseException as e:
+            events.put({'stage': 'error', 'error': e})
+        finally:
+            events.put(done)
+
+    threading.Thread(target=runner, name="langgraph-workflow", daemon=True).start()
+    while True:
+        event = events.get()
+        if event is done:
+            return
+        if event['stage'] == 'progress':
+            progress_callback(event['message'])
+        elif event['stage'] == 'error':
+            raise event['error']
+        else:
+            yield event
+
+
+# 串流內容的最短重繪間隔（秒）與各欄位的標題
+_STREAM_RENDER_INTERVAL = 0.1
+_STREAM_LABELS = {'video_script': "🎬 影片腳本（生成中）", 'social_media': "📱 社群媒體內容（生成中）"}
+
+
+def _render_streamed_content(events: Iterator[Dict]) -> Optional[Dict]:
+    """
+    邊接收 LangGraph 工作流程的串流事件邊顯示生成中的內容
+
+    Args:
+        events (Iterator[Dict]): stream_langgraph_workflow 產生的事件
+
+    Returns:
+        Optional[Dict]: 最後一個事件中的工作流程結果；串流提前結束時為 None
+    """
+    placeholders = {stage: column.empty() for stage, column in zip(_STREAM_LABELS, st.columns(2))}
+    drafts = dict.fromkeys(_STREAM_LABELS, "")
+    changed = set()
+    last_render = 0.0
+    for event in events:
+        if event['stage'] == 'result':
+            return event['result']
+        if event['stage'] not in drafts:
+            # 摘要不在此即時顯示，只出現在最後的結果中
+            continue
+        drafts[event['stage']] += event['delta']
+        changed.add(event['stage'])
+        # 片段通常只有幾個字，合併一段時間內的片段再重繪
+        if time.monotonic() - last_render >= _STREAM_RENDER_INTERVAL:
+            for stage in changed:
+                placeholders[stage].markdown(f"**{_STREAM_LABELS[stage]}**\n\n{drafts[stage]}")
+            changed.clear()
+            last_render = time.monotonic()
+    return None
+
+
 # --- Initialize Session State ---
 if "trends" not in st.session_state:
     st.session_state.trends = []
+if "trends_by_title" not in st.session_state:
+    st.session_state.trends_by_title = {}
 if "selected_topic" not in st.session_state:
     st.session_state.selected_topic = None
 if "generated_content" not in st.session_state:
@@ -58,6 +371,10 @@ with st.sidebar:
         else:
             st.error("請輸入 API Key")
 
+    # 效能統計在頁面最後才填入，包含本次執行中的呼叫
+    st.markdown("---")
+    stats_container = st.container()
+
 # --- Main Application ---
 st.title("AI Agent 趨勢文案寫手")
 st.markdown(f"**當前工作流程:** {st.session_state.workflow_type}")
@@ -66,83 +383,142 @@ st.markdown("---")
 # --- Step 1: Fetch Trends ---
 st.header("步驟 1: 獲取最新趨勢")
 
-col1, col2 = st.columns([1, 1])
+col1, col2, col3 = st.columns([1, 1, 1])
 with col1:
     if st.button("獲取熱門趨勢", use_container_width=True):
-        with st.spinner("正在從 Google Trends 獲取最新數據..."):
-            try:
-                trend_fetcher = TrendFetcher()
-                st.session_state.trends = trend_fetcher.get_aggregated_trends(force_refresh=True)
-                if st.session_state.trends:
-                    st.success(f"成功獲取 {len(st.session_state.trends)} 條熱門趨勢！")
-                else:
-                    st.error("無法獲取趨勢。請檢查您的網路連線。")
-            except Exception as e:
-                st.error(f"獲取趨勢時發生錯誤: {e}")
+        _load_trends()
 
 with col2:
+    if st.button("強制刷新", use_container_width=True, help="忽略 15 分鐘內的快取，重新獲取最新趨勢"):
+        _load_trends(force_refresh=True)
+
+with col3:
     if st.button("清除快取", use_container_width=True):
         st.session_state.trends = []
+        st.session_state.trends_by_title = {}
         st.session_state.selected_topic = None
         st.session_state.generated_content = None
         st.success("快取已清除！")
 
 # --- Step 2: Display and Select Topics ---
+# 趨勢卡片以單一 HTML 區塊呈現（<details> 摺疊 + flex 排版），不為每張卡片建立 expander 與多層 columns
+_TREND_CARD_CSS = """
+<style>
+.trend-card {border: 1px solid rgba(49, 51, 63, 0.2); border-radius: 0.5rem; padding: 0.6rem 1rem; margin-bottom: 0.5rem;}
+.trend-card summary {cursor: pointer; font-weight: 600;}
+.trend-card .trend-body {display: flex; gap: 1.5rem; margin-top: 0.75rem;}
+.trend-card .trend-meta {flex: 1; min-width: 0;}
+.trend-card .trend-detail {flex: 2; min-width: 0;}
+.trend-card .trend-news {display: flex; gap: 0.75rem; margin-bottom: 0.6rem;}
+.trend-card .trend-caption {color: rgba(49, 51, 63, 0.6); font-size: 0.85rem; margin: 0;}
+.trend-card .trend-info {background: rgba(28, 131, 225, 0.1); border-radius: 0.5rem; padding: 0.5rem 0.75rem;}
+.trend-card p {margin: 0 0 0.4rem 0;}
+</style>
+"""
+
+
+def _esc(text) -> str:
+    """轉義 HTML 並合併空白；空行會讓 Markdown 提前結束 HTML 區塊，因此不保留換行"""
+    return html.escape(" ".join(str(text).split()))
+
+
+def _safe_url(url: str) -> str:
+    """只允許 http(s) 連結，並轉義成可放入 HTML 屬性的字串"""
+    return html.escape(url, quote=True) if url.startswith(("http://", "https://")) else ""
+
+
+def _trend_card_html(i: int, trend: Dict, show_urls: bool) -> str:
+    """
+    產生單一趨勢卡片的 HTML；所有來自外部的文字都會轉義
+
+    Args:
+        i (int): 排名（從 1 開始）
+        trend (Dict): 趨勢資料
+        show_urls (bool): 是否顯示 LangGraph 會分析的新聞 URL 資訊
+
+    Returns:
+        str: 卡片的 HTML
+    """
+    meta = []
+    picture = _safe_url(trend.get('picture') or '')
+    if picture:
+        meta.append(f'<img src="{picture}" width="200" loading="lazy">'
+                    f'<p class="trend-caption">圖片來源: {_esc(trend.get("picture_source", ""))}</p>')
+    meta.append(f'<p><b>搜尋量:</b> {_esc(trend.get("approx_traffic", "N/A"))}</p>')
+    meta.append(f'<p><b>發布時間:</b> {_esc(trend.get("pub_date", "N/A"))}</p>')
+    meta.append(f'<p><b>來源:</b> {_esc(trend["source"])}</p>')
+    trend_url = _safe_url(trend.get('url') or '')
+    if trend_url:
+        meta.append(f'<p><b><a href="{trend_url}" target="_blank">查看完整趨勢</a></b></p>')
+
+    detail = []
+    if trend.get('description'):
+        detail.append(f'<p><b>描述:</b> {_esc(trend["description"])}</p>')
+    news_items = trend.get('news_items') or []
+    if news_items:
+        detail.append('<p><b>📰 相關新聞:</b></p>')
+        for news in news_items[:3]:  # 只顯示前3則新聞
+            news_picture = _safe_url(news.get('picture') or '')
+            news_url = _safe_url(news.get('url') or '')
+            parts = [f'<b><a href="{news_url}" target="_blank">{_esc(news["title"])}</a></b>' if news_url
+                     else f'<b>{_esc(news["title"])}</b>']
+            if news_url and show_urls:
+                parts.append(f'<p class="trend-caption">🔗 URL: {news_url}</p>')
+            if news.get('source'):
+                parts.append(f'<p class="trend-caption">來源: {_esc(news["source"])}</p>')
+            if news.get('snippet'):
+                parts.append(f'<p class="trend-caption">{_esc(news["snippet"])}</p>')
+            image = f'<img src="{news_picture}" width="100" loading="lazy">' if news_picture else ''
+            detail.append(f'<div class="trend-news"><div>{image}</div><div>{"".join(parts)}</div></div>')
+        if show_urls:
+            detail.append(f'<div class="trend-info">🔗 此趨勢有 {len(_news_urls(trend))} 個可分析的新聞URL</div>')
+
+    return (
+        f'<details class="trend-card"><summary>#{i} {_esc(trend["title"])}</summary>'
+        f'<div class="trend-body"><div class="trend-meta">{"".join(meta)}</div>'
+        f'<div class="trend-detail">{"".join(detail)}</div></div></details>'
+    )
+
+
+@st.fragment
+def _render_trend_card(i: int, trend: Dict, widget_id: str) -> None:
+    """
+    顯示單一趨勢卡片；點擊卡片內的按鈕時只重新執行這張卡片，不重建整個趨勢列表
+
+    Args:
+        i (int): 排名（從 1 開始）
+        trend (Dict): 趨勢資料
+        widget_id (str): 卡片內元件 key 的後綴，排名改變時同一趨勢仍保持相同的 key
+    """
+    st.markdown(
+        _trend_card_html(i, trend, show_urls=st.session_state.workflow_type == "LangGraph"),
+        unsafe_allow_html=True
+    )
+
+    # Selection button for each trend
+    if st.button(f"選擇 '{trend['title']}' 作為創作主題", key=f"select_{widget_id}"):
+        st.session_state.selected_topic = trend
+        st.success(f"已選擇 '{trend['title']}' 作為創作主題！")
+        # 選中的主題顯示在卡片之外，需要整頁重新執行
+        st.rerun()
+
+
 if st.session_state.trends:
     st.header("步驟 2: 瀏覽熱門趨勢")
     
     # Display trends in an expandable format
     st.subheader("今日熱搜排行榜")
     
+    st.markdown(_TREND_CARD_CSS, unsafe_allow_html=True)
+    widget_ids = set()
     for i, trend in enumerate(st.session_state.trends, 1):
-        with st.expander(f"#{i} {trend['title']}", expanded=False):
-            col1, col2 = st.columns([1, 2])
-            
-            with col1:
-                if trend.get('picture'):
-                    st.image(trend['picture'], width=200, caption=f"圖片來源: {trend.get('picture_source', '')}")
-                    
-                st.markdown(f"**搜尋量:** {trend.get('approx_traffic', 'N/A')}")
-                st.markdown(f"**發布時間:** {trend.get('pub_date', 'N/A')}")
-                st.markdown(f"**來源:** {trend['source']}")
-                if trend.get('url'):
-                    st.markdown(f"**[查看完整趨勢]({trend['url']})**")
-                    
-            with col2:
-                if trend.get('description'):
-                    st.markdown(f"**描述:** {trend['description']}")
-                
-                # Display related news items with URL info for LangGraph
-                if trend.get('news_items'):
-                    st.markdown("**📰 相關新聞:**")
-                    for j, news in enumerate(trend['news_items'][:3], 1):  # 只顯示前3則新聞
-                        news_col1, news_col2 = st.columns([1, 3])
-                        with news_col1:
-                            if news.get('picture'):
-                                st.image(news['picture'], width=100)
-                        with news_col2:
-                            if news.get('url'):
-                                st.markdown(f"**[{news['title']}]({news['url']})**")
-                                # 為 LangGraph 工作流程顯示URL信息
-                                if st.session_state.workflow_type == "LangGraph":
-                                    st.caption(f"🔗 URL: {news['url']}")
-                            else:
-                                st.markdown(f"**{news['title']}**")
-                            if news.get('source'):
-                                st.caption(f"來源: {news['source']}")
-                            if news.get('snippet'):
-                                st.caption(news['snippet'])
-                
-                # 為 LangGraph 顯示可用的URL數量
-                if st.session_state.workflow_type == "LangGraph" and trend.get('news_items'):
-                    url_count = len([news for news in trend['news_items'] if news.get('url')])
-                    st.info(f"🔗 此趨勢有 {url_count} 個可分析的新聞URL")
-            
-            # Selection button for each trend
-            if st.button(f"選擇 '{trend['title']}' 作為創作主題", key=f"select_{i}"):
-                st.session_state.selected_topic = trend
-                st.success(f"已選擇 '{trend['title']}' 作為創作主題！")
-                st.rerun()
+        # 以標題雜湊作為元件 key，強制刷新後排名變動也不會讓 Streamlit 視為新的元件
+        widget_id = hashlib.md5(trend['title'].encode('utf-8')).hexdigest()[:8]
+        if widget_id in widget_ids:
+            # 不同來源可能出現同名趨勢
+            widget_id = f"{widget_id}_{i}"
+        widget_ids.add(widget_id)
+        _render_trend_card(i, trend, widget_id)
     
     st.markdown("---")
     
@@ -156,10 +532,11 @@ if st.session_state.trends:
         help="從下拉選單中快速選擇一個主題。"
     )
 
-    if selected_title and selected_title != "請選擇一個主題...":
-        st.session_state.selected_topic = next(
-            (trend for trend in st.session_state.trends if trend["title"] == selected_title), None
-        )
+    # 只在下拉選單的選項改變時更新，避免每次重新執行都覆蓋卡片按鈕所選的主題
+    if selected_title != st.session_state.get('_last_selected_title'):
+        st.session_state._last_selected_title = selected_title
+        if selected_title and selected_title != "請選擇一個主題...":
+            st.session_state.selected_topic = st.session_state.trends_by_title.get(selected_title)
 
 # --- Display Selected Topic ---
 if st.session_state.selected_topic:
@@ -175,15 +552,16 @@ if st.session_state.selected_topic:
                     caption=f"圖片來源: {st.session_state.selected_topic.get('picture_source', '')}"
                 )
             
-            st.markdown(f"**搜尋量:** {st.session_state.selected_topic.get('approx_traffic', 'N/A')}")
-            st.markdown(f"**發布時間:** {st.session_state.selected_topic.get('pub_date', 'N/A')}")
-            st.markdown(f"**來源:** {st.session_state.selected_topic['source']}")
-            
+            # 所有中繼資料合併成一個 Markdown 元素送出
+            meta_lines = [
+                f"**搜尋量:** {st.session_state.selected_topic.get('approx_traffic', 'N/A')}",
+                f"**發布時間:** {st.session_state.selected_topic.get('pub_date', 'N/A')}",
+                f"**來源:** {st.session_state.selected_topic['source']}",
+            ]
             # 為 LangGraph 工作流程顯示URL統計
             if st.session_state.workflow_type == "LangGraph":
-                news_items = st.session_state.selected_topic.get('news_items', [])
-                available_urls = [news['url'] for news in news_items if news.get('url')]
-                st.markdown(f"**可分析URL數:** {len(available_urls)}")
+                meta_lines.append(f"**可分析URL數:** {len(_news_urls(st.session_state.selected_topic))}")
+            st.markdown("\n\n".join(meta_lines))
                 
         with col2:
             if st.session_state.selected_topic.get('description'):
@@ -191,24 +569,26 @@ if st.session_state.selected_topic:
             
             # 顯示將被處理的URL（僅LangGraph）
             if st.session_state.workflow_type == "LangGraph":
-                news_items = st.session_state.selected_topic.get('news_items', [])
-                available_urls = [news['url'] for news in news_items if news.get('url')][:3]  # 取前3個
+                available_urls = _news_urls(st.session_state.selected_topic)[:_MAX_ANALYZED_URLS]
                 if available_urls:
-                    st.markdown("**🔗 將被分析的URL:**")
-                    for i, url in enumerate(available_urls, 1):
-                        st.markdown(f"{i}. `{url}`")
+                    st.markdown("**🔗 將被分析的URL:**\n\n" + "\n".join(
+                        f"{i}. `{url}`" for i, url in enumerate(available_urls, 1)
+                    ))
                 else:
                     st.warning("⚠️ 此趨勢沒有可分析的URL，將使用通用研究方式")
             
-            # Display all related news items for selected topic
+            # Display related news items for selected topic (先顯示前幾則，點擊後才顯示全部)
             if st.session_state.selected_topic.get('news_items'):
                 st.markdown("**相關新聞報導:**")
-                for j, news in enumerate(st.session_state.selected_topic['news_items'], 1):
+                news_items = st.session_state.selected_topic['news_items']
+                selected_title = st.session_state.selected_topic['title']
+                shown = len(news_items) if st.session_state.get('_news_show_all') == selected_title else _NEWS_PREVIEW_COUNT
+                for j, news in enumerate(news_items[:shown], 1):
                     with st.container():
                         news_col1, news_col2 = st.columns([1, 4])
                         with news_col1:
                             if news.get('picture'):
-                                st.image(news['picture'], width=80)
+                                st.image(_thumbnail(news['picture'], 80), width=80)
                         with news_col2:
                             if news.get('url'):
                                 st.markdown(f"**{j}. [{news['title']}]({news['url']})**")
@@ -219,56 +599,81 @@ if st.session_state.selected_topic:
                             if news.get('snippet'):
                                 st.caption(f"{news['snippet']}")
                         st.divider()
+                if len(news_items) > shown:
+                    st.button(
+                        f"顯示全部 {len(news_items)} 則新聞",
+                        on_click=lambda: st.session_state.update(_news_show_all=selected_title)
+                    )
 
 
 # --- Step 3: Generate Content ---
-if st.session_state.selected_topic:
-    st.header("步驟 3: 生成內容")
-    
-    col1, col2 = st.columns([1, 1])
-    with col1:
-        st.markdown(f"**選中的主題:** {st.session_state.selected_topic['title']}")
-        st.markdown(f"**使用的工作流程:** {st.session_state.workflow_type}")
-    
-    with col2:
-        if st.session_state.workflow_type == "LangGraph":
-            news_items = st.session_state.selected_topic.get('news_items', [])
-            url_count = len([news for news in news_items if news.get('url')])
-            st.markdown(f"**可分析的URL數量:** {url_count}")
+@st.fragment
+def _render_error_details() -> None:
+    """顯示最近一次生成失敗的完整堆疊；作為 fragment 執行，不隨整頁重新執行"""
+    with st.expander("🔍 詳細錯誤資訊", expanded=False):
+        st.code(st.session_state['_last_tb'])
+
+
+@st.fragment
+def _render_generate_step() -> None:
+    """
+    步驟 3 的生成表單與進度顯示
+
+    作為 fragment 執行：送出表單與進度更新只重新執行這個區塊，不重建上方的趨勢列表；
+    生成完成後才以 st.rerun() 重新執行整頁以顯示步驟 4。
+    """
+    content_key = _content_key(st.session_state.workflow_type, st.session_state.selected_topic)
+    saved_content = _get_content_store().get(content_key)
     
     if not st.session_state.get("tavily_api_key"):
         st.warning("請在側邊欄設定您的 Tavily API 金鑰以生成內容。")
     else:
-        if st.button("🚀 開始生成內容", use_container_width=True, type="primary"):
+        # 表單內的勾選不會觸發重新執行，送出後才一起生效
+        with st.form("gen_form", border=False):
+            regenerate = False
+            if saved_content is not None:
+                regenerate = st.checkbox("重新生成（不使用先前為此主題儲存的內容）", value=False)
+            submitted = st.form_submit_button("🚀 開始生成內容", use_container_width=True, type="primary")
+        
+        if submitted:
+            workflow_stats = _get_call_stats()[st.session_state.workflow_type]
+            started = time.perf_counter()
+            if saved_content is not None and not regenerate:
+                # 先前已為此主題生成過內容，直接載入，不再呼叫 LLM
+                st.session_state.generated_content = saved_content
+                workflow_stats.record(time.perf_counter() - started, hit=True)
+                st.rerun()
+            
             # 使用進度條
             progress_bar = st.progress(0)
             status_text = st.empty()
             log_container = st.container()
             
             # 進度回調函數
-            def progress_callback(message):
-                status_text.text(f"⏳ {message}")
-                with log_container:
-                    st.info(message)
+            progress_callback = _ThrottledProgress(status_text, log_container)
             
             try:
                 progress_callback("開始內容生成流程...")
                 progress_bar.progress(10)
                 
                 if st.session_state.workflow_type == "LangGraph":
-                    # 使用新的 LangGraph 工作流程
+                    # 使用新的 LangGraph 工作流程（在此才匯入，不拖慢首次載入頁面）
+                    from agents.langgraph_workflow import stream_langgraph_workflow
+                    
                     topic = st.session_state.selected_topic['title']
-                    news_items = st.session_state.selected_topic.get('news_items', [])
-                    trend_urls = [news['url'] for news in news_items if news.get('url')][:3]  # 取前3個URL
+                    trend_urls = _news_urls(st.session_state.selected_topic)[:_MAX_ANALYZED_URLS]
                     
                     progress_callback(f"使用 LangGraph 工作流程處理 {len(trend_urls)} 個URL...")
                     progress_bar.progress(20)
                     
-                    result = run_langgraph_workflow(
+                    # 腳本與社群內容一邊生成一邊顯示，不必等整個流程結束
+                    # 進度訊息經由佇列交回腳本執行緒顯示，節點執行緒不直接更新畫面
+                    result = _render_streamed_content(_stream_with_progress(
+                        stream_langgraph_workflow,
+                        progress_callback,
                         topic=topic,
-                        trend_urls=trend_urls,
-                        progress_callback=progress_callback
-                    )
+                        trend_urls=trend_urls
+                    ))
                     
                     progress_bar.progress(90)
                     
@@ -284,6 +689,7 @@ if st.session_state.selected_topic:
                                 'scraped_data_count': result.get('scraped_data_count', 0)
                             }
                         }
+                        _get_content_store().set(content_key, st.session_state.generated_content)
                         progress_bar.progress(100)
                         status_text.text("✅ 內容生成完成！")
                         st.success("🎉 內容生成成功！")
@@ -294,6 +700,8 @@ if st.session_state.selected_topic:
                 
                 else:
                     # 使用原始的 AutoGen 工作流程
+                    from agents.workflow import run_workflow
+                    
                     progress_callback("使用 AutoGen 工作流程...")
                     progress_bar.progress(20)
                     
@@ -307,12 +715,12 @@ if st.session_state.selected_topic:
                     
                     if raw_content and raw_content.get('video_script') and raw_content.get('social_media'):
                         # Format the content before storing it
-                        video_script = ContentFormatter.format_video_script(
+                        video_script = _format_video_script(
                             topic=st.session_state.selected_topic['title'],
                             script_content=raw_content['video_script'],
                             source=st.session_state.selected_topic['source']
                         )
-                        social_media = ContentFormatter.format_social_media(
+                        social_media = _format_social_media(
                             topic=st.session_state.selected_topic['title'],
                             social_content=raw_content['social_media'],
                             source=st.session_state.selected_topic['source']
@@ -325,6 +733,7 @@ if st.session_state.selected_topic:
                                 'type': 'AutoGen'
                             }
                         }
+                        _get_content_store().set(content_key, st.session_state.generated_content)
                         progress_bar.progress(100)
                         status_text.text("✅ 內容生成完成！")
                         st.success("🎉 AI Agents 協作完成！")
@@ -334,17 +743,35 @@ if st.session_state.selected_topic:
                         st.error("❌ AutoGen 工作流程執行失敗，請檢查設定。")
                     
             except Exception as e:
+                # 只在發生錯誤時格式化一次，之後顯示都直接使用保存的字串
+                st.session_state['_last_tb'] = traceback.format_exc()
                 st.error(f"❌ 生成內容時發生錯誤: {e}")
                 logging.error(f"Content generation error: {e}", exc_info=True)
                 
                 # 詳細錯誤資訊供調試
-                with st.expander("🔍 詳細錯誤資訊", expanded=False):
-                    import traceback
-                    st.code(traceback.format_exc())
+                _render_error_details()
                     
             finally:
+                workflow_stats.record(time.perf_counter() - started, hit=False)
+                progress_callback.flush()
                 progress_bar.empty()
                 status_text.empty()
+
+
+if st.session_state.selected_topic:
+    st.header("步驟 3: 生成內容")
+    
+    col1, col2 = st.columns([1, 1])
+    with col1:
+        st.markdown(f"**選中的主題:** {st.session_state.selected_topic['title']}")
+        st.markdown(f"**使用的工作流程:** {st.session_state.workflow_type}")
+    
+    with col2:
+        if st.session_state.workflow_type == "LangGraph":
+            st.markdown(f"**可分析的URL數量:** {len(_news_urls(st.session_state.selected_topic))}")
+    
+    _render_generate_step()
+
 # --- Step 4: Display and Download Content ---
 if st.session_state.get('generated_content'):
     st.header("步驟 4: 查看與下載您的內容")
@@ -421,7 +848,7 @@ if st.session_state.get('generated_content'):
                     st.write(f"{i}. {url}")
     
     # 匯出頁籤
-    with (tab4 if workflow_type == "LangGraph" and st.session_state.generated_content.get('summary') else tab3):
+    with tab4:
         st.subheader("匯出內容")
         
         # 準備匯出數據
@@ -435,12 +862,11 @@ if st.session_state.get('generated_content'):
             'workflow_info': workflow_info
         }
         
+        json_data, text_data = _serialize_exports(export_data)
         col1, col2 = st.columns(2)
         
         with col1:
             # JSON 匯出
-            import json
-            json_data = json.dumps(export_data, ensure_ascii=False, indent=2)
             st.download_button(
                 "📥 下載 JSON",
                 data=json_data,
@@ -450,18 +876,6 @@ if st.session_state.get('generated_content'):
         
         with col2:
             # 文本匯出
-            text_data = f"""主題: {export_data['topic']}
-工作流程: {export_data['workflow_type']}
-
-=== 影片腳本 ===
-{export_data['video_script']}
-
-=== 社群媒體內容 ===
-{export_data['social_media']}
-
-=== 摘要報告 ===
-{export_data.get('summary', 'N/A')}
-"""
             st.download_button(
                 "📥 下載文本",
                 data=text_data,
@@ -477,3 +891,17 @@ else:
 # --- Footer ---
 st.markdown("---")
 st.markdown("🤖 **AI Agent 趨勢文案寫手 - 增強版** | 支援 AutoGen 和 LangGraph 工作流程")
+
+# --- Sidebar: Performance Stats ---
+# 快取命中率與中位數耗時（本行程內所有使用者的最近 100 次呼叫）
+with stats_container:
+    st.caption("📊 效能統計")
+    for name, stats in _get_call_stats().items():
+        if stats.calls:
+            st.metric(
+                f"{_STATS_LABELS[name]}命中率",
+                f"{stats.hit_ratio:.0%}",
+                help=f"共 {stats.calls} 次，中位數耗時 {stats.median_latency:.2f} 秒"
+            )
+    if st.session_state.get("trends_fetched_at"):
+        st.caption(f"趨勢更新於 {time.strftime('%H:%M:%S', time.localtime(st.session_state.trends_fetched_at))}")
@@ -3,15 +3,21 @@
 """
 
 import streamlit as st
-from streamlit_extras.app_logo import add_logo
+import hashlib
+import json
 import logging
+import queue
+import threading
+import time
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+try:
+    import orjson
+except ImportError:  # orjson 為選用依賴，未安裝時使用標準庫 json
+    orjson = None
 
-# 導入兩種工作流程
-from agents.workflow import run_workflow  # 原始 AutoGen 工作流程
-from agents.langgraph_workflow import run_langgraph_workflow  # 新的 LangGraph 工作流程
+# 兩種工作流程（AutoGen / LangGraph）各自依賴大型框架，於生成內容時才匯入所選的那一個
 
 from config import settings
-from tools.content_formatter import ContentFormatter
 from tools.trend_fetcher import TrendFetcher
 
 # 設定日誌
@@ -25,9 +31,214 @@ st.set_page_config(
     initial_sidebar_state="expanded",
 )
 
+
+# --- Cached Resources ---
+@st.cache_resource
+def _get_trend_fetcher() -> TrendFetcher:
+    """每個行程只建立一次 TrendFetcher，跨重新執行與使用者共用"""
+    return TrendFetcher()
+
+
+@st.cache_resource
+def _get_cache_stats() -> Dict[str, float]:
+    """每個行程共用一份趨勢快取的命中統計；模組層級的變數在每次重新執行時都會重建，無法累積"""
+    return {'hits': 0, 'misses': 0, 'last_refresh': 0.0}
+
+
+@st.cache_resource
+def _get_content_store():
+    """生成結果的磁碟快取（第一次需要時才載入），伺服器重啟或頁面重新整理後相同主題仍可直接載入先前的內容"""
+    from utils.cache import PromptCache
+    return PromptCache(settings.CONTENT_CACHE_DIR)
+
+
+def _content_key(workflow_type: str, topic: Dict) -> str:
+    """以工作流程、主題標題與新聞 URL 計算生成結果的快取鍵（與 app.py 的鍵不同，兩個版本的內容格式不共用）"""
+    news_urls = [news['url'] for news in topic.get('news_items') or () if news.get('url')]
+    payload = json.dumps([workflow_type, topic['title'], news_urls], ensure_ascii=False)
+    return hashlib.blake2b(payload.encode('utf-8'), digest_size=16).hexdigest()
+
+
+@st.cache_data(ttl=15 * 60, show_spinner=False)
+def _fetch_trends_cached() -> Tuple[List[Dict], float]:
+    """
+    快取趨勢列表 15 分鐘，期間內重複點擊直接返回，不再呼叫 Google Trends
+
+    Returns:
+        Tuple[List[Dict], float]: 趨勢列表與實際獲取的時間戳，呼叫端可據此判斷是否命中快取
+    """
+    return _get_trend_fetcher().get_aggregated_trends(force_refresh=True), time.time()
+
+
+def _stream_with_progress(func: Callable, progress_callback: Callable, **kwargs) -> Iterator[Dict]:
+    """
+    在背景執行緒中執行串流工作流程，事件與進度訊息經由佇列交回主執行緒
+
+    LangGraph 會在自己的執行緒中執行並行節點，這些執行緒沒有 Streamlit 的執行環境，
+    直接更新元素會被丟棄，因此只由 Streamlit 的腳本執行緒呼叫 progress_callback 與更新畫面。
+    """
+    events = queue.Queue()
+    done = object()
+
+    def runner():
+        try:
+            for event in func(progress_callback=lambda message: events.put({'stage': 'progress', 'message': message}),
+                              **kwargs):
+                events.put(event)
+        except BaseException as e:
+            events.put({'stage': 'error', 'error': e})
+        finally:
+            events.put(done)
+
+    threading.Thread(target=runner, name="langgraph-workflow", daemon=True).start()
+    while True:
+        event = events.get()
+        if event is done:
+            return
+        if event['stage'] == 'progress':
+            progress_callback(event['message'])
+        elif event['stage'] == 'error':
+            raise event['error']
+        else:
+            yield event
+
+
+# 串流內容的最短重繪間隔（秒）與各欄位的標題
+_STREAM_RENDER_INTERVAL = 0.1
+_STREAM_LABELS = {
+    'summary': "📋 摘要報告（生成中）",
+    'video_script': "🎬 影片腳本（生成中）",
+    'social_media': "📱 社群媒體內容（生成中）",
+}
+
+
+def _render_streamed_content(events: Iterator[Dict]) -> Optional[Dict]:
+    """
+    邊接收 LangGraph 工作流程的串流事件邊顯示生成中的內容，每個欄位只更新自己的預留位置
+
+    Args:
+        events (Iterator[Dict]): stream_langgraph_workflow 產生的事件
+
+    Returns:
+        Optional[Dict]: 最後一個事件中的工作流程結果；串流提前結束時為 None
+    """
+    placeholders = {'summary': st.empty()}
+    for stage, column in zip(('video_script', 'social_media'), st.columns(2)):
+        placeholders[stage] = column.empty()
+    drafts = dict.fromkeys(_STREAM_LABELS, "")
+    changed = set()
+    last_render = 0.0
+    for event in events:
+        if event['stage'] == 'result':
+            return event['result']
+        drafts[event['stage']] += event['delta']
+        changed.add(event['stage'])
+        # 片段通常只有幾個字，合併一段時間內的片段再重繪
+        if time.monotonic() - last_render >= _STREAM_RENDER_INTERVAL:
+            for stage in changed:
+                placeholders[stage].markdown(f"**{_STREAM_LABELS[stage]}**\n\n{drafts[stage]}")
+            changed.clear()
+            last_render = time.monotonic()
+    return None
+
+
+@st.cache_data(max_entries=32, show_spinner=False)
+def _serialize_exports(export_data: Dict) -> Tuple[bytes, bytes]:
+    """
+    產生 JSON 與純文字的匯出檔內容；內容不變時重新執行直接返回快取，不必每次重新序列化
+
+    Args:
+        export_data (Dict): 要匯出的主題、工作流程與生成內容
+
+    Returns:
+        Tuple[bytes, bytes]: UTF-8 編碼的 JSON 與純文字內容
+    """
+    if orjson is not None:
+        json_data = orjson.dumps(export_data, default=str, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS)
+    else:
+        json_data = json.dumps(export_data, ensure_ascii=False, indent=2, default=str).encode('utf-8')
+    text_data = f"""主題: {export_data['topic']}
+工作流程: {export_data['workflow_type']}
+
+=== 影片腳本 ===
+{export_data['video_script']}
+
+=== 社群媒體內容 ===
+{export_data['social_media']}
+
+=== 摘要報告 ===
+{export_data.get('summary', 'N/A')}
+"""
+    return json_data, text_data.encode('utf-8')
+
+
+# LangGraph 工作流程最多分析的新聞 URL 數
+_MAX_ANALYZED_URLS = 3
+# 快速選擇下拉選單的預設選項
+_TOPIC_PLACEHOLDER = "請選擇一個主題..."
+
+
+def _build_trend_table(trends: List[Dict], url_counts: List[int]) -> Dict[str, List]:
+    """
+    將趨勢列表轉為以欄為單位的表格資料，交給 st.dataframe 以單一元素顯示
+
+    Args:
+        trends (List[Dict]): 趨勢列表
+        url_counts (List[int]): 與趨勢列表平行的可分析URL數
+
+    Returns:
+        Dict[str, List]: 欄位名稱對應該欄的值
+    """
+    return {
+        "排名": list(range(1, len(trends) + 1)),
+        "標題": [trend['title'] for trend in trends],
+        "搜尋量": [trend.get('approx_traffic', 'N/A') for trend in trends],
+        "發布時間": [trend.get('pub_date', 'N/A') for trend in trends],
+        "來源": [trend['source'] for trend in trends],
+        "可分析URL數": url_counts,
+        "趨勢連結": [trend.get('url') or None for trend in trends],
+    }
+
+
+def _index_trend_urls() -> None:
+    """
+    獲取趨勢後一次算好每個趨勢的可分析URL數與前幾個URL，存成與趨勢列表平行的陣列
+
+    重新執行時依位置直接取用，不必每次都走訪各趨勢的 news_items；
+    下拉選單的選項、標題到位置的對照與趨勢表格的欄位資料也在此一併建立。
+    """
+    url_counts = []
+    first_urls = []
+    index_by_title = {}
+    for index, trend in enumerate(st.session_state.trends):
+        urls = [news['url'] for news in trend.get('news_items') or () if news.get('url')]
+        url_counts.append(len(urls))
+        first_urls.append(urls[:_MAX_ANALYZED_URLS])
+        # 同名趨勢以排名較前的為準
+        index_by_title.setdefault(trend['title'], index)
+    st.session_state.trend_url_counts = url_counts
+    st.session_state.trend_first_urls = first_urls
+    st.session_state.topic_options = [_TOPIC_PLACEHOLDER] + [trend['title'] for trend in st.session_state.trends]
+    st.session_state.trend_index_by_title = index_by_title
+    st.session_state.trend_table = _build_trend_table(st.session_state.trends, url_counts)
+
+
+def _select_topic(index: int) -> None:
+    """選擇第 index 個趨勢（從 0 開始），連同其URL資訊一起保存，之後重新獲取趨勢也不受影響"""
+    st.session_state.selected_topic = st.session_state.trends[index]
+    st.session_state.selected_url_count = st.session_state.trend_url_counts[index]
+    st.session_state.selected_urls = st.session_state.trend_first_urls[index]
+
+
 # --- Initialize Session State ---
 if "trends" not in st.session_state:
     st.session_state.trends = []
+if "trend_url_counts" not in st.session_state:
+    st.session_state.trend_url_counts = []
+    st.session_state.trend_first_urls = []
+    st.session_state.topic_options = [_TOPIC_PLACEHOLDER]
+    st.session_state.trend_index_by_title = {}
+    st.session_state.trend_table = _build_trend_table([], [])
 if "selected_topic" not in st.session_state:
     st.session_state.selected_topic = None
 if "generated_content" not in st.session_state:
@@ -89,6 +300,9 @@ with st.sidebar:
         else:
             st.error("請輸入 Tavily API 金鑰。")
 
+    # 內容在頁面最後才填入，顯示的統計包含本次重新執行中的獲取
+    cache_stats_container = st.expander("🧪 快取統計", expanded=False)
+
 # --- Main Application ---
 st.title("🚀 AI Agent 趨勢文案寫手 - 增強版")
 st.markdown(f"**當前工作流程:** {st.session_state.workflow_type}")
@@ -102,18 +316,31 @@ with col1:
     if st.button("獲取熱門趨勢", use_container_width=True):
         with st.spinner("正在從 Google Trends 獲取最新數據..."):
             try:
-                trend_fetcher = TrendFetcher()
-                st.session_state.trends = trend_fetcher.get_aggregated_trends(force_refresh=True)
+                requested_at = time.time()
+                st.session_state.trends, fetched_at = _fetch_trends_cached()
+                cache_stats = _get_cache_stats()
+                cache_stats['hits' if fetched_at < requested_at else 'misses'] += 1
+                cache_stats['last_refresh'] = fetched_at
+                _index_trend_urls()
                 if st.session_state.trends:
                     st.success(f"成功獲取 {len(st.session_state.trends)} 條熱門趨勢！")
                 else:
+                    # 不快取空結果，下次點擊時重新獲取
+                    _fetch_trends_cached.clear()
                     st.error("無法獲取趨勢。請檢查您的網路連線。")
             except Exception as e:
                 st.error(f"獲取趨勢時發生錯誤: {e}")
 
 with col2:
     if st.button("清除快取", use_container_width=True):
+        # 同時清除趨勢快取，下次獲取時重新呼叫 Google Trends
+        _fetch_trends_cached.clear()
         st.session_state.trends = []
+        st.session_state.trend_url_counts = []
+        st.session_state.trend_first_urls = []
+        st.session_state.topic_options = [_TOPIC_PLACEHOLDER]
+        st.session_state.trend_index_by_title = {}
+        st.session_state.trend_table = _build_trend_table([], [])
         st.session_state.selected_topic = None
         st.session_state.generated_content = None
         st.success("快取已清除！")
@@ -122,75 +349,42 @@ with col2:
 if st.session_state.trends:
     st.header("步驟 2: 瀏覽熱門趨勢")
     
-    # Display trends in an expandable format
+    # 整個排行榜是單一表格元素，點選一列即選為創作主題；新聞細節只在下方的選中主題中顯示
     st.subheader("今日熱搜排行榜")
     
-    for i, trend in enumerate(st.session_state.trends, 1):
-        with st.expander(f"#{i} {trend['title']}", expanded=False):
-            col1, col2 = st.columns([1, 2])
-            
-            with col1:
-                if trend.get('picture'):
-                    st.image(trend['picture'], width=200, caption=f"圖片來源: {trend.get('picture_source', '')}")
-                    
-                st.markdown(f"**搜尋量:** {trend.get('approx_traffic', 'N/A')}")
-                st.markdown(f"**發布時間:** {trend.get('pub_date', 'N/A')}")
-                st.markdown(f"**來源:** {trend['source']}")
-                if trend.get('url'):
-                    st.markdown(f"**[查看完整趨勢]({trend['url']})**")
-                    
-            with col2:
-                if trend.get('description'):
-                    st.markdown(f"**描述:** {trend['description']}")
-                
-                # Display related news items with URL info for LangGraph
-                if trend.get('news_items'):
-                    st.markdown("**📰 相關新聞:**")
-                    for j, news in enumerate(trend['news_items'][:3], 1):  # 只顯示前3則新聞
-                        news_col1, news_col2 = st.columns([1, 3])
-                        with news_col1:
-                            if news.get('picture'):
-                                st.image(news['picture'], width=100)
-                        with news_col2:
-                            if news.get('url'):
-                                st.markdown(f"**[{news['title']}]({news['url']})**")
-                                # 為 LangGraph 工作流程顯示URL信息
-                                if st.session_state.workflow_type == "LangGraph":
-                                    st.caption(f"🔗 URL: {news['url']}")
-                            else:
-                                st.markdown(f"**{news['title']}**")
-                            if news.get('source'):
-                                st.caption(f"來源: {news['source']}")
-                            if news.get('snippet'):
-                                st.caption(news['snippet'])
-                
-                # 為 LangGraph 顯示可用的URL數量
-                if st.session_state.workflow_type == "LangGraph" and trend.get('news_items'):
-                    url_count = len([news for news in trend['news_items'] if news.get('url')])
-                    st.info(f"🔗 此趨勢有 {url_count} 個可分析的新聞URL")
-            
-            # Selection button for each trend
-            if st.button(f"選擇 '{trend['title']}' 作為創作主題", key=f"select_{i}"):
-                st.session_state.selected_topic = trend
-                st.success(f"已選擇 '{trend['title']}' 作為創作主題！")
-                st.rerun()
+    table_event = st.dataframe(
+        st.session_state.trend_table,
+        key="trend_table_view",
+        on_select="rerun",
+        selection_mode="single-row",
+        hide_index=True,
+        use_container_width=True,
+        column_config={"趨勢連結": st.column_config.LinkColumn(display_text="查看完整趨勢")},
+    )
+    selected_rows = table_event.selection.rows
+    selected_row = selected_rows[0] if selected_rows else None
+    # 只在點選的列改變時更新，避免每次重新執行都覆蓋其他方式選擇的主題
+    if selected_row != st.session_state.get('_last_table_row'):
+        st.session_state._last_table_row = selected_row
+        if selected_row is not None and selected_row < len(st.session_state.trends):
+            _select_topic(selected_row)
     
     st.markdown("---")
     
     # Quick selection dropdown (keep the original functionality)
     st.subheader("⚡ 快速選擇")
-    topic_titles = [trend["title"] for trend in st.session_state.trends]
     selected_title = st.selectbox(
         "或使用下拉選單快速選擇：",
-        options=["請選擇一個主題..."] + topic_titles,
+        options=st.session_state.topic_options,
         index=0,
         help="從下拉選單中快速選擇一個主題。"
     )
 
-    if selected_title and selected_title != "請選擇一個主題...":
-        st.session_state.selected_topic = next(
-            (trend for trend in st.session_state.trends if trend["title"] == selected_title), None
-        )
+    # 只在下拉選單的選項改變時更新，避免每次重新執行都覆蓋表格所選的主題
+    if selected_title != st.session_state.get('_last_selected_title'):
+        st.session_state._last_selected_title = selected_title
+        if selected_title and selected_title != _TOPIC_PLACEHOLDER:
+            _select_topic(st.session_state.trend_index_by_title[selected_title])
 
 # --- Display Selected Topic ---
 if st.session_state.selected_topic:
@@ -206,15 +400,16 @@ if st.session_state.selected_topic:
                     caption=f"圖片來源: {st.session_state.selected_topic.get('picture_source', '')}"
                 )
             
-            st.markdown(f"**搜尋量:** {st.session_state.selected_topic.get('approx_traffic', 'N/A')}")
-            st.markdown(f"**發布時間:** {st.session_state.selected_topic.get('pub_date', 'N/A')}")
-            st.markdown(f"**來源:** {st.session_state.selected_topic['source']}")
-            
+            # 所有中繼資料合併成一個 Markdown 元素送出
+            meta_lines = [
+                f"**搜尋量:** {st.session_state.selected_topic.get('approx_traffic', 'N/A')}",
+                f"**發布時間:** {st.session_state.selected_topic.get('pub_date', 'N/A')}",
+                f"**來源:** {st.session_state.selected_topic['source']}",
+            ]
             # 為 LangGraph 工作流程顯示URL統計
             if st.session_state.workflow_type == "LangGraph":
-                news_items = st.session_state.selected_topic.get('news_items', [])
-                available_urls = [news['url'] for news in news_items if news.get('url')]
-                st.markdown(f"**可分析URL數:** {len(available_urls)}")
+                meta_lines.append(f"**可分析URL數:** {st.session_state.selected_url_count}")
+            st.markdown("\n\n".join(meta_lines))
                 
         with col2:
             if st.session_state.selected_topic.get('description'):
@@ -222,14 +417,29 @@ if st.session_state.selected_topic:
             
             # 顯示將被處理的URL（僅LangGraph）
             if st.session_state.workflow_type == "LangGraph":
-                news_items = st.session_state.selected_topic.get('news_items', [])
-                available_urls = [news['url'] for news in news_items if news.get('url')][:3]  # 取前3個
+                available_urls = st.session_state.selected_urls
                 if available_urls:
-                    st.markdown("**🔗 將被分析的URL:**")
-                    for i, url in enumerate(available_urls, 1):
-                        st.markdown(f"{i}. `{url}`")
+                    st.markdown("**🔗 將被分析的URL:**\n\n" + "\n".join(
+                        f"{i}. `{url}`" for i, url in enumerate(available_urls, 1)
+                    ))
                 else:
                     st.warning("⚠️ 此趨勢沒有可分析的URL，將使用通用研究方式")
+            
+            # 相關新聞只為選中的主題顯示
+            if st.session_state.selected_topic.get('news_items'):
+                st.markdown("**📰 相關新聞:**")
+                for news in st.session_state.selected_topic['news_items'][:3]:  # 只顯示前3則新聞
+                    news_col1, news_col2 = st.columns([1, 3])
+                    with news_col1:
+                        if news.get('picture'):
+                            st.image(news['picture'], width=100)
+                    with news_col2:
+                        news_lines = [f"**[{news['title']}]({news['url']})**" if news.get('url') else f"**{news['title']}**"]
+                        if news.get('source'):
+                            news_lines.append(f"來源: {news['source']}")
+                        if news.get('snippet'):
+                            news_lines.append(news['snippet'])
+                        st.markdown("\n\n".join(news_lines))
 
 # --- Step 3: Generate Content ---
 if st.session_state.selected_topic:
@@ -242,11 +452,26 @@ if st.session_state.selected_topic:
     
     with col2:
         if st.session_state.workflow_type == "LangGraph":
-            news_items = st.session_state.selected_topic.get('news_items', [])
-            url_count = len([news for news in news_items if news.get('url')])
-            st.markdown(f"**可分析的URL數量:** {url_count}")
+            st.markdown(f"**可分析的URL數量:** {st.session_state.selected_url_count}")
+    
+    content_key = _content_key(st.session_state.workflow_type, st.session_state.selected_topic)
+    saved_content = _get_content_store().get(content_key)
+    regenerate = False
+    if saved_content is not None and st.session_state.generated_content is None:
+        # 重新整理頁面後 session_state 會清空，選回同一主題時直接顯示先前儲存的內容
+        st.session_state.generated_content = saved_content
+        st.info("📂 已載入先前為此主題生成的內容")
+    if saved_content is not None:
+        regenerate = st.checkbox("重新生成（不使用先前為此主題儲存的內容）", value=False)
+    
+    generate = st.button("🚀 開始生成內容", use_container_width=True, type="primary")
+    if generate and saved_content is not None and not regenerate:
+        # 先前已為此主題完成過生成，直接載入結果，不再重新爬取與呼叫 LLM
+        st.session_state.generated_content = saved_content
+        st.success("📂 已載入先前為此主題生成的內容")
+        generate = False
     
-    if st.button("🚀 開始生成內容", use_container_width=True, type="primary"):
+    if generate:
         # 使用進度條
         progress_bar = st.progress(0)
         status_text = st.empty()
@@ -263,19 +488,22 @@ if st.session_state.selected_topic:
             progress_bar.progress(10)
             
             if st.session_state.workflow_type == "LangGraph":
-                # 使用新的 LangGraph 工作流程
+                # 使用新的 LangGraph 工作流程（在此才匯入，不拖慢首次載入頁面）
+                from agents.langgraph_workflow import stream_langgraph_workflow
+                
                 topic = st.session_state.selected_topic['title']
-                news_items = st.session_state.selected_topic.get('news_items', [])
-                trend_urls = [news['url'] for news in news_items if news.get('url')][:3]  # 取前3個URL
+                trend_urls = st.session_state.selected_urls
                 
                 progress_callback(f"使用 LangGraph 工作流程處理 {len(trend_urls)} 個URL...")
                 progress_bar.progress(20)
                 
-                result = run_langgraph_workflow(
+                # 摘要、腳本與社群內容一邊生成一邊顯示，不必等整個流程結束
+                result = _render_streamed_content(_stream_with_progress(
+                    stream_langgraph_workflow,
+                    progress_callback,
                     topic=topic,
-                    trend_urls=trend_urls,
-                    progress_callback=progress_callback
-                )
+                    trend_urls=trend_urls
+                ))
                 
                 progress_bar.progress(90)
                 
@@ -291,6 +519,7 @@ if st.session_state.selected_topic:
                             'scraped_data_count': result.get('scraped_data_count', 0)
                         }
                     }
+                    _get_content_store().set(content_key, st.session_state.generated_content)
                     progress_bar.progress(100)
                     status_text.text("✅ 內容生成完成！")
                     st.success("🎉 內容生成成功！")
@@ -299,6 +528,8 @@ if st.session_state.selected_topic:
             
             else:
                 # 使用原始的 AutoGen 工作流程
+                from agents.workflow import run_workflow
+                
                 progress_callback("使用 AutoGen 工作流程...")
                 progress_bar.progress(20)
                 
@@ -318,6 +549,7 @@ if st.session_state.selected_topic:
                             'type': 'AutoGen'
                         }
                     }
+                    _get_content_store().set(content_key, st.session_state.generated_content)
                     progress_bar.progress(100)
                     status_text.text("✅ 內容生成完成！")
                     st.success("🎉 內容生成成功！")
@@ -332,7 +564,13 @@ if st.session_state.selected_topic:
             status_text.empty()
 
 # --- Step 4: Display Generated Content ---
-if st.session_state.generated_content:
+# 生成內容的檢視選項
+_CONTENT_VIEWS = ["🎬 影片腳本", "📱 社群媒體", "📋 摘要報告", "💾 匯出"]
+
+
+@st.fragment
+def _render_generated_content() -> None:
+    """顯示生成的內容；作為 fragment 執行，切換檢視、複製與下載按鈕只重新執行這個區塊，不重建上方的趨勢列表"""
     st.header("步驟 4: 生成的內容")
     
     # 工作流程信息
@@ -351,10 +589,16 @@ if st.session_state.generated_content:
     
     st.markdown("---")
     
-    # Tabs for different content types
-    tab1, tab2, tab3, tab4 = st.tabs(["🎬 影片腳本", "📱 社群媒體", "📋 摘要報告", "💾 匯出"])
+    # 以單選切換內容類型：st.tabs 會在每次重新執行時建立所有分頁的內容，這裡只建立目前選擇的那一個
+    view = st.radio(
+        "內容類型",
+        _CONTENT_VIEWS,
+        horizontal=True,
+        label_visibility="collapsed",
+        key="content_view"
+    )
     
-    with tab1:
+    if view == "🎬 影片腳本":
         st.subheader("60秒影片腳本")
         video_script = st.session_state.generated_content.get('video_script', '')
         st.text_area(
@@ -369,7 +613,7 @@ if st.session_state.generated_content:
             st.code(video_script, language="text")
             st.write("```")
     
-    with tab2:
+    elif view == "📱 社群媒體":
         st.subheader("社群媒體內容")
         social_media = st.session_state.generated_content.get('social_media', '')
         st.text_area(
@@ -384,7 +628,7 @@ if st.session_state.generated_content:
             st.code(social_media, language="text")
             st.write("```")
     
-    with tab3:
+    elif view == "📋 摘要報告":
         if workflow_type == "LangGraph" and st.session_state.generated_content.get('summary'):
             st.subheader("內容摘要報告")
             summary = st.session_state.generated_content.get('summary', '')
@@ -404,7 +648,7 @@ if st.session_state.generated_content:
         else:
             st.info("摘要報告僅在 LangGraph 工作流程中可用")
     
-    with tab4:
+    else:
         st.subheader("匯出內容")
         
         # 準備匯出數據
@@ -418,12 +662,11 @@ if st.session_state.generated_content:
             'workflow_info': workflow_info
         }
         
+        json_data, text_data = _serialize_exports(export_data)
         col1, col2 = st.columns(2)
         
         with col1:
             # JSON 匯出
-            import json
-            json_data = json.dumps(export_data, ensure_ascii=False, indent=2)
             st.download_button(
                 "📥 下載 JSON",
                 data=json_data,
@@ -433,18 +676,6 @@ if st.session_state.generated_content:
         
         with col2:
             # 文本匯出
-            text_data = f"""主題: {export_data['topic']}
-工作流程: {export_data['workflow_type']}
-
-=== 影片腳本 ===
-{export_data['video_script']}
-
-=== 社群媒體內容 ===
-{export_data['social_media']}
-
-=== 摘要報告 ===
-{export_data.get('summary', 'N/A')}
-"""
             st.download_button(
                 "📥 下載文本",
                 data=text_data,
@@ -452,6 +683,24 @@ if st.session_state.generated_content:
                 mime="text/plain"
             )
 
+if st.session_state.generated_content:
+    _render_generated_content()
+
 # --- Footer ---
 st.markdown("---")
-st.markdown("🤖 **AI Agent 趨勢文案寫手 - 增強版** | 支援 AutoGen 和 LangGraph 工作流程")
\ No newline at end of file
+st.markdown("🤖 **AI Agent 趨勢文案寫手 - 增強版** | 支援 AutoGen 和 LangGraph 工作流程")
+
+# --- Sidebar: Cache Stats ---
+# 趨勢快取的命中率（本行程內所有使用者的累計）
+with cache_stats_container:
+    cache_stats = _get_cache_stats()
+    calls = cache_stats['hits'] + cache_stats['misses']
+    if calls:
+        st.metric(
+            "趨勢快取命中率",
+            f"{cache_stats['hits'] / calls:.0%}",
+            help=f"命中 {cache_stats['hits']} 次，未命中 {cache_stats['misses']} 次"
+        )
+        st.caption(f"趨勢更新於 {time.strftime('%H:%M:%S', time.localtime(cache_stats['last_refresh']))}")
+    else:
+        st.caption("尚未獲取趨勢")
@@ -34,11 +34,12 @@ WEB_SCRAPER_PROMPT = """
 4. **資料處理**: 清理和格式化爬取到的資料
 
 **可用工具:**
+- `fetch_webpage_batch`: 一次並行獲取多個網頁的原始 HTML 內容（有多個 URL 時優先使用）
 - `fetch_webpage`: 獲取網頁原始 HTML 內容
 - `execute_python_code`: 執行你編寫的 Python 爬蟲程式碼
 
 **工作流程:**
-1. 使用 `fetch_webpage` 工具獲取目標 URL 的網頁內容
+1. 使用 `fetch_webpage_batch` 工具一次獲取所有目標 URL 的網頁內容（單一 URL 時可用 `fetch_webpage`）
 2. 分析 HTML 結構，識別標題、內容、時間、作者等關鍵資訊
 3. 編寫針對性的 BeautifulSoup 或 requests 程式碼
 4. 使用 `execute_python_code` 工具執行程式碼
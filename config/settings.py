@@ -11,3 +11,14 @@ TAVILY_API_KEY = os.getenv("TAVILY_API_KEY")
 # NEWS_API_KEY = os.getenv("NEWS_API_KEY")
 OPENAI_API_BASE = os.getenv("OPENAI_API_BASE", "http://192.168.157.169:5003/v1")
 OPENAI_MODEL_NAME = os.getenv("OPENAI_MODEL_NAME", "Qwen/Qwen3-14B-AWQ")
+# Directory of the on-disk exact-match LLM prompt cache.
+LLM_CACHE_DIR = os.getenv("LLM_CACHE_DIR", ".cache/prompts")
+# Directory where the Streamlit app keeps generated content per topic.
+CONTENT_CACHE_DIR = os.getenv("CONTENT_CACHE_DIR", ".cache/content")
+# Sampling temperature of the AutoGen agents; unset keeps the server default.
+# Responses are cached on disk (see LLM_CACHE_DIR) only when it is 0.
+LLM_TEMPERATURE = float(os.environ["LLM_TEMPERATURE"]) if os.getenv("LLM_TEMPERATURE") else None
+# Development replay cache for the AutoGen workflow (like AutoGen's cache_seed).
+# When set, every LLM response is cached under this seed regardless of the
+# temperature, so re-running the same topic replays the previous run.
+LLM_CACHE_SEED = int(os.environ["LLM_CACHE_SEED"]) if os.getenv("LLM_CACHE_SEED") else None
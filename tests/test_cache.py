@@ -0,0 +1,147 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import json
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from langchain_core.messages import HumanMessage, SystemMessage
+
+from utils.cache import AutoGenResponseCache, PromptCache, SemanticLLMCache, hashed_ngram_embedding
+
+
+class TestSemanticLLMCache(unittest.TestCase):
+
+    def setUp(self):
+        self.cache = SemanticLLMCache(threshold=0.9, max_entries=2, ttl_seconds=60,
+                                      embed_fn=hashed_ngram_embedding)
+
+    def test_lookup_hit_and_miss(self):
+        """Test that identical text hits and unrelated text misses."""
+        self.cache.store("script", "台積電 第三季營收創新高", "cached script")
+
+        self.assertEqual(self.cache.lookup("script", "台積電 第三季營收創新高"), "cached script")
+        self.assertIsNone(self.cache.lookup("script", "颱風警報 明日接近東部海面"))
+
+    def test_namespaces_are_isolated(self):
+        """Test that entries are only matched within their namespace."""
+        self.cache.store("script", "same input", "script output")
+
+        self.assertIsNone(self.cache.lookup("social", "same input"))
+
+    def test_expired_entries_are_ignored(self):
+        """Test that entries older than the TTL are not returned."""
+        with patch('utils.cache.time.time', return_value=1000.0):
+            self.cache.store("script", "same input", "old output")
+        with patch('utils.cache.time.time', return_value=1061.0):
+            self.assertIsNone(self.cache.lookup("script", "same input"))
+
+    def test_least_recently_used_entry_is_evicted(self):
+        """Test LRU eviction once a namespace exceeds max_entries."""
+        self.cache.store("script", "first input", "first")
+        self.cache.store("script", "second input", "second")
+        self.cache.lookup("script", "first input")
+        self.cache.store("script", "third input", "third")
+
+        self.assertEqual(self.cache.lookup("script", "first input"), "first")
+        self.assertIsNone(self.cache.lookup("script", "second input"))
+        self.assertEqual(self.cache.lookup("script", "third input"), "third")
+
+
+class TestPromptCache(unittest.TestCase):
+
+    def test_key_depends_on_model_and_messages(self):
+        """Test that the key changes with the model, role or content."""
+        messages = [SystemMessage(content="system"), HumanMessage(content="topic")]
+        key = PromptCache.make_key("model-a", messages)
+
+        self.assertEqual(key, PromptCache.make_key("model-a", list(messages)))
+        self.assertNotEqual(key, PromptCache.make_key("model-b", messages))
+        self.assertNotEqual(key, PromptCache.make_key("model-a", [HumanMessage(content="system"), messages[1]]))
+
+    def test_entries_persist_across_instances(self):
+        """Test that a stored response is visible to a new cache on the same directory."""
+        with tempfile.TemporaryDirectory() as directory:
+            PromptCache(directory).set("key", "response")
+            reopened = PromptCache(directory)
+
+            self.assertEqual(reopened.get("key"), "response")
+            self.assertIsNone(reopened.get("missing"))
+            reopened._store().close()
+
+
+class TestAutoGenResponseCache(unittest.TestCase):
+
+    def test_only_deterministic_requests_are_cached(self):
+        """Test that temperature-0 requests hit after a store and other requests bypass the cache."""
+        with tempfile.TemporaryDirectory() as directory:
+            store = PromptCache(directory)
+            params = {"model": "m", "messages": [{"role": "user", "content": "hi"}], "temperature": 0}
+            sampled = dict(params, temperature=0.7)
+
+            with AutoGenResponseCache(store) as cache:
+                self.assertIsNone(cache.get(params))
+                cache.set(params, {"answer": 1})
+                cache.set(sampled, {"answer": 2})
+
+                self.assertEqual(cache.get(dict(params)), {"answer": 1})
+                self.assertIsNone(cache.get(sampled))
+                self.assertIsNone(cache.get(dict(params, tools=[{"name": "search"}])))
+                self.assertEqual(cache.stats, {"hits": 1, "misses": 2})
+            store._store().close()
+
+    def test_autogen_string_keys(self):
+        """Test the JSON string keys that AutoGen's OpenAIWrapper passes to get/set."""
+        with tempfile.TemporaryDirectory() as directory:
+            store = PromptCache(directory)
+            params = {"model": "m", "messages": [{"role": "user", "content": "hi"}], "temperature": 0}
+            # 與 autogen.oai.openai_utils.get_key 相同的鍵
+            key = json.dumps(params, sort_keys=True)
+            sampled_key = json.dumps(dict(params, temperature=0.7), sort_keys=True)
+
+            with AutoGenResponseCache(store) as cache:
+                self.assertIsNone(cache.get(key, None))
+                cache.set(key, {"answer": 1})
+                cache.set(sampled_key, {"answer": 2})
+
+                self.assertEqual(cache.get(key, None), {"answer": 1})
+                self.assertIsNone(cache.get(sampled_key, None))
+                self.assertEqual(cache.stats, {"hits": 1, "misses": 1})
+            store._store().close()
+
+    def test_seed_replays_sampled_requests(self):
+        """Test that a seeded cache stores any request and keeps seeds apart."""
+        with tempfile.TemporaryDirectory() as directory:
+            store = PromptCache(directory)
+            params = {"model": "m", "messages": [{"role": "user", "content": "hi"}], "temperature": 0.7}
+
+            AutoGenResponseCache(store, seed=42).set(params, {"answer": 1})
+
+            self.assertEqual(AutoGenResponseCache(store, seed=42).get(dict(params)), {"answer": 1})
+            self.assertIsNone(AutoGenResponseCache(store, seed=7).get(params))
+            self.assertIsNone(AutoGenResponseCache(store).get(params))
+            store._store().close()
+
+    def test_seed_replays_string_keys(self):
+        """Test that LLM_CACHE_SEED replay works with AutoGen's JSON string keys."""
+        with tempfile.TemporaryDirectory() as directory:
+            store = PromptCache(directory)
+            key = json.dumps({"model": "m", "messages": [{"role": "user", "content": "hi"}], "temperature": 0.7},
+                             sort_keys=True)
+
+            first_run = AutoGenResponseCache(store, seed=42)
+            self.assertIsNone(first_run.get(key, None))
+            first_run.set(key, {"answer": 1})
+
+            second_run = AutoGenResponseCache(store, seed=42)
+            self.assertEqual(second_run.get(key, None), {"answer": 1})
+            self.assertEqual((first_run.stats, second_run.stats),
+                             ({"hits": 0, "misses": 1}, {"hits": 1, "misses": 0}))
+            self.assertIsNone(AutoGenResponseCache(store, seed=7).get(key, None))
+            store._store().close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,237 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import itertools
+import json
+import tempfile
+import threading
+import unittest
+from unittest.mock import MagicMock, patch
+
+from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
+from langchain_core.messages import AIMessage
+
+import agents.langgraph_workflow as langgraph_workflow
+from agents.langgraph_workflow import analyze_website_structure_from_html
+from utils.cache import PromptCache, SemanticLLMCache, hashed_ngram_embedding
+
+SAMPLE_HTML = b"""
+<html lang="zh-TW">
+<head>
+    <title> Sample Page </title>
+    <meta name="description" content="desc">
+    <script type="application/ld+json">{}</script>
+</head>
+<body>
+    <main class="content">
+        <h1>Heading</h1>
+        <p>Paragraph</p>
+        <figure><img src="a.png"></figure>
+        <a href="/more" class="more-link">More</a>
+    </main>
+</body>
+</html>
+"""
+
+
+class TestAnalyzeWebsiteStructure(unittest.TestCase):
+
+    def _assert_sample_structure(self, structure):
+        self.assertEqual(structure.title, "Sample Page")
+        self.assertEqual(structure.main_content_selectors, ['main', '.content'])
+        self.assertEqual(structure.text_selectors, ['p', 'h1'])
+        self.assertEqual(structure.image_selectors, ['img', 'figure img'])
+        self.assertEqual(structure.link_selectors, ['a[href]', '.more-link'])
+        self.assertEqual(structure.meta_info['domain'], 'example.com')
+        self.assertEqual(structure.meta_info['page_lang'], 'zh-TW')
+        self.assertTrue(structure.meta_info['has_json_ld'])
+        self.assertTrue(structure.meta_info['has_meta_description'])
+        self.assertFalse(structure.meta_info['has_structured_data'])
+        self.assertEqual(structure.suggested_approach, "json-ld")
+
+    def test_analyze_with_default_parser(self):
+        """Test structure analysis with the preferred HTML parser."""
+        structure = analyze_website_structure_from_html("https://example.com/news", SAMPLE_HTML)
+        self._assert_sample_structure(structure)
+
+    def test_analyze_with_beautifulsoup_fallback(self):
+        """Test structure analysis when selectolax is unavailable."""
+        with patch.object(langgraph_workflow, 'LexborHTMLParser', None):
+            structure = analyze_website_structure_from_html("https://example.com/news", SAMPLE_HTML)
+        self._assert_sample_structure(structure)
+
+    def test_beautifulsoup_fallback_compound_selectors(self):
+        """Test that the single-pass index handles attribute and descendant selectors."""
+        html = b'<div itemscope><img src="a.png"><a name="anchor">x</a></div>'
+        with patch.object(langgraph_workflow, 'LexborHTMLParser', None):
+            structure = analyze_website_structure_from_html("https://example.com", html)
+        self.assertEqual(structure.image_selectors, ['img'])
+        self.assertEqual(structure.link_selectors, [])
+        self.assertTrue(structure.meta_info['has_structured_data'])
+
+    def test_analyze_empty_page(self):
+        """Test that a page without recognised elements falls back to general scraping."""
+        structure = analyze_website_structure_from_html("https://example.com", b"plain text")
+        self.assertEqual(structure.title, "No title found")
+        self.assertEqual(structure.main_content_selectors, [])
+        self.assertEqual(structure.suggested_approach, "general-scraping")
+
+
+class TestGenerateScrapingCode(unittest.TestCase):
+
+    def setUp(self):
+        self.state = {'website_analyses': [
+            {'url': url, 'structure': analyze_website_structure_from_html(url, SAMPLE_HTML), 'analysis_success': True}
+            for url in ("https://a.example.com", "https://b.example.com")
+        ] + [{'url': "https://c.example.com", 'analysis_success': False, 'error': 'timeout'}]}
+
+    @patch('agents.langgraph_workflow.get_llm', return_value=MagicMock(model_name='test-model'))
+    def test_batched_response_is_split_per_site(self, mock_get_llm):
+        """Test that one batched response is mapped back to each website in order."""
+        response = ("### WEBSITE 1 ###\n```python\ndef main(url): return 1\n```\n"
+                    "### WEBSITE 2 ###\n```python\ndef main(url): return 2\n```")
+        with patch('agents.langgraph_workflow.cached_invoke', return_value=response) as mock_invoke:
+            codes = langgraph_workflow.generate_scraping_code_node(self.state)['scraping_codes']
+
+        mock_invoke.assert_called_once()
+        self.assertEqual([code['code'] for code in codes], ['def main(url): return 1', 'def main(url): return 2', None])
+        self.assertEqual(codes[2]['error'], 'timeout')
+
+    @patch('agents.langgraph_workflow.get_llm', return_value=MagicMock(model_name='test-model'))
+    def test_unparseable_batch_falls_back_to_per_site_calls(self, mock_get_llm):
+        """Test that a response without markers triggers one call per website."""
+        with patch('agents.langgraph_workflow.cached_invoke',
+                   return_value="```python\ndef main(url): return 0\n```") as mock_invoke:
+            codes = langgraph_workflow.generate_scraping_code_node(self.state)['scraping_codes']
+
+        self.assertEqual(mock_invoke.call_count, 3)
+        self.assertEqual([code['generation_success'] for code in codes], [True, True, False])
+
+
+class TestSerializeScrapedData(unittest.TestCase):
+
+    def test_trims_and_deduplicates(self):
+        """Test that long strings are truncated and duplicate results are dropped."""
+        long_text = "新聞" * 5000
+        scraped = [
+            {'url': "https://a.example.com", 'content': {'text': long_text, 'images': ['a.png']}},
+            {'url': "https://a.example.com", 'content': {'text': 'retry'}},
+            {'url': "https://b.example.com", 'content': {'text': long_text, 'images': ['a.png']}},
+            {'url': "https://c.example.com", 'content': 'short'},
+        ]
+
+        result = json.loads(langgraph_workflow._serialize_scraped_data(scraped))
+
+        self.assertEqual([item['url'] for item in result], ["https://a.example.com", "https://c.example.com"])
+        self.assertEqual(len(result[0]['content']['text']), langgraph_workflow._MAX_SCRAPED_FIELD_CHARS + 1)
+        self.assertEqual(result[1]['content'], 'short')
+
+
+class TestExecuteScrapingCode(unittest.TestCase):
+
+    @classmethod
+    def tearDownClass(cls):
+        if langgraph_workflow._SCRAPER_POOL is not None:
+            langgraph_workflow._SCRAPER_POOL.terminate()
+
+    @patch('agents.langgraph_workflow._SCRAPER_TIMEOUT_SECONDS', 10)
+    def test_runs_in_worker_processes_with_timeout(self):
+        """Test that results are JSON-safe, missing main() is reported and hung scrapers time out."""
+        state = {'scraping_codes': [
+            {'url': "https://a.example.com", 'generation_success': True,
+             'code': "def main(url):\n    return {'url': url, 'tags': {'p'}}"},
+            {'url': "https://b.example.com", 'generation_success': True,
+             'code': "import time\ndef main(url):\n    time.sleep(60)"},
+            {'url': "https://c.example.com", 'generation_success': True, 'code': "x = 1"},
+            {'url': "https://d.example.com", 'generation_success': False, 'code': None, 'error': 'timeout'},
+        ]}
+
+        scraped = langgraph_workflow.execute_scraping_code_node(state)['scraped_data']
+
+        self.assertEqual(scraped[0]['data'], {'url': "https://a.example.com", 'tags': "{'p'}"})
+        self.assertIn('timed out', scraped[1]['error'])
+        self.assertEqual(scraped[2]['error'], 'No main function found in generated code')
+        self.assertEqual(scraped[3]['error'], 'timeout')
+        self.assertEqual([item['execution_success'] for item in scraped], [True, False, False, False])
+
+    def test_retries_on_pool_shut_down_by_another_run(self):
+        """Test that a pool another run already shut down is replaced instead of failing the node."""
+        stale_pool = langgraph_workflow._get_scraper_pool()
+        stale_pool.terminate()
+        state = {'scraping_codes': [
+            {'url': "https://a.example.com", 'generation_success': True, 'code': "def main(url):\n    return 1"},
+        ]}
+
+        scraped = langgraph_workflow.execute_scraping_code_node(state)['scraped_data']
+
+        self.assertEqual(scraped[0]['data'], 1)
+        self.assertIsNot(langgraph_workflow._SCRAPER_POOL, stale_pool)
+
+    def test_retire_lets_other_runs_finish(self):
+        """Test that retiring a pool waits for other runs' scrapers and never replaces a newer pool."""
+        pool = langgraph_workflow._get_scraper_pool()
+        other_run = pool.submit("import time\ndef main(url):\n    time.sleep(1)\n    return url", "https://b.example.com")
+
+        langgraph_workflow._retire_scraper_pool(pool)
+        self.assertEqual(other_run.result(timeout=30)['data'], "https://b.example.com")
+
+        newer_pool = langgraph_workflow._get_scraper_pool()
+        langgraph_workflow._retire_scraper_pool(pool)
+        self.assertIs(langgraph_workflow._SCRAPER_POOL, newer_pool)
+
+
+class TestRouteStart(unittest.TestCase):
+
+    def test_skips_scraping_without_urls(self):
+        """Test that the graph goes straight to the summary when there are no trend URLs."""
+        self.assertEqual(langgraph_workflow._route_start({'trend_urls': []}), "summarize")
+        self.assertEqual(langgraph_workflow._route_start({'trend_urls': ["https://a.example.com"]}), "analyze_urls")
+
+
+class TestWriterFanOut(unittest.TestCase):
+
+    @patch('agents.langgraph_workflow.get_llm', return_value=MagicMock(model_name='test-model'))
+    def test_writers_run_concurrently(self, mock_get_llm):
+        """Test that the script and social writers are in flight at the same time after the summary."""
+        barrier = threading.Barrier(2, timeout=5)
+
+        def fake_invoke(llm, messages, namespace, semantic_key):
+            # 兩個寫作節點都抵達後才放行；依序執行時會逾時並產生錯誤訊息
+            barrier.wait()
+            return f"{namespace} done"
+
+        with patch('agents.langgraph_workflow.cached_invoke', side_effect=fake_invoke):
+            result = langgraph_workflow.run_langgraph_workflow("並行測試主題", [])
+
+        self.assertEqual(result['video_script'], "write_script done")
+        self.assertEqual(result['social_media'], "write_social done")
+
+
+class _FakeChatModel(GenericFakeChatModel):
+    model_name: str = "fake-model"
+
+
+class TestStreamLangGraphWorkflow(unittest.TestCase):
+
+    def test_streams_writer_chunks_before_result(self):
+        """Test that both writers stream their text and the final result matches the chunks."""
+        llm = _FakeChatModel(messages=itertools.repeat(AIMessage(content="開場 今天 的 主題")))
+        with tempfile.TemporaryDirectory() as directory, \
+                patch('agents.langgraph_workflow.get_llm', return_value=llm), \
+                patch('agents.langgraph_workflow._PROMPT_CACHE', PromptCache(directory)) as prompt_cache, \
+                patch('agents.langgraph_workflow._SEMANTIC_CACHE', SemanticLLMCache(embed_fn=hashed_ngram_embedding)):
+            events = list(langgraph_workflow.stream_langgraph_workflow("串流測試主題", []))
+            prompt_cache._store().close()
+
+        self.assertEqual(events[-1]['stage'], 'result')
+        result = events[-1]['result']
+        for stage in ('video_script', 'social_media'):
+            deltas = [event['delta'] for event in events[:-1] if event['stage'] == stage]
+            self.assertGreater(len(deltas), 1)
+            self.assertEqual("".join(deltas), result[stage])
+        self.assertEqual(result['video_script'], "開場 今天 的 主題")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -2,12 +2,38 @@ import sys
 import os
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
+import io
 import unittest
 from unittest.mock import patch, MagicMock
 import pandas as pd
 
 from tools.trend_fetcher import TrendFetcher
 
+
+class _StreamedBody(io.BytesIO):
+    """模擬 urllib3 的原始回應串流（可設定 decode_content）"""
+    decode_content = False
+
+
+def _rss_response(item_count, status_code=200, headers=None):
+    """建立一個以串流方式提供 RSS 內容的假回應"""
+    items = ''.join(
+        f"""<item><title>Trend {i}</title><link>http://example.com/{i}</link>
+        <ht:approx_traffic>{i}00+</ht:approx_traffic>
+        <ht:news_item><ht:news_item_title>News {i}</ht:news_item_title>
+        <ht:news_item_url>http://news.example.com/{i}</ht:news_item_url></ht:news_item></item>"""
+        for i in range(item_count)
+    )
+    body = (
+        '<?xml version="1.0" encoding="UTF-8"?>'
+        '<rss xmlns:ht="https://trends.google.com/trending/rss" version="2.0">'
+        f'<channel>{items}</channel></rss>'
+    ).encode('utf-8')
+    response = MagicMock(status_code=status_code, headers=headers or {})
+    response.__enter__.return_value = response
+    response.raw = _StreamedBody(body)
+    return response
+
 class TestTrendFetcher(unittest.TestCase):
 
     @patch('tools.trend_fetcher.TrendReq')
@@ -65,5 +91,32 @@ class TestTrendFetcher(unittest.TestCase):
         
         self.assertEqual(result, [])
 
+    @patch('tools.trend_fetcher.SESSION')
+    def test_get_google_trends_streams_rss(self, mock_session):
+        """Test that the RSS body is parsed from the response stream and capped at 10 trends."""
+        mock_session.get.return_value = _rss_response(12)
+
+        result = TrendFetcher().get_google_trends()
+
+        self.assertEqual([trend['title'] for trend in result], [f'Trend {i}' for i in range(10)])
+        self.assertEqual(result[0]['approx_traffic'], '000+')
+        self.assertEqual(result[1]['news_items'][0]['url'], 'http://news.example.com/1')
+        self.assertTrue(mock_session.get.call_args.kwargs['stream'])
+
+    @patch('tools.trend_fetcher.SESSION')
+    def test_get_google_trends_not_modified(self, mock_session):
+        """Test that a 304 reply reuses the previously parsed trends."""
+        mock_session.get.side_effect = [
+            _rss_response(2, headers={'ETag': '"v1"'}),
+            _rss_response(0, status_code=304),
+        ]
+        fetcher = TrendFetcher()
+
+        first = fetcher.get_google_trends()
+        second = fetcher.get_google_trends()
+
+        self.assertEqual(second, first)
+        self.assertEqual(mock_session.get.call_args.kwargs['headers']['If-None-Match'], '"v1"')
+
 if __name__ == '__main__':
     unittest.main()
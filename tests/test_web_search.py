@@ -9,7 +9,7 @@ from tools.web_search import WebSearch
 
 class TestWebSearch(unittest.TestCase):
 
-    @patch('tools.web_search.TavilyClient')
+    @patch('tavily.TavilyClient')
     def test_search_success(self, MockTavilyClient):
         """Test successful web search."""
         mock_instance = MockTavilyClient.return_value
@@ -29,7 +29,7 @@ class TestWebSearch(unittest.TestCase):
         self.assertEqual(results[0]['title'], 'Result 1')
         mock_instance.search.assert_called_once_with(query="test query", search_depth="advanced", max_results=5)
 
-    @patch('tools.web_search.TavilyClient')
+    @patch('tavily.TavilyClient')
     def test_search_failure(self, MockTavilyClient):
         """Test failure in web search."""
         mock_instance = MockTavilyClient.return_value
@@ -42,5 +42,59 @@ class TestWebSearch(unittest.TestCase):
             
         self.assertEqual(results, [])
 
+    @patch('tools.web_search.time.sleep')
+    def test_scrape_multiple_urls_groups_by_host(self, mock_sleep):
+        """Test that results keep the input order and only same-host requests are spaced out."""
+        urls = ['http://a.example.com/1', 'http://b.example.com/1', 'http://a.example.com/2', 'http://c.example.com/1']
+
+        with patch('tools.web_search.settings') as mock_settings:
+            mock_settings.TAVILY_API_KEY = ""
+            search_tool = WebSearch()
+        with patch.object(search_tool, 'scrape_url_content',
+                          side_effect=lambda url: None if 'c.example' in url else {'url': url}):
+            results = search_tool.scrape_multiple_urls(urls)
+
+        self.assertEqual([result['url'] for result in results], urls[:3])
+        mock_sleep.assert_called_once()
+        self.assertAlmostEqual(mock_sleep.call_args[0][0], 1, delta=0.5)
+
+    @patch('tools.web_search.SESSION')
+    def test_scrape_url_content_title_only(self, mock_session):
+        """Test that the title-only path reads <title> without parsing the page."""
+        page = '<html><head><TITLE class="t"> 新聞 &amp; 趨勢 </TITLE></head><body>x</body></html>'.encode('utf-8')
+        response = MagicMock(headers={'Content-Type': 'text/html; charset=utf-8'})
+        response.__enter__.return_value = response
+        response.iter_content.return_value = [page[:20], page[20:]]
+        mock_session.get.return_value = response
+
+        with patch('tools.web_search.settings') as mock_settings:
+            mock_settings.TAVILY_API_KEY = ""
+            search_tool = WebSearch()
+        with patch('tools.web_search.lxml.html.document_fromstring') as mock_parse:
+            result = search_tool.scrape_url_content('http://example.com', title_only=True)
+
+        self.assertEqual(result, {'title': '新聞 & 趨勢', 'url': 'http://example.com', 'content': ''})
+        mock_parse.assert_not_called()
+
+    @patch('tools.web_search.SESSION')
+    def test_scrape_url_content_decodes_pages_without_meta_charset(self, mock_session):
+        """Test that UTF-8 pages without <meta charset> keep their Chinese text."""
+        page = '<html><head><title>台灣熱搜</title></head><body><article>今日新聞重點</article></body></html>'
+
+        with patch('tools.web_search.settings') as mock_settings:
+            mock_settings.TAVILY_API_KEY = ""
+            search_tool = WebSearch()
+        for content_type, body in [('text/html; charset=utf-8', page.encode('utf-8')),
+                                   ('text/html', page.encode('utf-8')),
+                                   ('text/html; charset=big5', page.encode('big5'))]:
+            response = MagicMock(headers={'Content-Type': content_type})
+            response.__enter__.return_value = response
+            response.iter_content.return_value = [body]
+            mock_session.get.return_value = response
+
+            result = search_tool.scrape_url_content('http://example.com')
+
+            self.assertEqual((result['title'], result['content']), ('台灣熱搜', '今日新聞重點'), content_type)
+
 if __name__ == '__main__':
     unittest.main()
@@ -2,30 +2,44 @@ import sys
 import os
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
+import asyncio
+import json
+import threading
+import time
 import unittest
-from unittest.mock import patch, MagicMock
+from unittest.mock import patch, MagicMock, AsyncMock
 
-from agents.workflow import run_workflow
+from agents.workflow import (
+    _AGENT_POOL, _TOOL_PHASE_AGENTS, _extract_content_from_messages, _get_web_search, _is_termination_msg,
+    _make_progress_hook, _phase_complete_check, _serialize_search_results,
+    a_fetch_webpage_batch, get_llm_config, run_workflow, run_workflow_parallel
+)
 
 class TestAgentWorkflow(unittest.TestCase):
 
     @patch('agents.workflow.WebSearch')
     @patch('agents.workflow.UserProxyAgent')
     @patch('agents.workflow.AssistantAgent')
-    @patch('agents.workflow.GroupChatManager')
-    def test_run_workflow(self, MockManager, MockAssistantAgent, MockUserProxyAgent, MockWebSearch):
+    def test_run_workflow(self, MockAssistantAgent, MockUserProxyAgent, MockWebSearch):
         """Test the agent workflow orchestration."""
         
         # Create separate mocks for each agent to avoid duplication warnings
         mock_researcher = MagicMock(name="Researcher")
         mock_script_writer = MagicMock(name="ScriptWriter")
         mock_social_writer = MagicMock(name="SocialWriter")
-        MockAssistantAgent.side_effect = [mock_researcher, mock_script_writer, mock_social_writer]
+        mock_web_scraper = MagicMock(name="WebScraper")
+        mock_coordinator = MagicMock(name="Coordinator")
+        MockAssistantAgent.side_effect = [
+            mock_researcher, mock_script_writer, mock_social_writer, mock_web_scraper, mock_coordinator
+        ]
 
         # Mock the final message from the agent interaction
-        mock_user_proxy_instance = MockUserProxyAgent.return_value
-        mock_user_proxy_instance.last_message.return_value = {
-            "content": """
+        summaries = {
+            mock_researcher: "research findings",
+            mock_web_scraper: "scraped data",
+            mock_script_writer: "draft script",
+            mock_social_writer: "draft post",
+            mock_coordinator: """
             FINAL_CONTENT
             ---VIDEO_SCRIPT_START---
             This is the video script.
@@ -33,23 +47,189 @@ class TestAgentWorkflow(unittest.TestCase):
             ---SOCIAL_MEDIA_START---
             This is the social media post.
             ---SOCIAL_MEDIA_END---
-            """
+            """,
         }
+        mock_user_proxy_instance = MockUserProxyAgent.return_value
+        mock_user_proxy_instance.a_initiate_chat = AsyncMock(
+            side_effect=lambda recipient, **kwargs: MagicMock(summary=summaries[recipient])
+        )
 
         with patch('agents.workflow.settings') as mock_settings:
             mock_settings.OPENAI_MODEL_NAME = "test-model"
             mock_settings.OPENAI_API_KEY = "test-key"
             mock_settings.OPENAI_API_BASE = "http://localhost:5003/v1"
+            mock_settings.LLM_TEMPERATURE = None
+            mock_settings.LLM_CACHE_SEED = None
 
+            # The config is memoized; rebuild it from the patched settings
+            get_llm_config.cache_clear()
+            self.addCleanup(get_llm_config.cache_clear)
+            _get_web_search.cache_clear()
+            self.addCleanup(_get_web_search.cache_clear)
+            _AGENT_POOL.clear()
+            self.addCleanup(_AGENT_POOL.clear)
             result = run_workflow("test topic")
 
+        llm_configs = [call.kwargs["llm_config"] for call in MockAssistantAgent.call_args_list]
+        self.assertEqual(llm_configs[0]["model"], "test-model")
+        self.assertTrue(all(llm_config is llm_configs[0] for llm_config in llm_configs))
+
         self.assertIn("video_script", result)
         self.assertIn("social_media", result)
         self.assertEqual(result["video_script"], "This is the video script.")
         self.assertEqual(result["social_media"], "This is the social media post.")
         
-        # Check if the chat was initiated
-        mock_user_proxy_instance.initiate_chat.assert_called_once()
+        # Check that every phase was run, with the writers fed the research and scraping results
+        recipients = [call.args[0] for call in mock_user_proxy_instance.a_initiate_chat.call_args_list]
+        self.assertEqual(recipients[:2], [mock_researcher, mock_web_scraper])
+        self.assertCountEqual(recipients[2:4], [mock_script_writer, mock_social_writer])
+        self.assertEqual(recipients[4], mock_coordinator)
+        for call in mock_user_proxy_instance.a_initiate_chat.call_args_list[2:4]:
+            self.assertIn("research findings", call.kwargs["message"])
+            self.assertIn("scraped data", call.kwargs["message"])
+
+        # Phase histories are dropped once their result has been taken
+        for agent in summaries:
+            agent.clear_history.assert_called_once_with(mock_user_proxy_instance)
+            mock_user_proxy_instance.clear_history.assert_any_call(agent)
+
+        # Topic-independent agents are reset and reused; only the researcher is rebuilt
+        mock_researcher_2 = MagicMock(name="Researcher2")
+        MockAssistantAgent.side_effect = [mock_researcher_2]
+        summaries[mock_researcher_2] = "research findings"
+        with patch('agents.workflow.settings', mock_settings):
+            run_workflow("another topic")
+
+        self.assertEqual(MockAssistantAgent.call_count, 6)
+        for agent in (mock_script_writer, mock_social_writer, mock_web_scraper, mock_coordinator):
+            agent.reset.assert_called()
+
+    def test_run_workflow_parallel_returns_first_success(self):
+        """Test that failed instances are skipped and slower ones are cancelled."""
+        cancelled = []
+
+        async def fake_run(topic, progress_callback, selected_topic_data, llm_config_overrides):
+            seed = llm_config_overrides["seed"]
+            try:
+                await asyncio.sleep({0: 0.05, 1: 0.01, 2: 10}[seed])
+            except asyncio.CancelledError:
+                cancelled.append(seed)
+                raise
+            if seed == 1:
+                return {"video_script": "內容生成過程中出現問題，請重新嘗試。", "social_media": "post"}
+            return {"video_script": f"script {seed}", "social_media": f"post {seed}"}
+
+        progress = MagicMock()
+        with patch('agents.workflow.a_run_workflow', side_effect=fake_run):
+            result = run_workflow_parallel("test topic", k=3, progress_callback=progress)
+
+        self.assertEqual(result, {"video_script": "script 0", "social_media": "post 0"})
+        self.assertEqual(cancelled, [2])
+        progress.assert_called_with("🏁 工作流程實例 #1 最先完成")
+
+    def test_fetch_webpage_batch_bounds_concurrency(self):
+        """Test that batch fetches keep URL order and respect max_concurrency."""
+        lock = threading.Lock()
+        active = []
+        peak = []
+
+        def fake_fetch(url):
+            with lock:
+                active.append(url)
+                peak.append(len(active))
+            time.sleep(0.02)
+            with lock:
+                active.remove(url)
+            return f"<html>{url}</html>"
+
+        urls = [f"https://example.com/{i}" for i in range(6)]
+        with patch('agents.workflow.fetch_webpage', side_effect=fake_fetch):
+            pages = asyncio.run(a_fetch_webpage_batch(urls, max_concurrency=2))
+
+        self.assertEqual(pages, [f"<html>{url}</html>" for url in urls])
+        self.assertLessEqual(max(peak), 2)
+
+    def test_extract_content_from_messages(self):
+        """Test that the newest marked message wins and writer replies are the fallback."""
+        script = "影片腳本：開場介紹今天的主題，" + "內容" * 60
+        messages = [
+            {"name": "Script_Writer", "content": script},
+            {"name": "Workflow_Coordinator", "content": "---VIDEO_SCRIPT_START--- old ---VIDEO_SCRIPT_END---\n"
+                                                        "---SOCIAL_MEDIA_START--- old post ---SOCIAL_MEDIA_END---"},
+            {"name": "user_proxy", "content": "===FINAL_OUTPUT_START===\n@@VIDEO_SCRIPT@@\n new \n@@VIDEO_SCRIPT_END@@\n"
+                                              "@@SOCIAL_MEDIA@@\n new post \n@@SOCIAL_MEDIA_END@@\n===FINAL_OUTPUT_END==="},
+        ]
+
+        self.assertEqual(_extract_content_from_messages(messages),
+                         {"video_script": "new", "social_media": "new post"})
+        self.assertEqual(_extract_content_from_messages(messages[1:2]),
+                         {"video_script": "old", "social_media": "old post"})
+        self.assertEqual(_extract_content_from_messages(messages[:1]),
+                         {"video_script": script, "social_media": "無法提取社群媒體內容"})
+
+    def test_is_termination_msg(self):
+        """Test that any termination marker ends the chat and tool calls do not."""
+        self.assertTrue(_is_termination_msg({"content": "內容...\n===FINAL_OUTPUT_END==="}))
+        self.assertTrue(_is_termination_msg({"content": "WORKFLOW_COMPLETE - 所有任務已完成"}))
+        self.assertFalse(_is_termination_msg({"content": "仍在撰寫腳本"}))
+        self.assertFalse(_is_termination_msg({"content": None, "tool_calls": [{}]}))
+
+    def test_phase_ends_on_plain_text_reply(self):
+        """Test in a real two-agent chat that a tool phase ends once the agent replies with plain text."""
+        from autogen import Agent, ConversableAgent, UserProxyAgent
+
+        replies = [
+            {"content": None, "tool_calls": [{"id": "call_1", "type": "function",
+                                              "function": {"name": "search_for_topic", "arguments": "{}"}}]},
+            "研究結果",
+        ]
+        llm_calls = []
+
+        def scripted_reply(recipient, messages=None, sender=None, config=None):
+            llm_calls.append(messages[-1])
+            return True, replies[len(llm_calls) - 1]
+
+        researcher = ConversableAgent("Trend_Researcher", llm_config=False, human_input_mode="NEVER")
+        researcher.register_reply([Agent, None], scripted_reply)
+        user_proxy = UserProxyAgent(
+            "user_proxy",
+            is_termination_msg=_phase_complete_check(_TOOL_PHASE_AGENTS),
+            human_input_mode="NEVER",
+            code_execution_config=False,
+        )
+        user_proxy.register_function(function_map={"search_for_topic": lambda: "搜尋結果"})
+
+        chat_result = user_proxy.initiate_chat(researcher, message="研究主題", max_turns=5, silent=True)
+
+        # 工具呼叫後再回覆一次純文字即結束，不會再多呼叫一次 LLM
+        self.assertEqual(len(llm_calls), 2)
+        self.assertEqual(chat_result.chat_history[-1]["content"], "研究結果")
+
+    def test_serialize_search_results(self):
+        """Test that search results become compact JSON with long content trimmed."""
+        results = [{"title": "台積電", "url": "https://example.com", "content": "字" * 1500, "source": "Tavily"}]
+
+        serialized = _serialize_search_results(results)
+
+        self.assertNotIn(": ", serialized)
+        self.assertIn("台積電", serialized)
+        self.assertEqual(json.loads(serialized)[0]["content"], "字" * 1000)
+        self.assertEqual(results[0]["content"], "字" * 1500)
+        self.assertEqual(_serialize_search_results(None), "[]")
+
+    def test_progress_hook_reports_text_replies(self):
+        """Test that the send hook reports agent replies but not tool calls."""
+        progress = MagicMock()
+        hook = _make_progress_hook(progress)
+        sender = MagicMock()
+        sender.name = "Script_Writer"
+
+        tool_call = {"content": None, "tool_calls": [{"id": "1"}]}
+        self.assertIs(hook(sender=sender, message=tool_call, recipient=None, silent=False), tool_call)
+        progress.assert_not_called()
+
+        self.assertEqual(hook(sender=sender, message="腳本內容", recipient=None, silent=False), "腳本內容")
+        progress.assert_called_once_with("🎬 Script_Writer 已完成影片腳本")
 
 
 if __name__ == '__main__':
@@ -1,5 +1,9 @@
 import datetime
-from typing import Dict
+from functools import lru_cache
+
+# 格式化後的內容：標題、正文與結尾的元資料；生成時間與 strftime('%Y-%m-%d %H:%M:%S') 的格式相同
+_TEMPLATE = "# {topic} - {kind}\n\n{body}\n\n---\n*主題: {topic}*\n*來源: {source}*\n*生成時間: {timestamp}*"
+
 
 class ContentFormatter:
     """
@@ -7,14 +11,40 @@ class ContentFormatter:
     """
 
     @staticmethod
+    @lru_cache(maxsize=8)
     def _load_template(path: str) -> str:
-        """Loads a template file."""
+        """Loads a template file (cached per path; templates do not change at runtime)."""
         try:
             with open(path, 'r', encoding='utf-8') as f:
                 return f.read()
         except FileNotFoundError:
             return ""
 
+    @staticmethod
+    def _format(kind: str, topic: str, content: str, source: str, fallback: str) -> str:
+        """
+        Fills the shared template with the agent output and metadata.
+
+        Args:
+            kind (str): The content type shown in the heading.
+            topic (str): The content topic.
+            content (str): The raw content from the agent.
+            source (str): The source of the trend.
+            fallback (str): The body used when the agent returned nothing.
+
+        Returns:
+            str: A formatted markdown string.
+        """
+        # 直接使用原始內容，不依賴特定格式
+        body = content.strip() if content else ""
+        return _TEMPLATE.format_map({
+            'topic': topic,
+            'kind': kind,
+            'body': body or fallback,
+            'source': source,
+            'timestamp': datetime.datetime.now().isoformat(sep=' ', timespec='seconds'),
+        })
+
     @staticmethod
     def format_video_script(topic: str, script_content: str, source: str) -> str:
         """
@@ -28,20 +58,7 @@ class ContentFormatter:
         Returns:
             str: A formatted markdown string for the video script.
         """
-        # 直接使用原始內容，不依賴特定格式
-        if not script_content or script_content.strip() == "":
-            script_content = "無法生成影片腳本內容"
-        
-        # 加上標題和元資料
-        formatted_content = f"# {topic} - 影片腳本\n\n{script_content.strip()}\n\n"
-        
-        metadata = (
-            f"---\n"
-            f"*主題: {topic}*\n"
-            f"*來源: {source}*\n"
-            f"*生成時間: {datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')}*"
-        )
-        return formatted_content + metadata
+        return ContentFormatter._format("影片腳本", topic, script_content, source, "無法生成影片腳本內容")
 
     @staticmethod
     def format_social_media(topic: str, social_content: str, source: str) -> str:
@@ -56,20 +73,7 @@ class ContentFormatter:
         Returns:
             str: A formatted markdown string for social media posts.
         """
-        # 直接使用原始內容，不依賴特定格式
-        if not social_content or social_content.strip() == "":
-            social_content = "無法生成社群媒體內容"
-            
-        # 加上標題和元資料
-        formatted_content = f"# {topic} - 社群媒體文案\n\n{social_content.strip()}\n\n"
-
-        metadata = (
-            f"---\n"
-            f"*主題: {topic}*\n"
-            f"*來源: {source}*\n"
-            f"*生成時間: {datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')}*"
-        )
-        return formatted_content + metadata
+        return ContentFormatter._format("社群媒體文案", topic, social_content, source, "無法生成社群媒體內容")
 
 if __name__ == '__main__':
     # Example Usage
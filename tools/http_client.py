@@ -0,0 +1,48 @@
+"""
+共用的 HTTP 連線池
+讓網頁搜尋與爬蟲工具重用 TCP/TLS 連線，避免每次請求都重新握手
+"""
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+try:
+    import brotli
+except ImportError:  # brotli 為選用依賴，未安裝時不宣告 br，避免收到無法解碼的回應
+    brotli = None
+
+# 請求時宣告可接受的壓縮格式；urllib3 在安裝 brotli 後會自動解碼 br
+ACCEPT_ENCODING = 'gzip, br, deflate' if brotli is not None else 'gzip, deflate'
+
+# 連線池大小：足以容納工作流程中並行的網頁請求
+_POOL_SIZE = 32
+
+# 連線失敗或暫時性錯誤狀態碼時以退避間隔重試；用盡後回傳最後的回應，由呼叫端的 raise_for_status 處理
+_RETRY = Retry(
+    total=2,
+    backoff_factor=0.3,
+    status_forcelist=(429, 500, 502, 503, 504),
+    raise_on_status=False,
+)
+
+
+def create_session(pool_size: int = _POOL_SIZE) -> requests.Session:
+    """
+    建立使用連線池並會重試暫時性錯誤的 HTTP Session
+
+    Args:
+        pool_size (int): 每個主機保留的最大連線數
+
+    Returns:
+        requests.Session: 可在多個執行緒間共用的 Session
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=_RETRY)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+# 行程內共用的 Session；各工具仍在每次請求時傳入自己的 headers
+SESSION = create_session()
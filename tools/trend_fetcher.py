@@ -1,14 +1,42 @@
 import logging
+import threading
 from datetime import datetime, timedelta
-from typing import List, Dict, Optional
-import xml.etree.ElementTree as ET
-
+from typing import List, Dict, Optional, TypedDict
 import requests
+from lxml import etree as ET
 
 from config import settings
+from tools.http_client import SESSION
 
 logging.basicConfig(level=logging.INFO)
 
+# Google Trends RSS 的命名空間元素，以 Clark 標記法預先組好，find() 不必再解析前綴
+_HT_NS = '{https://trends.google.com/trending/rss}'
+_HT_APPROX_TRAFFIC = _HT_NS + 'approx_traffic'
+_HT_PICTURE = _HT_NS + 'picture'
+_HT_PICTURE_SOURCE = _HT_NS + 'picture_source'
+_HT_NEWS_ITEM = _HT_NS + 'news_item'
+_HT_NEWS_ITEM_TITLE = _HT_NS + 'news_item_title'
+_HT_NEWS_ITEM_URL = _HT_NS + 'news_item_url'
+_HT_NEWS_ITEM_SNIPPET = _HT_NS + 'news_item_snippet'
+_HT_NEWS_ITEM_PICTURE = _HT_NS + 'news_item_picture'
+_HT_NEWS_ITEM_SOURCE = _HT_NS + 'news_item_source'
+
+
+class Trend(TypedDict):
+    """get_aggregated_trends 回傳的趨勢資料；各頁面以字典方式讀取欄位"""
+    title: str
+    description: str
+    source: str
+    url: str
+    pub_date: str
+    approx_traffic: str
+    picture: str
+    picture_source: str
+    news_items: List[Dict]
+    score: int
+
+
 class TrendFetcher:
     """
     Fetches, aggregates, and ranks trending topics by scraping Google Trends.
@@ -20,7 +48,13 @@ class TrendFetcher:
         """
         self.cache_duration = timedelta(hours=cache_duration_hours)
         self.last_fetch_time: Optional[datetime] = None
-        self.cached_trends: List[Dict] = []
+        self.cached_trends: List[Trend] = []
+        # 同一實例可能被多個執行緒共用，只讓一個執行緒重新抓取，其他執行緒沿用結果
+        self._refresh_lock = threading.RLock()
+        # 條件式 GET 的驗證標頭，與上次成功解析的 RSS 結果一起保存
+        self._etag: Optional[str] = None
+        self._last_modified: Optional[str] = None
+        self._rss_trends: List[Dict] = []
         self.headers = {
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
         }
@@ -34,66 +68,51 @@ class TrendFetcher:
                        Returns an empty list on failure.
         """
         url = "https://trends.google.com/trending/rss?geo=TW"
+        headers = dict(self.headers)
+        if self._rss_trends:
+            if self._etag:
+                headers['If-None-Match'] = self._etag
+            if self._last_modified:
+                headers['If-Modified-Since'] = self._last_modified
         try:
-            response = requests.get(url, headers=self.headers)
-            response.raise_for_status()  # Raise an exception for bad status codes
-            
-            # 解析 XML
-            root = ET.fromstring(response.content)
-            trends = []
-            
-            # 定義正確的命名空間 - 根據實際 RSS 結構
-            namespace = {'ht': 'https://trends.google.com/trending/rss'}
-            
-            # 找到所有 item 元素
-            for item in root.findall('.//item'):
-                title = item.find('title').text if item.find('title') is not None else ""
-                link = item.find('link').text if item.find('link') is not None else ""
-                description = item.find('description').text if item.find('description') is not None else ""
-                pub_date = item.find('pubDate').text if item.find('pubDate') is not None else ""
-                
-                # 提取 Google Trends 特有的資訊
-                approx_traffic = item.find('ht:approx_traffic', namespace)
-                traffic = approx_traffic.text if approx_traffic is not None else ""
-                
-                picture = item.find('ht:picture', namespace)
-                picture_url = picture.text if picture is not None else ""
-                
-                picture_source = item.find('ht:picture_source', namespace)
-                pic_source = picture_source.text if picture_source is not None else ""
-                
-                # 提取新聞項目
-                news_items = []
-                for news_item in item.findall('ht:news_item', namespace):
-                    news_title = news_item.find('ht:news_item_title', namespace)
-                    news_url = news_item.find('ht:news_item_url', namespace)
-                    news_snippet = news_item.find('ht:news_item_snippet', namespace)
-                    news_picture = news_item.find('ht:news_item_picture', namespace)
-                    news_source = news_item.find('ht:news_item_source', namespace)
-                    
-                    if news_title is not None:
-                        news_items.append({
-                            "title": news_title.text or "",
-                            "url": news_url.text if news_url is not None else "",
-                            "snippet": news_snippet.text if news_snippet is not None else "",
-                            "picture": news_picture.text if news_picture is not None else "",
-                            "source": news_source.text if news_source is not None else ""
-                        })
-                
-                if title:  # 只添加有標題的項目
-                    trends.append({
-                        "title": title,
-                        "url": link,
-                        "description": description,
-                        "pub_date": pub_date,
-                        "approx_traffic": traffic,
-                        "picture": picture_url,
-                        "picture_source": pic_source,
-                        "news_items": news_items
-                    })
-            
+            # 共用連線池的 Session，重新整理時沿用已建立的 TLS 連線
+            with SESSION.get(url, headers=headers, stream=True, timeout=10) as response:
+                if response.status_code == 304:
+                    logging.info("Google Trends RSS not modified; reusing parsed trends.")
+                    self.last_fetch_time = datetime.now()
+                    return self._rss_trends
+                response.raise_for_status()  # Raise an exception for bad status codes
+                # 串流解析時由 urllib3 處理 gzip 等傳輸編碼
+                response.raw.decode_content = True
+
+                # 逐一解析 <item>，處理完即釋放，記憶體只保留目前這一筆
+                trends = []
+                context = ET.iterparse(
+                    response.raw,
+                    events=('end',),
+                    tag='item',
+                    resolve_entities=False,
+                    no_network=True,
+                )
+                for _, item in context:
+                    trend = self._parse_item(item)
+                    if trend:  # 只添加有標題的項目
+                        trends.append(trend)
+
+                    item.clear()
+                    while item.getprevious() is not None:
+                        del item.getparent()[0]
+
+                    if len(trends) >= 10:
+                        break  # 已取得前 10 名，不再讀取剩餘的 feed
+                del context
+
             if not trends:
                 logging.warning("Could not find trend items in RSS feed.")
+            else:
+                self._etag = response.headers.get('ETag')
+                self._last_modified = response.headers.get('Last-Modified')
+                self._rss_trends = trends[:10]
 
             return trends[:10]  # Return top 10
         except requests.exceptions.RequestException as e:
@@ -106,7 +125,46 @@ class TrendFetcher:
             logging.error(f"Unexpected error fetching Google Trends: {e}")
             return []
 
-    def get_aggregated_trends(self, force_refresh: bool = False) -> List[Dict]:
+    def _is_fresh(self) -> bool:
+        """快取的趨勢是否仍在有效期限內"""
+        last_fetch_time = self.last_fetch_time
+        return last_fetch_time is not None and datetime.now() - last_fetch_time < self.cache_duration
+
+    @staticmethod
+    def _parse_item(item) -> Optional[Dict]:
+        """
+        將單一 RSS <item> 元素轉成趨勢字典；沒有標題時回傳 None。
+        """
+        title = item.findtext('title')
+        if not title:
+            return None
+
+        # 提取新聞項目（沒有標題的新聞略過）
+        news_items = [
+            {
+                "title": news_title,
+                "url": news_item.findtext(_HT_NEWS_ITEM_URL, ""),
+                "snippet": news_item.findtext(_HT_NEWS_ITEM_SNIPPET, ""),
+                "picture": news_item.findtext(_HT_NEWS_ITEM_PICTURE, ""),
+                "source": news_item.findtext(_HT_NEWS_ITEM_SOURCE, ""),
+            }
+            for news_item in item.iterchildren(_HT_NEWS_ITEM)
+            if (news_title := news_item.findtext(_HT_NEWS_ITEM_TITLE)) is not None
+        ]
+
+        # 提取 Google Trends 特有的資訊
+        return {
+            "title": title,
+            "url": item.findtext('link', ""),
+            "description": item.findtext('description', ""),
+            "pub_date": item.findtext('pubDate', ""),
+            "approx_traffic": item.findtext(_HT_APPROX_TRAFFIC, ""),
+            "picture": item.findtext(_HT_PICTURE, ""),
+            "picture_source": item.findtext(_HT_PICTURE_SOURCE, ""),
+            "news_items": news_items,
+        }
+
+    def get_aggregated_trends(self, force_refresh: bool = False) -> List[Trend]:
         """
         Aggregates trends from Google, ranks them, and caches the result.
 
@@ -114,37 +172,38 @@ class TrendFetcher:
             force_refresh (bool): If True, forces a refetch of data, ignoring the cache.
 
         Returns:
-            List[Dict]: A sorted list of top 10 trending topics.
+            List[Trend]: A sorted list of top 10 trending topics.
         """
-        now = datetime.now()
-        if not force_refresh and self.last_fetch_time and (now - self.last_fetch_time < self.cache_duration):
+        if not force_refresh and self._is_fresh():
             logging.info("Returning cached trends.")
             return self.cached_trends
 
-        logging.info("Fetching new trends from Google Trends...")
-        google_trends = self.get_google_trends()
-
-        all_trends = []
-
-        # Process Google Trends
-        if google_trends:
-            for i, trend_data in enumerate(google_trends):
-                all_trends.append({
-                    "title": trend_data["title"],
+        with self._refresh_lock:
+            # 等待鎖期間可能已由其他執行緒更新
+            if not force_refresh and self._is_fresh():
+                logging.info("Returning cached trends.")
+                return self.cached_trends
+
+            now = datetime.now()
+            logging.info("Fetching new trends from Google Trends...")
+            google_trends = self.get_google_trends()
+
+            # get_google_trends 已限制為前 10 名，直接以解析結果為底補上來源與排名分數，
+            # 不逐欄重新複製
+            all_trends = [
+                {
+                    **trend_data,
                     "description": trend_data["description"] or f"Google 熱搜趨勢第 {i+1} 名",
                     "source": "Google Trends",
-                    "url": trend_data["url"],
-                    "pub_date": trend_data["pub_date"],
-                    "approx_traffic": trend_data["approx_traffic"],
-                    "picture": trend_data["picture"],
-                    "picture_source": trend_data["picture_source"],
-                    "news_items": trend_data["news_items"],
                     "score": 100 - i * 5  # Higher score for higher rank
-                })
+                }
+                for i, trend_data in enumerate(google_trends)
+            ]
+
+            # 先建好完整列表再一次替換，無鎖讀取的執行緒不會看到建到一半的結果
+            self.cached_trends = all_trends
+            self.last_fetch_time = now
 
-        self.cached_trends = all_trends[:10]
-        self.last_fetch_time = now
-        
-        logging.info(f"Fetched and cached {len(self.cached_trends)} unique trends.")
-        return self.cached_trends
+            logging.info(f"Fetched and cached {len(all_trends)} unique trends.")
+            return all_trends
 
@@ -7,15 +7,63 @@ import requests
 import subprocess
 import sys
 import tempfile
-import os
 import json
 import logging
+import re
+from functools import lru_cache
 from typing import Dict, Any, Optional
 from urllib.parse import urljoin, urlparse
 import time
 
+from tools.http_client import ACCEPT_ENCODING, SESSION
+
+try:
+    import resource
+except ImportError:  # Windows 沒有 resource 模組，執行程式碼時不設資源上限
+    resource = None
+
 logging.basicConfig(level=logging.INFO)
 
+# http(s) URL 的網域部分（到第一個 / ? # 為止），與 urlparse(url).netloc 相同
+_NETLOC_RE = re.compile(r'^https?://([^/?#]*)', re.IGNORECASE)
+
+
+@lru_cache(maxsize=2048)
+def _netloc(url: str) -> str:
+    """取得 URL 的網域，常見的 http(s) URL 以正則擷取，其餘交給 urlparse"""
+    match = _NETLOC_RE.match(url)
+    return match.group(1) if match else urlparse(url).netloc
+
+
+# 執行生成程式碼的子行程可使用的最大記憶體（位址空間）
+_EXEC_MEMORY_LIMIT_BYTES = 1024 * 1024 * 1024
+
+# 子行程先設定資源上限，再以 __main__ 身分執行從 stdin 讀入的程式碼；
+# 在子行程內設定，不需在多執行緒的父行程使用 preexec_fn
+_EXEC_BOOTSTRAP = (
+    "import resource, sys\n"
+    "cpu, memory = int(sys.argv[1]), int(sys.argv[2])\n"
+    "resource.setrlimit(resource.RLIMIT_CPU, (cpu, cpu))\n"
+    "resource.setrlimit(resource.RLIMIT_AS, (memory, memory))\n"
+    "sys.argv = ['-']\n"
+    "exec(compile(sys.stdin.read(), '<stdin>', 'exec'), {'__name__': '__main__', '__builtins__': __builtins__})\n"
+)
+
+
+def _python_command(timeout: int) -> list:
+    """
+    組出從 stdin 執行程式碼的命令列，支援時加上 CPU 時間與記憶體上限
+
+    Args:
+        timeout (int): 執行超時時間（秒），同時作為 CPU 時間上限
+
+    Returns:
+        list: 傳給 subprocess.run 的參數列表
+    """
+    if resource is None:
+        return [sys.executable, '-']
+    return [sys.executable, '-c', _EXEC_BOOTSTRAP, str(max(1, int(timeout))), str(_EXEC_MEMORY_LIMIT_BYTES)]
+
 
 def fetch_webpage(url: str, timeout: int = 30) -> str:
     """
@@ -32,13 +80,13 @@ def fetch_webpage(url: str, timeout: int = 30) -> str:
         'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
         'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
         'Accept-Language': 'en-US,en;q=0.5',
-        'Accept-Encoding': 'gzip, deflate',
+        'Accept-Encoding': ACCEPT_ENCODING,
         'Connection': 'keep-alive',
     }
     
     try:
         logging.info(f"正在獲取網頁: {url}")
-        response = requests.get(url, headers=headers, timeout=timeout)
+        response = SESSION.get(url, headers=headers, timeout=timeout)
         response.raise_for_status()
         
         # 嘗試解碼內容
@@ -83,26 +131,19 @@ def execute_python_code(code: str, timeout: int = 60) -> Dict[str, Any]:
         Dict[str, Any]: 包含執行結果、輸出、錯誤等信息的字典
     """
     try:
-        # 創建臨時檔案來儲存程式碼
-        with tempfile.NamedTemporaryFile(mode='w', suffix='.py', delete=False, encoding='utf-8') as temp_file:
-            temp_file.write(code)
-            temp_file_path = temp_file.name
-        
-        logging.info(f"執行 Python 程式碼，臨時檔案: {temp_file_path}")
+        logging.info("執行 Python 程式碼")
         
-        # 執行程式碼
+        # 程式碼經由 stdin 傳入子行程，不必寫入臨時檔案
         try:
             result = subprocess.run(
-                [sys.executable, temp_file_path],
+                _python_command(timeout),
+                input=code,
                 capture_output=True,
                 text=True,
                 timeout=timeout,
-                cwd=os.path.dirname(temp_file_path)
+                cwd=tempfile.gettempdir()
             )
             
-            # 清理臨時檔案
-            os.unlink(temp_file_path)
-            
             execution_result = {
                 "success": result.returncode == 0,
                 "return_code": result.returncode,
@@ -120,10 +161,6 @@ def execute_python_code(code: str, timeout: int = 60) -> Dict[str, Any]:
             return execution_result
             
         except subprocess.TimeoutExpired:
-            # 清理臨時檔案
-            if os.path.exists(temp_file_path):
-                os.unlink(temp_file_path)
-                
             error_msg = f"程式碼執行超時 (超過 {timeout} 秒)"
             logging.error(error_msg)
             return {
@@ -193,27 +230,20 @@ def validate_scraped_data(data: Dict[str, Any]) -> Dict[str, Any]:
     # 提取來源網域
     if validated_data.get("url"):
         try:
-            from urllib.parse import urlparse
-            parsed_url = urlparse(validated_data["url"])
-            validated_data["metadata"]["source_domain"] = parsed_url.netloc
+            validated_data["metadata"]["source_domain"] = _netloc(validated_data["url"])
         except:
             pass
     
     return validated_data
 
 
-def generate_scraping_template(url: str, html_preview: str) -> str:
-    """
-    根據網頁預覽生成爬蟲程式碼模板
-    
-    Args:
-        url (str): 目標 URL
-        html_preview (str): HTML 內容預覽
-        
-    Returns:
-        str: 爬蟲程式碼模板
-    """
-    template = f'''
+# 爬蟲模板使用的選擇器，模板在模組載入時組好，每次呼叫只需代入 URL
+_TEMPLATE_TITLE_SELECTORS = ('h1', 'title', '.title', '.headline', '[class*="title"]')
+_TEMPLATE_CONTENT_SELECTORS = ('.content', '.article-body', '.post-content', 'article', '.entry-content')
+_TEMPLATE_DATE_SELECTORS = ('time', '.date', '.publish-date', '[datetime]', '.timestamp')
+_TEMPLATE_AUTHOR_SELECTORS = ('.author', '.by-author', '.writer', '[rel="author"]')
+
+_TEMPLATE_HEAD = '''
 import requests
 from bs4 import BeautifulSoup
 import json
@@ -223,7 +253,9 @@ from urllib.parse import urlparse
 
 def scrape_webpage():
     """爬取網頁內容"""
-    url = "{url}"
+    url = "'''
+
+_TEMPLATE_TAIL = f'''"
     domain = urlparse(url).netloc
     headers = {{
         'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
@@ -238,7 +270,7 @@ def scrape_webpage():
         
         # 標題提取 (常見的標題標籤)
         title = ""
-        for selector in ['h1', 'title', '.title', '.headline', '[class*="title"]']:
+        for selector in {list(_TEMPLATE_TITLE_SELECTORS)!r}:
             title_elem = soup.select_one(selector)
             if title_elem and title_elem.get_text().strip():
                 title = title_elem.get_text().strip()
@@ -246,7 +278,7 @@ def scrape_webpage():
         
         # 內容提取 (常見的內容標籤)
         content = ""
-        for selector in ['.content', '.article-body', '.post-content', 'article', '.entry-content']:
+        for selector in {list(_TEMPLATE_CONTENT_SELECTORS)!r}:
             content_elem = soup.select_one(selector)
             if content_elem:
                 # 移除腳本和樣式
@@ -259,11 +291,12 @@ def scrape_webpage():
         if not content:
             paragraphs = soup.find_all('p')
             if paragraphs:
-                content = ' '.join([p.get_text().strip() for p in paragraphs if p.get_text().strip()])
+                texts = (p.get_text(strip=True) for p in paragraphs)
+                content = ' '.join(text for text in texts if text)
         
         # 發布時間提取
         publish_date = ""
-        for selector in ['time', '.date', '.publish-date', '[datetime]', '.timestamp']:
+        for selector in {list(_TEMPLATE_DATE_SELECTORS)!r}:
             date_elem = soup.select_one(selector)
             if date_elem:
                 publish_date = date_elem.get_text().strip() or date_elem.get('datetime', '')
@@ -271,7 +304,7 @@ def scrape_webpage():
         
         # 作者提取
         author = ""
-        for selector in ['.author', '.by-author', '.writer', '[rel="author"]']:
+        for selector in {list(_TEMPLATE_AUTHOR_SELECTORS)!r}:
             author_elem = soup.select_one(selector)
             if author_elem:
                 author = author_elem.get_text().strip()
@@ -286,6 +319,9 @@ def scrape_webpage():
         # 生成摘要 (取前200字)
         summary = content[:200] + "..." if len(content) > 200 else content
         
+        # 字數只計算一次，同時用於字數與閱讀時間
+        word_count = len(content.split()) if content else 0
+        
         result = {{
             "url": url,
             "title": title,
@@ -295,8 +331,8 @@ def scrape_webpage():
             "summary": summary,
             "keywords": keywords,
             "metadata": {{
-                "word_count": len(content.split()) if content else 0,
-                "reading_time": f"{{max(1, len(content.split()) // 200)}} 分鐘" if content else "0 分鐘",
+                "word_count": word_count,
+                "reading_time": f"{{max(1, word_count // 200)}} 分鐘" if content else "0 分鐘",
                 "source_domain": domain
             }}
         }}
@@ -322,8 +358,20 @@ def scrape_webpage():
 if __name__ == "__main__":
     scrape_webpage()
 '''
+
+
+def generate_scraping_template(url: str, html_preview: str) -> str:
+    """
+    根據網頁預覽生成爬蟲程式碼模板
     
-    return template
+    Args:
+        url (str): 目標 URL
+        html_preview (str): HTML 內容預覽
+        
+    Returns:
+        str: 爬蟲程式碼模板
+    """
+    return _TEMPLATE_HEAD + url + _TEMPLATE_TAIL
 
 
 if __name__ == "__main__":
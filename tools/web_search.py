@@ -1,15 +1,94 @@
+import codecs
+import html
 import logging
+import re
 import requests
-from bs4 import BeautifulSoup
+import lxml.html
+from lxml import etree
 from urllib.parse import urljoin, urlparse
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 from typing import List, Dict, Optional
-from tavily import TavilyClient
 
 from config import settings
+from tools.http_client import ACCEPT_ENCODING, SESSION
 
 logging.basicConfig(level=logging.INFO)
 
+# 同一網站兩次請求之間的最短間隔（秒），防止被封禁
+_HOST_REQUEST_INTERVAL = 1.0
+
+# Content-Type 標頭中的 charset 與頁面開頭的 <meta charset> 宣告
+_HEADER_CHARSET_RE = re.compile(r'charset\s*=\s*["\']?([\w.:-]+)', re.IGNORECASE)
+_META_CHARSET_RE = re.compile(rb'<meta[^>]+charset', re.IGNORECASE)
+
+
+@lru_cache(maxsize=16)
+def _html_parser(encoding: Optional[str]) -> lxml.html.HTMLParser:
+    """取得指定編碼的HTML解析器（不保留註解節點，避免註解文字混入擷取的正文）"""
+    return lxml.html.HTMLParser(remove_comments=True, encoding=encoding)
+
+
+def _html_encoding(html_bytes: bytes, content_type: str) -> Optional[str]:
+    """
+    決定解析頁面時使用的編碼
+
+    優先使用 Content-Type 標頭的 charset；沒有時若頁面自己以 <meta> 宣告，交給 libxml2 讀取；
+    兩者都沒有時，內容是合法 UTF-8 就以 UTF-8 解析，否則返回 None 由 libxml2 自行判斷。
+    """
+    match = _HEADER_CHARSET_RE.search(content_type or "")
+    if match:
+        try:
+            return codecs.lookup(match.group(1)).name
+        except LookupError:
+            pass
+    if _META_CHARSET_RE.search(html_bytes[:4096]):
+        return None
+    try:
+        # 以不結束的增量解碼檢查，截斷在多位元組字元中間的結尾不算錯誤
+        codecs.getincrementaldecoder('utf-8')().decode(html_bytes, final=False)
+    except UnicodeDecodeError:
+        return None
+    return 'utf-8'
+
+# 一次走訪取得所有正文候選元素：article、class 含 content 的 div、main
+_CONTENT_CANDIDATES = etree.XPath(
+    "//article"
+    " | //div[contains(translate(@class, 'ABCDEFGHIJKLMNOPQRSTUVWXYZ', 'abcdefghijklmnopqrstuvwxyz'), 'content')]"
+    " | //main"
+)
+_TITLE = etree.XPath("string(//title[1])")
+
+# 只需要標題時直接以正則擷取 <title>，不解析整份HTML
+_TITLE_RE = re.compile(rb'<title[^>]*>(.*?)</title>', re.IGNORECASE | re.DOTALL)
+
+# 每個網頁最多保留的正文字元數
+CONTENT_BUDGET = 2000
+
+# 每個網頁最多下載的HTML位元組數；正文只取前 CONTENT_BUDGET 個字元，不需要完整頁面
+_MAX_HTML_BYTES = 512 * 1024
+_HTML_CHUNK_SIZE = 8192
+
+
+def _element_text(element, budget: int = CONTENT_BUDGET) -> str:
+    """
+    以空白串接元素內各段去除空白後的文字，累積滿 budget 個字元即停止走訪
+    """
+    parts = []
+    length = 0
+    for text in element.itertext():
+        text = text.strip()
+        if not text:
+            continue
+        parts.append(text)
+        length += len(text) + 1
+        if length >= budget:
+            break
+    return ' '.join(parts)[:budget]
+
+
 class WebSearch:
     """
     A tool for performing web searches using the Tavily API.
@@ -21,6 +100,8 @@ class WebSearch:
         """
         self.tavily_enabled = bool(settings.TAVILY_API_KEY)
         if self.tavily_enabled:
+            # tavily 會連帶載入 httpx 等套件，只在設定了 API key 時才匯入
+            from tavily import TavilyClient
             self.client = TavilyClient(api_key=settings.TAVILY_API_KEY)
         else:
             logging.warning("Tavily API key is not set. Only URL scraping will be available.")
@@ -30,18 +111,23 @@ class WebSearch:
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
             'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
             'Accept-Language': 'zh-TW,zh;q=0.8,en;q=0.6',
-            'Accept-Encoding': 'gzip, deflate',
+            'Accept-Encoding': ACCEPT_ENCODING,
             'DNT': '1',
             'Connection': 'keep-alive',
             'Upgrade-Insecure-Requests': '1'
         }
+
+        # 各網站下一次允許送出請求的時間，由多個爬取執行緒共用
+        self._host_lock = threading.Lock()
+        self._next_request_at: Dict[str, float] = {}
     
-    def scrape_url_content(self, url: str) -> Optional[Dict[str, str]]:
+    def scrape_url_content(self, url: str, title_only: bool = False) -> Optional[Dict[str, str]]:
         """
         爬取單個URL的內容
         
         Args:
             url (str): 要爬取的URL
+            title_only (bool): 只擷取標題，略過HTML解析，content 為空字串
             
         Returns:
             Optional[Dict[str, str]]: 包含'title', 'url', 'content'的字典，失敗時返回None
@@ -50,53 +136,50 @@ class WebSearch:
             logging.info(f"正在爬取URL: {url}")
             
             # 發送HTTP請求
-            response = requests.get(url, headers=self.headers, timeout=10)
-            response.raise_for_status()
+            with SESSION.get(url, headers=self.headers, timeout=10, stream=True) as response:
+                response.raise_for_status()
+                
+                # 分塊讀取，達到上限即停止，避免超大頁面佔滿記憶體
+                buffer = bytearray()
+                for chunk in response.iter_content(_HTML_CHUNK_SIZE):
+                    buffer.extend(chunk)
+                    if len(buffer) >= _MAX_HTML_BYTES:
+                        break
+                html_bytes = bytes(buffer[:_MAX_HTML_BYTES])
+                encoding = _html_encoding(html_bytes, response.headers.get('Content-Type', ''))
+            
+            if title_only:
+                match = _TITLE_RE.search(html_bytes)
+                title = html.unescape(match.group(1).decode(encoding or 'utf-8', 'ignore')).strip() if match else ""
+                return {
+                    'title': title or '無標題',
+                    'url': url,
+                    'content': ''
+                }
             
-            # 解析HTML
-            soup = BeautifulSoup(response.content, 'html.parser')
+            # 解析HTML並移除不含正文的 script/style
+            tree = lxml.html.document_fromstring(html_bytes, parser=_html_parser(encoding))
+            etree.strip_elements(tree, 'script', 'style', with_tail=False)
             
             # 提取標題
-            title = ""
-            title_tag = soup.find('title')
-            if title_tag:
-                title = title_tag.get_text().strip()
+            title = _TITLE(tree).strip()
             
-            # 嘗試從各種標籤提取正文內容
+            # 依優先順序取第一個有文字的候選：article > 內容類名的div > main
+            candidates = _CONTENT_CANDIDATES(tree)
             content_text = ""
-            
-            # 方法1: 嘗試article標籤
-            article = soup.find('article')
-            if article:
-                content_text = article.get_text(strip=True, separator=' ')
-            
-            # 方法2: 嘗試常見的內容類名
-            if not content_text:
-                for class_name in ['content', 'main-content', 'article-content', 'post-content', 'entry-content']:
-                    content_div = soup.find('div', class_=lambda x: x and class_name in x.lower())
-                    if content_div:
-                        content_text = content_div.get_text(strip=True, separator=' ')
+            for tag in ('article', 'div', 'main'):
+                first = next((element for element in candidates if element.tag == tag), None)
+                if first is not None:
+                    content_text = _element_text(first)
+                    if content_text:
                         break
             
-            # 方法3: 嘗試main標籤
+            # 如果仍然沒有內容，取body內容但要移除常見的干擾元素
             if not content_text:
-                main = soup.find('main')
-                if main:
-                    content_text = main.get_text(strip=True, separator=' ')
-            
-            # 方法4: 如果仍然沒有內容，取body內容但要移除常見的干擾元素
-            if not content_text:
-                # 移除常見的非內容元素
-                for element in soup(['script', 'style', 'nav', 'header', 'footer', 'aside']):
-                    element.decompose()
-                
-                body = soup.find('body')
-                if body:
-                    content_text = body.get_text(strip=True, separator=' ')
-            
-            # 限制內容長度，取前2000個字符
-            if content_text:
-                content_text = content_text[:2000]
+                etree.strip_elements(tree, 'nav', 'header', 'footer', 'aside', with_tail=False)
+                body = tree.find('body')
+                if body is not None:
+                    content_text = _element_text(body)
             
             if not content_text:
                 content_text = "無法提取內容"
@@ -116,31 +199,48 @@ class WebSearch:
             logging.error(f"爬取URL內容時發生錯誤 {url}: {e}")
             return None
     
+    def _wait_for_host(self, url: str) -> None:
+        """
+        為URL所屬網站預約下一個請求時段，必要時等待，不同網站互不影響
+
+        Args:
+            url (str): 即將爬取的URL
+        """
+        host = urlparse(url).netloc
+        with self._host_lock:
+            now = time.monotonic()
+            slot = max(now, self._next_request_at.get(host, now))
+            self._next_request_at[host] = slot + _HOST_REQUEST_INTERVAL
+        if slot > now:
+            time.sleep(slot - now)
+
+    def _scrape_politely(self, url: str) -> Optional[Dict[str, str]]:
+        """
+        遵守同網站請求間隔後爬取URL
+        """
+        self._wait_for_host(url)
+        return self.scrape_url_content(url)
+
     def scrape_multiple_urls(self, urls: List[str], max_urls: int = 5) -> List[Dict[str, str]]:
         """
-        批量爬取多個URL的內容
-        
+        批量爬取多個URL的內容，所有URL並行爬取，同一網站的請求依間隔錯開
+
         Args:
             urls (List[str]): URL列表
             max_urls (int): 最大爬取數量
             
         Returns:
-            List[Dict[str, str]]: 成功爬取的內容列表
+            List[Dict[str, str]]: 成功爬取的內容列表（與 urls 順序相同）
         """
-        results = []
         urls_to_scrape = urls[:max_urls]  # 限制數量
+        if not urls_to_scrape:
+            return []
         
-        for i, url in enumerate(urls_to_scrape, 1):
-            logging.info(f"爬取進度: {i}/{len(urls_to_scrape)}")
-            
-            content = self.scrape_url_content(url)
-            if content:
-                results.append(content)
-            
-            # 添加小延遲防止被封禁
-            if i < len(urls_to_scrape):
-                time.sleep(1)
+        # 每個URL一個執行緒並共用連線池，總耗時接近最慢的請求而非所有請求的總和
+        with ThreadPoolExecutor(max_workers=len(urls_to_scrape)) as executor:
+            scraped = list(executor.map(self._scrape_politely, urls_to_scrape))
         
+        results = [result for result in scraped if result]
         logging.info(f"批量爬取完成，成功獲取 {len(results)}/{len(urls_to_scrape)} 個網頁內容")
         return results
 
@@ -0,0 +1,321 @@
+"""
+LLM 回應快取工具
+提供精確比對的磁碟快取與語意相似度快取，讓重複或相近的提示詞可以重用先前的 LLM 回應
+"""
+
+import hashlib
+import json
+import logging
+import threading
+import time
+import zlib
+from functools import lru_cache
+from typing import Any, Callable, Dict, List, Optional, Union
+
+import numpy as np
+
+logging.basicConfig(level=logging.INFO)
+
+# 未安裝 sentence-transformers 時使用的雜湊 n-gram 向量維度
+_HASHED_EMBEDDING_DIM = 1024
+
+
+def hashed_ngram_embedding(text: str) -> np.ndarray:
+    """
+    以字元 bigram/trigram 的雜湊計數產生正規化向量（不需額外模型）
+
+    Args:
+        text (str): 要轉換的文字
+
+    Returns:
+        np.ndarray: 長度為 1 的 float32 向量
+    """
+    vector = np.zeros(_HASHED_EMBEDDING_DIM, dtype=np.float32)
+    text = text.lower()
+    for n in (2, 3):
+        for i in range(len(text) - n + 1):
+            vector[zlib.crc32(text[i:i + n].encode('utf-8')) % _HASHED_EMBEDDING_DIM] += 1.0
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+def _load_default_embedder() -> Callable[[str], np.ndarray]:
+    """優先使用 sentence-transformers 的 MiniLM 模型，未安裝時退回雜湊 n-gram 向量"""
+    try:
+        from sentence_transformers import SentenceTransformer
+    except ImportError:
+        logging.info("sentence-transformers 未安裝，語意快取改用字元 n-gram 向量")
+        return hashed_ngram_embedding
+
+    model = SentenceTransformer('sentence-transformers/all-MiniLM-L6-v2')
+    return lambda text: np.asarray(model.encode(text, normalize_embeddings=True), dtype=np.float32)
+
+
+def _dot_scores_numpy(query: np.ndarray, matrix: np.ndarray) -> np.ndarray:
+    return matrix @ query
+
+
+@lru_cache(maxsize=1)
+def _dot_scores_kernel() -> Callable[[np.ndarray, np.ndarray], np.ndarray]:
+    """第一次比對時才載入 numba（匯入耗時較長）；未安裝時以 NumPy 矩陣乘法計算相似度"""
+    try:
+        import numba
+    except ImportError:
+        return _dot_scores_numpy
+
+    @numba.njit(parallel=True, fastmath=True, cache=True)
+    def _dot_scores(query, matrix):
+        scores = np.empty(matrix.shape[0], dtype=np.float32)
+        for i in numba.prange(matrix.shape[0]):
+            total = np.float32(0.0)
+            for j in range(matrix.shape[1]):
+                total += query[j] * matrix[i, j]
+            scores[i] = total
+        return scores
+
+    return _dot_scores
+
+
+class _EmbeddingTable:
+    """單一命名空間的快取項目，向量存放在連續的 float32 矩陣中"""
+
+    def __init__(self, capacity: int, dim: int):
+        self.matrix = np.zeros((capacity, dim), dtype=np.float32)
+        self.responses = [None] * capacity
+        self.created_at = np.zeros(capacity, dtype=np.float64)
+        self.last_used = np.zeros(capacity, dtype=np.int64)
+        self.size = 0
+
+    def remove(self, row: int) -> None:
+        """以最後一列覆蓋被移除的列，保持有效項目連續"""
+        last = self.size - 1
+        if row != last:
+            self.matrix[row] = self.matrix[last]
+            self.responses[row] = self.responses[last]
+            self.created_at[row] = self.created_at[last]
+            self.last_used[row] = self.last_used[last]
+        self.responses[last] = None
+        self.size = last
+
+
+class SemanticLLMCache:
+    """
+    以向量餘弦相似度比對提示詞的 LLM 回應快取，支援 TTL 與 LRU 淘汰
+    """
+
+    def __init__(self, threshold: float = 0.92, max_entries: int = 256, ttl_seconds: int = 3600,
+                 embed_fn: Optional[Callable[[str], np.ndarray]] = None):
+        """
+        Args:
+            threshold (float): 視為命中的最低餘弦相似度
+            max_entries (int): 每個命名空間最多保留的項目數
+            ttl_seconds (int): 項目存活時間（秒）
+            embed_fn (callable, optional): 文字轉正規化向量的函數，預設延遲載入
+        """
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._embed_fn = embed_fn
+        self._tables: Dict[str, _EmbeddingTable] = {}
+        self._tick = 0
+        self._lock = threading.Lock()
+
+    def _embed(self, text: str) -> np.ndarray:
+        if self._embed_fn is None:
+            # 並行節點可能同時第一次使用快取，只載入一次模型
+            with self._lock:
+                if self._embed_fn is None:
+                    self._embed_fn = _load_default_embedder()
+        return np.ascontiguousarray(self._embed_fn(text), dtype=np.float32)
+
+    def _purge_expired(self, table: _EmbeddingTable, now: float) -> None:
+        for row in np.flatnonzero(now - table.created_at[:table.size] > self.ttl_seconds)[::-1]:
+            table.remove(int(row))
+
+    def lookup(self, namespace: str, text: str) -> Optional[str]:
+        """
+        尋找與 text 語意相近的快取回應
+
+        Args:
+            namespace (str): 快取命名空間（例如節點名稱），只在同一空間內比對
+            text (str): 決定回應內容的提示文字
+
+        Returns:
+            Optional[str]: 命中時返回快取的回應，否則返回 None
+        """
+        query = self._embed(text)
+        now = time.time()
+        with self._lock:
+            table = self._tables.get(namespace)
+            if table is None:
+                return None
+            self._purge_expired(table, now)
+            if table.size == 0:
+                return None
+            scores = _dot_scores_kernel()(query, table.matrix[:table.size])
+            best_row = int(np.argmax(scores))
+            best_score = float(scores[best_row])
+            if best_score < self.threshold:
+                return None
+            self._tick += 1
+            table.last_used[best_row] = self._tick
+            logging.info(f"語意快取命中 ({namespace}), 相似度 {best_score:.3f}")
+            return table.responses[best_row]
+
+    def store(self, namespace: str, text: str, response: str) -> None:
+        """
+        儲存一筆回應
+
+        Args:
+            namespace (str): 快取命名空間
+            text (str): 決定回應內容的提示文字
+            response (str): LLM 回應內容
+        """
+        embedding = self._embed(text)
+        with self._lock:
+            table = self._tables.get(namespace)
+            if table is None:
+                table = self._tables[namespace] = _EmbeddingTable(self.max_entries, embedding.shape[0])
+            if table.size == self.max_entries:
+                # 容量已滿時覆蓋最久未使用的項目
+                row = int(np.argmin(table.last_used[:table.size]))
+            else:
+                row = table.size
+                table.size += 1
+            self._tick += 1
+            table.matrix[row] = embedding
+            table.responses[row] = response
+            table.created_at[row] = time.time()
+            table.last_used[row] = self._tick
+
+    def clear(self) -> None:
+        """清除所有快取項目"""
+        with self._lock:
+            self._tables.clear()
+
+
+class PromptCache:
+    """
+    以訊息內容的 SHA-256 為鍵、存放於磁碟的精確比對快取，跨行程重啟仍有效
+    """
+
+    def __init__(self, directory: str):
+        """
+        Args:
+            directory (str): diskcache 的資料夾，第一次使用時才建立
+        """
+        self.directory = directory
+        self._cache = None
+        self._lock = threading.Lock()
+
+    def _store(self):
+        if self._cache is None:
+            with self._lock:
+                if self._cache is None:
+                    import diskcache
+                    self._cache = diskcache.Cache(self.directory)
+        return self._cache
+
+    @staticmethod
+    def make_key(model: str, messages: List) -> str:
+        """
+        將模型名稱與訊息序列化後計算 SHA-256
+
+        Args:
+            model (str): 模型名稱，不同模型的回應不共用
+            messages (List): LangChain 訊息物件
+
+        Returns:
+            str: 十六進位雜湊值
+        """
+        payload = json.dumps([model, [(m.type, m.content) for m in messages]], ensure_ascii=False)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def get(self, key: str) -> Optional[Any]:
+        """返回快取的回應，未命中時返回 None"""
+        return self._store().get(key)
+
+    def set(self, key: str, response: Any) -> None:
+        """儲存一筆回應（任何可被 pickle 的物件）"""
+        self._store().set(key, response)
+
+    def clear(self) -> None:
+        """清除所有快取項目"""
+        self._store().clear()
+
+
+class AutoGenResponseCache:
+    """
+    實作 AutoGen 快取介面（get/set/close 與 context manager）的磁碟快取
+
+    AutoGen 以完整請求參數（model、messages、tools 等）的 JSON 字串作為鍵（也接受參數字典），
+    這裡以其 SHA-256 存入 PromptCache。預設只有 temperature 為 0 的確定性請求會被快取；指定 seed 時（類似 AutoGen 的
+    cache_seed）所有請求都會被快取並重播，同一個 seed 的重複執行不再呼叫 LLM。同時統計命中與未命中次數。
+    """
+
+    def __init__(self, store: PromptCache, seed: Optional[int] = None):
+        """
+        Args:
+            store (PromptCache): 實際存放回應的磁碟快取，可在多個實例間共用
+            seed (int, optional): 重播快取的命名空間；為 None 時只快取確定性請求
+        """
+        self.store = store
+        self.seed = seed
+        self.stats = {"hits": 0, "misses": 0}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(params: Union[str, Dict], seed: Optional[int] = None) -> Optional[str]:
+        """
+        計算請求參數的 SHA-256；未指定 seed 時，非確定性請求（temperature 不為 0）返回 None
+
+        Args:
+            params (Union[str, Dict]): AutoGen 產生的請求鍵（get_key 的 JSON 字串）或請求參數
+            seed (int, optional): 重播快取的命名空間，不同 seed 的鍵互不相同
+
+        Returns:
+            Optional[str]: 十六進位雜湊值，不應快取時為 None
+        """
+        if isinstance(params, str):
+            # AutoGen 的 get_key 已是 sort_keys 的 JSON，直接雜湊；只為判斷 temperature 才解析
+            payload = params
+            if seed is None:
+                try:
+                    config = json.loads(params)
+                except ValueError:
+                    return None
+                if not isinstance(config, dict) or config.get("temperature") != 0:
+                    return None
+        elif isinstance(params, dict):
+            if seed is None and params.get("temperature") != 0:
+                return None
+            payload = json.dumps(params, sort_keys=True, ensure_ascii=False, default=str)
+        else:
+            return None
+        if seed is not None:
+            payload = f"seed={seed}\n{payload}"
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def get(self, key: Union[str, Dict], default: Any = None) -> Any:
+        digest = self.make_key(key, self.seed)
+        if digest is None:
+            return default
+        response = self.store.get(digest)
+        with self._lock:
+            self.stats["hits" if response is not None else "misses"] += 1
+        return default if response is None else response
+
+    def set(self, key: Union[str, Dict], value: Any) -> None:
+        digest = self.make_key(key, self.seed)
+        if digest is not None:
+            self.store.set(digest, value)
+
+    def close(self) -> None:
+        # 底層的 PromptCache 由多個實例共用，不在此關閉
+        pass
+
+    def __enter__(self) -> "AutoGenResponseCache":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()